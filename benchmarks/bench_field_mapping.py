@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+字段映射微基準測試
+
+比較編譯後的 MappingPlan 與舊的手寫 .get()/isinstance 提取鏈
+
+使用方式：
+    python -m benchmarks.bench_field_mapping [--iterations 200000]
+"""
+
+import argparse
+import timeit
+from typing import Any, Dict
+
+from src.models.anchor_data import AnchorData, ANCHOR_FIELD_PLAN
+from src.models.gateway_data import GatewayData, GATEWAY_FIELD_PLAN
+
+
+def legacy_extract_gateway(gateway: GatewayData) -> Dict[str, Any]:
+    """舊版 FlattenedGatewayData.from_gateway_data 的提取邏輯"""
+    battery_voltage = None
+    rssi = None
+    signal_quality = None
+    fw_version = None
+    config_mode = None
+
+    if gateway.cloud_data:
+        cloud_data = gateway.cloud_data
+        if isinstance(cloud_data, dict):
+            battery_voltage = cloud_data.get("battery_voltage")
+            rssi = cloud_data.get("rssi")
+            signal_quality = cloud_data.get("signal_quality")
+            fw_version = cloud_data.get("fw_version")
+            config_mode = cloud_data.get("config_mode")
+
+            pub = cloud_data.get("pub")
+            if pub and isinstance(pub, dict):
+                msg = pub.get("msg")
+                if msg and isinstance(msg, dict):
+                    data = msg.get("data")
+                    if data and isinstance(data, dict):
+                        battery_voltage = battery_voltage or data.get("battery_voltage")
+                        rssi = rssi or data.get("rssi")
+                        signal_quality = signal_quality or data.get("signal_quality")
+
+    position_x, position_y, position_z = None, None, None
+    if gateway.position and isinstance(gateway.position, dict):
+        position_x = gateway.position.get("x")
+        position_y = gateway.position.get("y")
+        position_z = gateway.position.get("z")
+
+    return dict(
+        device_id=gateway.gateway_id,
+        device_name=gateway.name,
+        ip_address=gateway.ip_address,
+        mac_address=gateway.mac_address,
+        position_x=position_x,
+        position_y=position_y,
+        position_z=position_z,
+        status=gateway.status,
+        created_at=gateway.created_at,
+        last_seen=gateway.last_seen,
+        battery_voltage=battery_voltage,
+        rssi=rssi,
+        signal_quality=signal_quality,
+        fw_version=fw_version,
+        config_mode=config_mode,
+        is_bound=gateway.is_bound,
+        timestamp=gateway.last_seen
+    )
+
+
+def legacy_extract_anchor(anchor: AnchorData) -> Dict[str, Any]:
+    """舊版 FlattenedAnchorData.from_anchor_data 的提取邏輯"""
+    battery_voltage = None
+    rssi = None
+    heart_rate = None
+    temperature = None
+    humidity = None
+    fw_update = None
+    led_enabled = None
+    ble_enabled = None
+    is_initiator = None
+
+    if anchor.cloud_data:
+        cloud_data = anchor.cloud_data
+        if isinstance(cloud_data, dict):
+            battery_voltage = cloud_data.get("battery_voltage")
+            rssi = cloud_data.get("rssi")
+            heart_rate = cloud_data.get("heart_rate")
+            temperature = cloud_data.get("temperature")
+            humidity = cloud_data.get("humidity")
+            fw_update = cloud_data.get("fw_update")
+            led_enabled = cloud_data.get("led")
+            ble_enabled = cloud_data.get("ble")
+            is_initiator = cloud_data.get("initiator")
+
+            pub = cloud_data.get("pub")
+            if pub and isinstance(pub, dict):
+                msg = pub.get("msg")
+                if msg and isinstance(msg, dict):
+                    data = msg.get("data")
+                    if data and isinstance(data, dict):
+                        battery_voltage = battery_voltage or data.get("battery_voltage")
+                        rssi = rssi or data.get("rssi")
+                        heart_rate = heart_rate or data.get("heart_rate")
+                        temperature = temperature or data.get("temperature")
+                        humidity = humidity or data.get("humidity")
+
+    if isinstance(fw_update, int):
+        fw_update = bool(fw_update)
+    if isinstance(led_enabled, int):
+        led_enabled = bool(led_enabled)
+    if isinstance(ble_enabled, int):
+        ble_enabled = bool(ble_enabled)
+    if isinstance(is_initiator, int):
+        is_initiator = bool(is_initiator)
+
+    position_x, position_y, position_z = None, None, None
+    if anchor.position and isinstance(anchor.position, dict):
+        position_x = anchor.position.get("x")
+        position_y = anchor.position.get("y")
+        position_z = anchor.position.get("z")
+    elif anchor.cloud_data and isinstance(anchor.cloud_data, dict):
+        pos = anchor.cloud_data.get("position")
+        if pos and isinstance(pos, dict):
+            position_x = pos.get("x")
+            position_y = pos.get("y")
+            position_z = pos.get("z")
+
+    return dict(
+        device_id=anchor.anchor_id,
+        device_name=anchor.name,
+        gateway_id=anchor.gateway_id,
+        mac_address=anchor.mac_address,
+        position_x=position_x,
+        position_y=position_y,
+        position_z=position_z,
+        status=anchor.status,
+        last_seen=anchor.last_seen,
+        is_bound=anchor.is_bound,
+        battery_voltage=battery_voltage,
+        rssi=rssi,
+        heart_rate=heart_rate,
+        temperature=temperature,
+        humidity=humidity,
+        fw_update=fw_update,
+        led_enabled=led_enabled,
+        ble_enabled=ble_enabled,
+        is_initiator=is_initiator,
+        timestamp=anchor.last_seen
+    )
+
+
+SAMPLE_GATEWAY = GatewayData(
+    gateway_id="gw_001",
+    name="Living Room",
+    ip_address="192.168.1.100",
+    mac_address="00:1A:2B:3C:4D:5E",
+    cloud_data={
+        "id": 1,
+        "gateway_id": 1,
+        "pub": {"msg": {"data": {"battery_voltage": 3.7, "rssi": -45}}},
+        "fw_version": "v2.1.0"
+    },
+    position={"x": 10.5, "y": 20.3, "z": 1.2},
+    status="online",
+    last_seen="2025-11-17T14:30:00Z"
+)
+
+SAMPLE_ANCHOR = AnchorData(
+    anchor_id="anchor_001",
+    gateway_id="gw_001",
+    name="Bed Anchor",
+    mac_address="AA:BB:CC:DD:EE:FF",
+    cloud_data={
+        "id": 1,
+        "gateway_id": 1,
+        "pub": {"msg": {"data": {
+            "battery_voltage": 3.2, "rssi": -52, "heart_rate": 72, "temperature": 36.5
+        }}},
+        "fw_update": 0,
+        "led": 1,
+        "ble": 1,
+        "initiator": 0,
+        "position": {"x": 5.2, "y": 8.1, "z": 0.8}
+    },
+    position={"x": 5.2, "y": 8.1, "z": 0.8},
+    status="online",
+    last_seen="2025-11-17T14:30:00Z",
+    is_bound=True
+)
+
+
+def run(iterations: int) -> Dict[str, Dict[str, float]]:
+    """執行基準測試，返回每筆記錄耗時（納秒）"""
+    cases = {
+        "gateway": (legacy_extract_gateway, GATEWAY_FIELD_PLAN.compile(), SAMPLE_GATEWAY),
+        "anchor": (legacy_extract_anchor, ANCHOR_FIELD_PLAN.compile(), SAMPLE_ANCHOR),
+    }
+
+    results = {}
+    for name, (legacy, compiled, sample) in cases.items():
+        assert legacy(sample) == compiled(sample), f"{name} 提取結果不一致"
+        legacy_ns = min(timeit.repeat(lambda: legacy(sample), number=iterations, repeat=3)) / iterations * 1e9
+        compiled_ns = min(timeit.repeat(lambda: compiled(sample), number=iterations, repeat=3)) / iterations * 1e9
+        results[name] = {
+            "legacy_ns_per_record": round(legacy_ns, 1),
+            "compiled_ns_per_record": round(compiled_ns, 1),
+            "speedup": round(legacy_ns / compiled_ns, 2),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字段映射微基準測試")
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    for name, result in run(args.iterations).items():
+        print(
+            f"{name:8s} legacy {result['legacy_ns_per_record']:8.1f} ns/record | "
+            f"compiled {result['compiled_ns_per_record']:8.1f} ns/record | "
+            f"speedup {result['speedup']:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
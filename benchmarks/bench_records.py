@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+記錄類記憶體/吞吐量基準測試
+
+比較 __slots__ 記錄類 + 淺拷貝序列化 與 舊的 dataclass + dataclasses.asdict：
+- 每個實例佔用的位元組
+- 每次 to_dict 分配的位元組
+- to_dict 每秒記錄數
+
+使用方式：
+    python -m benchmarks.bench_records [--records 100000]
+"""
+
+import argparse
+import time
+import tracemalloc
+from dataclasses import asdict, fields, make_dataclass
+from typing import Any, Callable, Dict
+
+from src.models.anchor_data import FlattenedAnchorData
+from src.models.gateway_data import FlattenedGatewayData
+from benchmarks.bench_field_mapping import SAMPLE_ANCHOR, SAMPLE_GATEWAY
+
+
+def legacy_class(cls: type) -> type:
+    """以相同字段建立舊式（無 __slots__）dataclass"""
+    return make_dataclass(
+        f"Legacy{cls.__name__}",
+        [(f.name, f.type, f) for f in fields(cls)],
+    )
+
+
+def legacy_to_dict(instance: Any) -> Dict[str, Any]:
+    """舊版 to_dict：asdict 深拷貝後過濾 None 並合併 extra_data"""
+    return {
+        k: v for k, v in asdict(instance).items()
+        if v is not None and k != "extra_data"
+    } | instance.extra_data
+
+
+def bytes_per_instance(factory: Callable[[], Any], count: int) -> float:
+    """建立 count 個實例並量測平均記憶體"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    instances = [factory() for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del instances
+    return total / count
+
+
+def bytes_per_call(func: Callable[[], Any], count: int) -> float:
+    """量測每次調用分配的位元組（峰值 / 次數，結果保留在列表中）"""
+    tracemalloc.start()
+    results = [func() for _ in range(count)]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+    return peak / count
+
+
+def records_per_second(func: Callable[[], Any], count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return count / (time.perf_counter() - start)
+
+
+def run(records: int) -> Dict[str, Dict[str, float]]:
+    cases = {
+        "gateway": (FlattenedGatewayData, FlattenedGatewayData.from_gateway_data(SAMPLE_GATEWAY)),
+        "anchor": (FlattenedAnchorData, FlattenedAnchorData.from_anchor_data(SAMPLE_ANCHOR)),
+    }
+
+    results = {}
+    for name, (cls, sample) in cases.items():
+        legacy_cls = legacy_class(cls)
+        kwargs = {f.name: getattr(sample, f.name) for f in fields(cls)}
+        legacy_sample = legacy_cls(**kwargs)
+        assert legacy_to_dict(legacy_sample) == sample.to_dict(), f"{name} to_dict 結果不一致"
+
+        sample_count = min(records, 20000)
+        results[name] = {
+            "legacy_bytes_per_instance": round(bytes_per_instance(lambda: legacy_cls(**kwargs), sample_count), 1),
+            "slots_bytes_per_instance": round(bytes_per_instance(lambda: cls(**kwargs), sample_count), 1),
+            "legacy_to_dict_bytes": round(bytes_per_call(lambda: legacy_to_dict(legacy_sample), sample_count), 1),
+            "slots_to_dict_bytes": round(bytes_per_call(sample.to_dict, sample_count), 1),
+            "legacy_to_dict_per_sec": round(records_per_second(lambda: legacy_to_dict(legacy_sample), records)),
+            "slots_to_dict_per_sec": round(records_per_second(sample.to_dict, records)),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="記錄類記憶體/吞吐量基準測試")
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    for name, r in run(args.records).items():
+        print(f"[{name}]")
+        print(f"  instance bytes   legacy {r['legacy_bytes_per_instance']:8.1f} | slots {r['slots_bytes_per_instance']:8.1f}")
+        print(f"  to_dict bytes    legacy {r['legacy_to_dict_bytes']:8.1f} | slots {r['slots_to_dict_bytes']:8.1f}")
+        print(f"  to_dict rec/sec  legacy {r['legacy_to_dict_per_sec']:8.0f} | slots {r['slots_to_dict_per_sec']:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
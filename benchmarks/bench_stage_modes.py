@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+多階段圖 vs 融合 DoFn 吞吐量比較（DirectRunner）
+
+使用方式：
+    python -m benchmarks.bench_stage_modes --pipeline anchor --input-file test_data/anchors.json
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from src.pipelines.gateway_flattening import GatewayFlatteningPipeline
+from src.pipelines.anchor_flattening import AnchorFlatteningPipeline
+from src.pipelines.common import OutputOptions
+from src.transforms.fused_transform import STAGE_MODES
+
+
+PIPELINES = {
+    "gateway": GatewayFlatteningPipeline,
+    "anchor": AnchorFlatteningPipeline,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較 staged / fused 處理圖的吞吐量")
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), default="anchor")
+    parser.add_argument("--input-file", required=True)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.input_file, "rb") as f:
+        records = sum(1 for line in f if line.strip())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in STAGE_MODES:
+            best = float("inf")
+            for i in range(args.repeat):
+                start = time.perf_counter()
+                PIPELINES[args.pipeline]().run(
+                    runner="DirectRunner",
+                    input_type="file",
+                    input_path=args.input_file,
+                    outputs=OutputOptions(output_file=str(Path(tmp) / f"{mode}_{i}")),
+                    stage_mode=mode
+                )
+                best = min(best, time.perf_counter() - start)
+            print(f"{mode:7s} {records} records in {best:.2f}s -> {records / best:,.0f} records/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+合成遙測數據生成器
+
+產生與真實訊息相同形狀（cloudData.pub.msg.data）的 Gateway / Anchor NDJSON，
+可控制設備數、訊息速率、字段空值比例、格式錯誤比例與訊息大小。
+以串流方式寫出，可生成數千萬行而不佔用額外記憶體。
+
+使用方式：
+    python -m benchmarks.generate_telemetry --kind anchor --count 1000000 --output /tmp/anchors.ndjson
+    python -m benchmarks.generate_telemetry --kind gateway --count 50000000 --devices 5000 \\
+        --null-ratio 0.05 --malformed-ratio 0.001 --payload-bytes 1024 --output /tmp/gw.ndjson.gz
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:  # pragma: no cover - 依環境而定
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+KINDS = ("gateway", "anchor")
+
+DEFAULT_START = datetime(2025, 11, 17, 14, 30, 0)
+
+_ROOMS = ("Living Room", "Bedroom", "Kitchen", "Bathroom", "Hallway", "Dining Room")
+_ANCHOR_NAMES = ("Bed Anchor", "Sofa Anchor", "Chair Anchor", "Door Anchor", "Toilet Anchor")
+_STATUSES = ("online", "online", "online", "online", "offline")
+
+# 可被設為 null 的數值字段（cloudData.pub.msg.data 內）
+_NULLABLE_DATA_FIELDS = {
+    "gateway": ("battery_voltage", "rssi"),
+    "anchor": ("battery_voltage", "rssi", "heart_rate", "temperature"),
+}
+
+# 格式錯誤的訊息樣式
+_MALFORMED = (
+    lambda rng, payload: payload[: rng.randint(1, max(1, len(payload) - 1))],   # 截斷
+    lambda rng, payload: b"[" + payload + b"]",                                   # 非物件
+    lambda rng, payload: b"not json " + payload[:16],                              # 非 JSON
+    lambda rng, payload: b'"' + payload.replace(b'"', b"'") + b'"',               # 字符串
+)
+
+
+def _mac(rng: random.Random) -> str:
+    return ":".join(f"{rng.randrange(256):02X}" for _ in range(6))
+
+
+def _position(rng: random.Random) -> Dict[str, float]:
+    return {
+        "x": round(rng.uniform(0, 30), 1),
+        "y": round(rng.uniform(0, 30), 1),
+        "z": round(rng.uniform(0, 2.5), 1),
+    }
+
+
+def gateway_payload(rng: random.Random, device: int, last_seen: str,
+                    null_ratio: float = 0.0, invalid_ratio: float = 0.0,
+                    mac: Optional[str] = None) -> Dict[str, Any]:
+    """
+    生成一筆 Gateway 原始訊息
+
+    Args:
+        rng: 隨機數生成器
+        device: 設備編號
+        last_seen: lastSeen 時間戳
+        null_ratio: 每個數值字段為 null 的機率
+        invalid_ratio: 數值超出驗證範圍的機率
+        mac: 設備 MAC 地址（None 表示隨機生成）
+    """
+    data = {
+        "battery_voltage": round(rng.uniform(3.0, 4.2), 2),
+        "rssi": rng.randint(-90, -30),
+    }
+    if invalid_ratio and rng.random() < invalid_ratio:
+        data["rssi"] = rng.randint(1, 20)
+    _apply_nulls(rng, data, _NULLABLE_DATA_FIELDS["gateway"], null_ratio)
+
+    return {
+        "gateway_id": f"gw_{device:06d}",
+        "name": _ROOMS[device % len(_ROOMS)],
+        "ip_address": f"10.{device >> 16 & 255}.{device >> 8 & 255}.{device & 255}",
+        "mac_address": mac or _mac(rng),
+        "cloudData": {
+            "id": device,
+            "gateway_id": device,
+            "pub": {"msg": {"data": data}},
+            "fw_version": "v2.1.0",
+        },
+        "position": _position(rng),
+        "status": _STATUSES[rng.randrange(len(_STATUSES))],
+        "lastSeen": last_seen,
+    }
+
+
+def anchor_payload(rng: random.Random, device: int, last_seen: str,
+                   null_ratio: float = 0.0, invalid_ratio: float = 0.0,
+                   mac: Optional[str] = None) -> Dict[str, Any]:
+    """
+    生成一筆 Anchor 原始訊息（參數同 gateway_payload）
+    """
+    data = {
+        "battery_voltage": round(rng.uniform(3.0, 4.2), 2),
+        "rssi": rng.randint(-90, -30),
+        "heart_rate": rng.randint(55, 110),
+        "temperature": round(rng.uniform(36.0, 37.8), 1),
+    }
+    if invalid_ratio and rng.random() < invalid_ratio:
+        data["heart_rate"] = rng.choice((0, 15, 220, 250))
+    _apply_nulls(rng, data, _NULLABLE_DATA_FIELDS["anchor"], null_ratio)
+
+    position = _position(rng)
+    return {
+        "anchor_id": f"anchor_{device:06d}",
+        "gateway_id": f"gw_{device // 8:06d}",
+        "name": _ANCHOR_NAMES[device % len(_ANCHOR_NAMES)],
+        "mac_address": mac or _mac(rng),
+        "cloudData": {
+            "id": device,
+            "gateway_id": device // 8,
+            "pub": {"msg": {"data": data}},
+            "fw_update": 0,
+            "led": rng.randint(0, 1),
+            "ble": 1,
+            "initiator": rng.randint(0, 1),
+            "position": position,
+        },
+        "position": position,
+        "status": _STATUSES[rng.randrange(len(_STATUSES))],
+        "lastSeen": last_seen,
+        "isBound": rng.random() < 0.9,
+    }
+
+
+def _apply_nulls(rng: random.Random, data: Dict[str, Any], fields, null_ratio: float):
+    if null_ratio:
+        for field in fields:
+            if rng.random() < null_ratio:
+                data[field] = None
+
+
+_PAYLOADS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "gateway": gateway_payload,
+    "anchor": anchor_payload,
+}
+
+
+def generate(kind: str,
+             count: int,
+             devices: int = 100,
+             rate: float = 100.0,
+             null_ratio: float = 0.0,
+             malformed_ratio: float = 0.0,
+             invalid_ratio: float = 0.0,
+             payload_bytes: int = 0,
+             seed: int = 42,
+             start: datetime = DEFAULT_START) -> Iterator[bytes]:
+    """
+    產生 NDJSON 行（不含換行符）
+
+    Args:
+        kind: "gateway" 或 "anchor"
+        count: 訊息數
+        devices: 設備數（訊息依序輪流分配給各設備）
+        rate: 每秒訊息數（決定 lastSeen 的間隔）
+        null_ratio: 數值字段為 null 的機率
+        malformed_ratio: 格式錯誤訊息的比例（無法解析或非 JSON 物件）
+        invalid_ratio: 數值超出驗證範圍的比例
+        payload_bytes: 每筆訊息的最小位元組數（以 padding 字段補齊），0 表示不補齊
+        seed: 隨機種子（相同參數產生相同輸出）
+        start: 第一筆訊息的 lastSeen
+
+    Yields:
+        bytes
+    """
+    if kind not in _PAYLOADS:
+        raise ValueError(f"未支持的設備類型: {kind}")
+    if rate <= 0:
+        raise ValueError(f"訊息速率必須大於 0: {rate}")
+
+    rng = random.Random(seed)
+    make_payload = _PAYLOADS[kind]
+    step = timedelta(seconds=1.0 / rate)
+    devices = max(1, devices)
+    macs = [_mac(rng) for _ in range(devices)]
+
+    # lastSeen 只到秒；同一秒內重用字符串
+    second = None
+    last_seen = ""
+    timestamp = start
+
+    for i in range(count):
+        current = timestamp.replace(microsecond=0)
+        if current != second:
+            second = current
+            last_seen = current.isoformat() + "Z"
+        timestamp += step
+
+        device = i % devices
+        payload = make_payload(rng, device, last_seen, null_ratio, invalid_ratio, macs[device])
+        line = _dumps(payload)
+        if payload_bytes and len(line) < payload_bytes:
+            # padding 是未知字段，會進入 extra_data；先以空值量出字段本身的長度
+            payload["padding"] = ""
+            overhead = len(_dumps(payload))
+            payload["padding"] = "x" * max(0, payload_bytes - overhead)
+            line = _dumps(payload)
+        if malformed_ratio and rng.random() < malformed_ratio:
+            line = _MALFORMED[rng.randrange(len(_MALFORMED))](rng, line)
+        yield line
+
+
+def write_ndjson(path: str, lines: Iterator[bytes], buffer_lines: int = 10000) -> int:
+    """
+    將行寫入 NDJSON 文件（路徑以 .gz 結尾時以 gzip 壓縮，"-" 表示標準輸出）
+
+    Returns:
+        寫出的行數
+    """
+    if path == "-":
+        out, close = sys.stdout.buffer, False
+    elif path.endswith(".gz"):
+        out, close = gzip.open(path, "wb", compresslevel=1), True
+    else:
+        out, close = open(path, "wb", buffering=1 << 20), True
+
+    written = 0
+    buffer = []
+    try:
+        for line in lines:
+            buffer.append(line)
+            if len(buffer) >= buffer_lines:
+                out.write(b"\n".join(buffer) + b"\n")
+                written += len(buffer)
+                buffer.clear()
+        if buffer:
+            out.write(b"\n".join(buffer) + b"\n")
+            written += len(buffer)
+    finally:
+        if close:
+            out.close()
+    return written
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="生成合成的 Gateway / Anchor NDJSON 遙測數據")
+    parser.add_argument("--kind", choices=KINDS, default="anchor")
+    parser.add_argument("--count", type=int, default=100000, help="訊息數")
+    parser.add_argument("--devices", type=int, default=100, help="設備數")
+    parser.add_argument("--rate", type=float, default=100.0, help="每秒訊息數（lastSeen 間隔）")
+    parser.add_argument("--null-ratio", type=float, default=0.0, help="數值字段為 null 的機率")
+    parser.add_argument("--malformed-ratio", type=float, default=0.0, help="格式錯誤訊息的比例")
+    parser.add_argument("--invalid-ratio", type=float, default=0.0, help="數值超出驗證範圍的比例")
+    parser.add_argument("--payload-bytes", type=int, default=0, help="每筆訊息的最小位元組數")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="-", help="輸出路徑（.gz 壓縮，- 為標準輸出）")
+    args = parser.parse_args(argv)
+
+    written = write_ndjson(args.output, generate(
+        args.kind, args.count,
+        devices=args.devices,
+        rate=args.rate,
+        null_ratio=args.null_ratio,
+        malformed_ratio=args.malformed_ratio,
+        invalid_ratio=args.invalid_ratio,
+        payload_bytes=args.payload_bytes,
+        seed=args.seed,
+    ))
+    if args.output != "-":
+        print(f"{written} 筆 {args.kind} 訊息 -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+基準測試套件
+
+以合成遙測數據量測：
+- model：原始/扁平化模型的 from_dict / from_*_data / to_dict
+- dofn：各 DoFn 直接調用（不經 runner）的每秒記錄數
+- pipeline：DirectRunner 端到端（staged / fused）
+- compression：gzip / zstd 各級別的壓縮、解壓每秒記錄數與壓縮比（CPU 與位元組的取捨）
+- format：扁平化記錄以 NDJSON 與 Parquet 輸出的寫入、全表掃描、單欄掃描速度與文件大小比
+- coder：扁平化記錄以緊湊 Coder 與預設 Coder（FastPrimitivesCoder）編碼 / 解碼的速度與位元組比
+
+結果以 JSON 保存，可與其他提交的基準比較。
+
+使用方式：
+    python -m benchmarks.run_benchmarks --records 20000 --save benchmarks/baselines/local.json
+    python -m benchmarks.run_benchmarks --compare benchmarks/baselines/local.json --fail-threshold 0.15
+    python -m benchmarks.run_benchmarks --suite dofn --suite model --kind anchor --records 50000
+    python -m benchmarks.run_benchmarks --suite compression --kind gateway
+    python -m benchmarks.run_benchmarks --suite coder
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import apache_beam as beam
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+
+from benchmarks.generate_telemetry import generate, write_ndjson
+from src.models.anchor_data import AnchorData, FlattenedAnchorData
+from src.models.gateway_data import GatewayData, FlattenedGatewayData
+from src.pipelines.anchor_flattening import AnchorFlatteningPipeline
+from src.pipelines.common import OutputOptions
+from src.pipelines.gateway_flattening import GatewayFlatteningPipeline
+from src.transforms.batch_validation import BatchValidateTransform
+from src.transforms.custom_coders import FlattenedRecordCoder
+from src.transforms.decode_transform import DecodeJsonTransform
+from src.transforms.flatten_transform import (
+    FlattenGatewayTransform, FlattenAnchorTransform, EnrichDataTransform, flatten_element, enrich_record,
+)
+from src.transforms.fused_transform import FusedFlattenTransform, STAGE_MODES
+from src.transforms.parquet_sink import ParquetPartitionWriter
+from src.transforms.validation_transform import ValidateGatewayTransform, ValidateAnchorTransform
+from src.utils.compression import GZIP, ZSTD, open_input, open_output, output_suffix
+
+
+SUITES = ("model", "dofn", "pipeline", "compression", "format", "coder")
+
+# (編碼, 級別)
+COMPRESSION_CASES = ((GZIP, 1), (GZIP, 6), (GZIP, 9), (ZSTD, 1), (ZSTD, 3), (ZSTD, 9))
+
+_MODELS = {
+    "gateway": (GatewayData, FlattenedGatewayData, FlattenedGatewayData.from_gateway_data),
+    "anchor": (AnchorData, FlattenedAnchorData, FlattenedAnchorData.from_anchor_data),
+}
+
+_PIPELINES = {
+    "gateway": GatewayFlatteningPipeline,
+    "anchor": AnchorFlatteningPipeline,
+}
+
+_DOFNS = {
+    "gateway": (FlattenGatewayTransform, ValidateGatewayTransform),
+    "anchor": (FlattenAnchorTransform, ValidateAnchorTransform),
+}
+
+
+def best_rate(func: Callable[[], Any], items: int, repeat: int, warmup: bool = True) -> float:
+    """先預熱一次（快取、編譯後的提取函數），再執行 repeat 次，返回最佳的每秒處理項數"""
+    if warmup:
+        func()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return items / best if best > 0 else float("inf")
+
+
+def _drain(outputs: Iterable) -> None:
+    for _ in outputs:
+        pass
+
+
+def _run_dofn(dofn, elements: List[Any]) -> Callable[[], None]:
+    dofn.setup()
+    process = dofn.process
+
+    def run():
+        for element in elements:
+            _drain(process(element))
+    return run
+
+
+def bench_models(kind: str, samples: List[Dict[str, Any]], repeat: int) -> Dict[str, float]:
+    """模型方法（每秒記錄數）"""
+    raw_cls, _, flatten = _MODELS[kind]
+    raws = [raw_cls.from_dict(s) for s in samples]
+    flats = [flatten(r) for r in raws]
+    n = len(samples)
+    return {
+        f"model.{kind}.from_dict": best_rate(lambda: [raw_cls.from_dict(s) for s in samples], n, repeat),
+        f"model.{kind}.flatten": best_rate(lambda: [flatten(r) for r in raws], n, repeat),
+        f"model.{kind}.to_dict": best_rate(lambda: [f.to_dict() for f in flats], n, repeat),
+    }
+
+
+def bench_dofns(kind: str, lines: List[bytes], repeat: int, batch_size: int = 500) -> Dict[str, float]:
+    """各 DoFn 直接調用（每秒記錄數；validate / enrich 以已扁平化的有效形狀記錄為輸入）"""
+    flatten_cls, validate_cls = _DOFNS[kind]
+    n = len(lines)
+    batches = [lines[i:i + batch_size] for i in range(0, n, batch_size)]
+
+    decoded = [r for r in (_safe_loads(line) for line in lines) if isinstance(r, dict)]
+    flattened = [flatten_element(r, kind) for r in decoded]
+    flattened = [r for r in flattened if not r.get("error")]
+    flat_batches = [flattened[i:i + batch_size] for i in range(0, len(flattened), batch_size)]
+    raw_batches = [decoded[i:i + batch_size] for i in range(0, len(decoded), batch_size)]
+
+    results = {
+        f"dofn.{kind}.decode_batch": best_rate(_run_dofn(DecodeJsonTransform(), batches), n, repeat),
+        f"dofn.{kind}.flatten": best_rate(_run_dofn(flatten_cls(), decoded), len(decoded), repeat),
+        f"dofn.{kind}.validate": best_rate(_run_dofn(validate_cls(), flattened), len(flattened), repeat),
+        f"dofn.{kind}.validate_batch": best_rate(
+            _run_dofn(BatchValidateTransform(kind), flat_batches), len(flattened), repeat
+        ),
+        f"dofn.{kind}.enrich": best_rate(_run_dofn(EnrichDataTransform(), flattened), len(flattened), repeat),
+        f"dofn.{kind}.fused_record": best_rate(
+            _run_dofn(FusedFlattenTransform(kind, "record"), decoded), len(decoded), repeat
+        ),
+        f"dofn.{kind}.fused_batch": best_rate(
+            _run_dofn(FusedFlattenTransform(kind, "batch"), raw_batches), len(decoded), repeat
+        ),
+    }
+    return results
+
+
+def _safe_loads(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def bench_pipelines(kind: str, input_path: str, records: int, repeat: int) -> Dict[str, float]:
+    """DirectRunner 端到端（每秒記錄數）"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in STAGE_MODES:
+            def run(mode=mode):
+                _PIPELINES[kind]().run(
+                    runner="DirectRunner",
+                    input_type="file",
+                    input_path=input_path,
+                    outputs=OutputOptions(output_file=str(Path(tmp) / f"{kind}_{mode}")),
+                    stage_mode=mode,
+                )
+            results[f"pipeline.{kind}.{mode}"] = best_rate(run, records, repeat, warmup=False)
+    return results
+
+
+def bench_compression(kind: str, lines: List[bytes], repeat: int) -> Dict[str, float]:
+    """
+    串流壓縮 / 解壓（每秒記錄數）與壓縮比
+
+    以與 Pipeline 輸出相同的 open_output / open_input 寫入並讀回臨時文件。
+    """
+    results = {}
+    n = len(lines)
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = Path(tmp) / "raw.ndjson"
+        write_ndjson(str(raw_path), iter(lines))
+        raw_size = raw_path.stat().st_size
+
+        for codec, level in COMPRESSION_CASES:
+            path = str(Path(tmp) / f"out{output_suffix(codec)}")
+
+            def write(codec=codec, level=level, path=path):
+                with open_output(path, codec, level) as f:
+                    for line in lines:
+                        f.write(line)
+                        f.write(b"\n")
+
+            def read(codec=codec, path=path):
+                with open_input(path, codec) as f:
+                    _drain(f)
+
+            name = f"compression.{kind}.{codec}-{level}"
+            results[f"{name}.compress"] = best_rate(write, n, repeat)
+            results[f"{name}.decompress"] = best_rate(read, n, repeat)
+            results[f"{name}.ratio"] = raw_size / Path(path).stat().st_size
+    return results
+
+
+def _output_records(kind: str, lines: List[bytes]) -> List[Dict[str, Any]]:
+    """扁平化並增強後的有效記錄（與 Pipeline 輸出的記錄形狀相同）"""
+    decoded = [r for r in (_safe_loads(line) for line in lines) if isinstance(r, dict)]
+    records = [enrich_record(r) for r in (flatten_element(r, kind) for r in decoded) if not r.get("error")]
+    for record in records:
+        record["validation_code"] = 0
+        record["is_valid"] = True
+    return records
+
+
+def bench_formats(kind: str, lines: List[bytes], repeat: int) -> Dict[str, float]:
+    """
+    NDJSON 與 Parquet 輸出比較（每秒記錄數；size.ratio 為 NDJSON 大小 / Parquet 大小）
+
+    scan 讀取所有欄位；scan_column 只讀取 heart_rate / rssi 一個欄位（NDJSON 仍需解析整行）。
+    """
+    column = "heart_rate" if kind == "anchor" else "rssi"
+    records = _output_records(kind, lines)
+    n = len(records)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        ndjson_path = Path(tmp) / "records.ndjson"
+        parquet_root = str(Path(tmp) / "parquet")
+
+        def write_json():
+            with open(ndjson_path, "w") as f:
+                for record in records:
+                    f.write(json.dumps(record))
+                    f.write("\n")
+
+        def write_parquet():
+            writer = ParquetPartitionWriter(parquet_root, kind)
+            for record in records:
+                writer.write(record)
+            return writer.close()
+
+        def scan_json(field=None):
+            with open(ndjson_path, "rb") as f:
+                values = [json.loads(line) for line in f]
+            if field:
+                values = [v.get(field) for v in values]
+
+        def scan_parquet(columns=None):
+            pads.dataset(parquet_root, format="parquet", partitioning="hive").to_table(columns=columns)
+
+        results[f"format.{kind}.ndjson.write"] = best_rate(write_json, n, repeat)
+        results[f"format.{kind}.ndjson.scan"] = best_rate(scan_json, n, repeat)
+        results[f"format.{kind}.ndjson.scan_column"] = best_rate(lambda: scan_json(column), n, repeat)
+
+        # 每次寫入產生新文件；計時後只保留最後一次寫出的文件
+        shutil.rmtree(parquet_root, ignore_errors=True)
+        results[f"format.{kind}.parquet.write"] = best_rate(write_parquet, n, repeat, warmup=False)
+        shutil.rmtree(parquet_root, ignore_errors=True)
+        paths = write_parquet()
+        results[f"format.{kind}.parquet.scan"] = best_rate(scan_parquet, n, repeat)
+        results[f"format.{kind}.parquet.scan_column"] = best_rate(lambda: scan_parquet([column]), n, repeat)
+
+        parquet_size = sum(Path(path).stat().st_size for path in paths)
+        results[f"format.{kind}.size.ratio"] = ndjson_path.stat().st_size / parquet_size
+        assert sum(pq.read_metadata(path).num_rows for path in paths) == n
+    return results
+
+
+def bench_coders(kind: str, lines: List[bytes], repeat: int) -> Dict[str, float]:
+    """
+    緊湊 Coder（FlattenedRecordCoder）與預設 Coder 的編碼 / 解碼（每秒記錄數）
+
+    size.ratio 為預設 Coder 編碼總位元組 / 緊湊 Coder 編碼總位元組。
+    """
+    records = _output_records(kind, lines)
+    n = len(records)
+    results = {}
+    sizes = {}
+    for name, coder in (("default", beam.coders.FastPrimitivesCoder()), ("compact", FlattenedRecordCoder(kind))):
+        encode = coder.encode
+        decode = coder.decode
+        encoded = [encode(record) for record in records]
+        assert all(decode(e) == r for e, r in zip(encoded, records))
+        sizes[name] = sum(len(e) for e in encoded)
+        results[f"coder.{kind}.{name}.encode"] = best_rate(lambda: [encode(r) for r in records], n, repeat)
+        results[f"coder.{kind}.{name}.decode"] = best_rate(lambda: [decode(e) for e in encoded], n, repeat)
+    results[f"coder.{kind}.size.ratio"] = sizes["default"] / sizes["compact"]
+    return results
+
+
+def run_suites(suites: Iterable[str],
+               kinds: Iterable[str],
+               records: int,
+               pipeline_records: int,
+               repeat: int,
+               seed: int = 42) -> Dict[str, Any]:
+    """
+    執行基準測試
+
+    Returns:
+        {"meta": {...}, "results": {名稱: 每秒記錄數}}
+    """
+    suites = list(suites)
+    results: Dict[str, float] = {}
+
+    for kind in kinds:
+        lines = list(generate(kind, records, null_ratio=0.02, malformed_ratio=0.001,
+                              invalid_ratio=0.01, seed=seed))
+        if "model" in suites:
+            samples = [json.loads(line) for line in generate(kind, records, seed=seed)]
+            results.update(bench_models(kind, samples, repeat))
+        if "dofn" in suites:
+            results.update(bench_dofns(kind, lines, repeat))
+        if "pipeline" in suites:
+            with tempfile.TemporaryDirectory() as tmp:
+                input_path = str(Path(tmp) / f"{kind}.ndjson")
+                write_ndjson(input_path, generate(kind, pipeline_records, seed=seed))
+                results.update(bench_pipelines(kind, input_path, pipeline_records, repeat))
+        if "compression" in suites:
+            results.update(bench_compression(kind, lines, repeat))
+        if "format" in suites:
+            results.update(bench_formats(kind, lines, repeat))
+        if "coder" in suites:
+            results.update(bench_coders(kind, lines, repeat))
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "records": records,
+            "pipeline_records": pipeline_records,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": {name: round(rate, 2 if name.endswith(".ratio") else 1)
+                    for name, rate in sorted(results.items())},
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    比較兩份基準結果
+
+    Returns:
+        [{"name", "baseline", "current", "change"}]，change 為相對變化（+0.1 表示快 10%）
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+    for name, value in current.get("results", {}).items():
+        base = base_results.get(name)
+        change = (value - base) / base if base else None
+        rows.append({"name": name, "baseline": base, "current": value, "change": change})
+    return rows
+
+
+def _unit(name: str) -> str:
+    return "x" if name.endswith(".ratio") else "rec/s"
+
+
+def format_results(report: Dict[str, Any], comparison: Optional[List[Dict[str, Any]]] = None) -> str:
+    """格式化為文字表格"""
+    lines = [f"commit={report['meta']['commit']} python={report['meta']['python']}"]
+    if comparison is None:
+        width = max((len(n) for n in report["results"]), default=10)
+        lines.extend(
+            f"{name:{width}s} {rate:>14,.1f} {_unit(name)}" for name, rate in report["results"].items()
+        )
+        return "\n".join(lines)
+
+    width = max((len(r["name"]) for r in comparison), default=10)
+    for row in comparison:
+        base = f"{row['baseline']:>14,.1f}" if row["baseline"] is not None else f"{'-':>14s}"
+        change = f"{row['change']:+8.1%}" if row["change"] is not None else f"{'new':>8s}"
+        lines.append(f"{row['name']:{width}s} {base} -> {row['current']:>14,.1f} {_unit(row['name']):5s} {change}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gateway / Anchor 基準測試套件")
+    parser.add_argument("--suite", action="append", choices=SUITES, help="要執行的套件（可重複，預設全部）")
+    parser.add_argument("--kind", action="append", choices=sorted(_MODELS), help="設備類型（可重複，預設全部）")
+    parser.add_argument("--records", type=int, default=20000, help="model / dofn 套件的記錄數")
+    parser.add_argument("--pipeline-records", type=int, default=20000, help="pipeline 套件的記錄數")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="將結果保存為 JSON 基準")
+    parser.add_argument("--compare", help="與既有的 JSON 基準比較")
+    parser.add_argument("--fail-threshold", type=float, default=None,
+                        help="任一項目變慢超過此比例（如 0.15）時返回非零")
+    args = parser.parse_args(argv)
+
+    report = run_suites(
+        args.suite or SUITES, args.kind or sorted(_MODELS),
+        args.records, args.pipeline_records, args.repeat, args.seed
+    )
+
+    comparison = None
+    if args.compare:
+        with open(args.compare) as f:
+            comparison = compare(json.load(f), report)
+    print(format_results(report, comparison))
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+    if comparison and args.fail_threshold is not None:
+        regressions = [
+            r for r in comparison
+            if r["change"] is not None and r["change"] < -args.fail_threshold
+        ]
+        if regressions:
+            print(f"{len(regressions)} 項變慢超過 {args.fail_threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,11 +17,25 @@ class Config:
     # Pub/Sub 配置
     gateway_pubsub_topic: Optional[str] = None
     anchor_pubsub_topic: Optional[str] = None
+    # 同時發佈 Gateway 與 Anchor 的主題（依內容判定類型）
+    mixed_pubsub_topic: Optional[str] = None
     
     # BigQuery 配置
     bigquery_dataset: str = "senior_care_analytics"
     gateway_table: str = "gateway_events"
-    anchor_table: "anchor_events"
+    anchor_table: str = "anchor_events"
+    
+    # Redis 熱層配置（最新設備狀態；redis_url 如 redis://host:6379/0，None 表示不寫入）
+    redis_url: Optional[str] = None
+    redis_ttl_seconds: int = 3600
+    redis_channel: str = "devices:updates"
+    
+    # 設備登記表快照（CSV / JSON / SQLite，補上 facility_id / room_id / resident_id；None 表示不增強）
+    device_registry: Optional[str] = None
+    device_registry_ttl_seconds: int = 300
+    
+    # 危急告警的低延遲輸出（Pub/Sub 主題 projects/<p>/topics/<t> 或 tcp://host:port，None 表示不啟用）
+    priority_alert_sink: Optional[str] = None
     
     # 儲存空間配置
     gcs_temp_bucket: str = None
@@ -36,6 +50,15 @@ class Config:
     # 日誌配置
     log_level: str = "INFO"
     
+    # 驗證規則（按設備類型，None 表示使用內建規則）
+    validation_rules: Optional[Dict[str, Any]] = None
+    
+    # 變更抑制的死區（按設備類型的 {字段: 死區}，None 表示使用內建死區）
+    change_deadbands: Optional[Dict[str, Dict[str, float]]] = None
+    
+    # 生命體徵異常偵測閾值（{字段: {z_score, max_rate_per_minute, min_stddev}}，None 表示使用內建閾值）
+    anomaly_thresholds: Optional[Dict[str, Dict[str, float]]] = None
+    
     def __post_init__(self):
         """Post-initialization validation"""
         if not self.project_id:
@@ -52,6 +75,8 @@ def get_config(env: str = "dev") -> Config:
     """
     讀取配置文件
     
+    環境變數 GCP_PROJECT_ID / GCP_REGION（部署時設置）覆寫 YAML 中的 project_id / region。
+    
     Args:
         env: 環境名稱 ("dev", "test", "prod")
         
@@ -59,32 +84,27 @@ def get_config(env: str = "dev") -> Config:
         Config 對象
     """
     
-    # 優先讀取環境變數
-    project_id = os.getenv("GCP_PROJECT_ID")
-    region = os.getenv("GCP_REGION", "asia-east1")
+    config_file = os.path.join(
+        os.path.dirname(__file__),
+        f"../../config/{env}.yaml"
+    )
     
-    # 如果環境變數未設置，讀取 YAML 配置文件
-    if not project_id:
-        config_file = os.path.join(
-            os.path.dirname(__file__),
-            f"../../../config/{env}.yaml"
-        )
-        
-        if os.path.exists(config_file):
-            with open(config_file, "r", encoding="utf-8") as f:
-                config_data = yaml.safe_load(f)
-        else:
-            # 使用默認配置
-            config_data = {
-                "project_id": "your-gcp-project-id",
-                "region": "asia-east1"
-            }
+    if os.path.exists(config_file):
+        with open(config_file, "r", encoding="utf-8") as f:
+            config_data = yaml.safe_load(f) or {}
     else:
+        # 使用默認配置
         config_data = {
-            "project_id": project_id,
-            "region": region
+            "project_id": "your-gcp-project-id",
+            "region": "asia-east1"
         }
     
+    # 環境變數只覆寫 project_id / region，其餘配置（驗證規則、主題、Redis 等）仍取自 YAML
+    if os.getenv("GCP_PROJECT_ID"):
+        config_data["project_id"] = os.getenv("GCP_PROJECT_ID")
+    if os.getenv("GCP_REGION"):
+        config_data["region"] = os.getenv("GCP_REGION")
+    
     return Config(**config_data)
 
 
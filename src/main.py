@@ -4,12 +4,80 @@ Main entry point for DataFlow Pipeline
 
 import argparse
 import sys
+import time
 import logging
 
 from src.pipelines.gateway_flattening import GatewayFlatteningPipeline
 from src.pipelines.anchor_flattening import AnchorFlatteningPipeline
+from src.pipelines.combined_flattening import CombinedFlatteningPipeline
+from src.pipelines.common import OutputOptions
+from src.pipelines.local_fast import LocalFastEngine, DEFAULT_CHUNK_BYTES
 from src.config import get_config
 from src.utils import setup_logger
+from src.utils.json_codec import BACKEND_CHOICES
+from src.utils.metrics import format_metrics_table
+from src.transforms.fused_transform import STAGE_MODES, VALIDATION_MODES
+from src.transforms.ndjson_source import FILE_READERS
+from src.utils.compression import CODECS
+from src.transforms.parquet_sink import OUTPUT_FORMATS, DEFAULT_ROW_GROUP_SIZE
+from src.transforms.bigquery_sink import BIGQUERY_METHODS
+from src.transforms.change_suppression import DEFAULT_MAX_SILENCE_SECONDS
+
+
+def _print_metrics(label: str, runner: str, result, elapsed_seconds: float):
+    """本地執行後輸出 Beam Metrics 摘要表"""
+    if runner != "DirectRunner" or result is None:
+        return
+    print(f"\n[{label}] Pipeline 指標（{elapsed_seconds:.2f}s）")
+    print(format_metrics_table(result, elapsed_seconds))
+
+
+# LocalFast 只做解碼、扁平化、驗證與 NDJSON 輸出；以下參數需要 Beam runner
+_LOCAL_FAST_UNSUPPORTED = (
+    "output_bigquery", "output_redis", "output_rollups", "output_alerts", "priority_sink",
+    "device_registry", "output_format", "file_reader", "stage_mode", "suppress_unchanged",
+)
+
+
+def _local_fast_unsupported(args, parser) -> list:
+    """返回 LocalFast 不支持、但被設為非預設值的命令行參數"""
+    return [
+        "--" + name.replace("_", "-")
+        for name in _LOCAL_FAST_UNSUPPORTED
+        if getattr(args, name) != parser.get_default(name)
+    ]
+
+
+def _run_local_fast(args, config, logger) -> int:
+    """以本地多進程引擎執行（不經 Beam runner）"""
+    if args.pipeline == "both":
+        input_paths = {
+            "gateway": args.gateway_input_file,
+            "anchor": args.anchor_input_file,
+            "mixed": args.mixed_input_file,
+        }
+    else:
+        input_paths = {args.pipeline: args.input_file}
+    
+    try:
+        engine = LocalFastEngine(
+            workers=args.workers,
+            chunk_bytes=args.chunk_mb << 20,
+            json_backend=args.json_backend,
+            validation_mode=args.validation_mode,
+            validation_rules=config.validation_rules,
+            output_compression=args.output_compression,
+            compression_level=args.compression_level
+        )
+        stats = engine.run(input_paths, args.output_file)
+    except Exception as e:
+        logger.error(f"LocalFast 執行失敗: {str(e)}", exc_info=True)
+        return 1
+    
+    logger.info(f"✅ LocalFast 完成 ({stats.shards} 個分片, {stats.workers} 個進程)")
+    print(f"\n[LocalFast] 計數（{stats.elapsed_seconds:.2f}s）")
+    print(stats.format_table())
+    return 0
 
 
 def main():
@@ -22,9 +90,9 @@ def main():
     # 基本參數
     parser.add_argument(
         "--runner",
-        choices=["DirectRunner", "DataflowRunner"],
+        choices=["DirectRunner", "DataflowRunner", "LocalFast"],
         default="DirectRunner",
-        help="Pipeline 執行器 (default: DirectRunner)"
+        help="Pipeline 執行器；LocalFast 為不經 Beam 的本地多進程回填引擎 (default: DirectRunner)"
     )
     
     parser.add_argument(
@@ -38,7 +106,7 @@ def main():
         "--pipeline",
         choices=["gateway", "anchor", "both"],
         default="gateway",
-        help="要執行的 Pipeline (default: gateway)"
+        help="要執行的 Pipeline；both 以單一 Pipeline 同時處理兩種數據 (default: gateway)"
     )
     
     # 輸入參數
@@ -54,9 +122,31 @@ def main():
         help="輸入文件路徑 (file 模式)"
     )
     
+    parser.add_argument(
+        "--gateway-input-file",
+        help="Gateway 輸入文件路徑 (file 模式，--pipeline both)"
+    )
+    
+    parser.add_argument(
+        "--anchor-input-file",
+        help="Anchor 輸入文件路徑 (file 模式，--pipeline both)"
+    )
+    
+    parser.add_argument(
+        "--mixed-input-file",
+        help="同時含 Gateway 與 Anchor 的輸入文件，依內容判定類型 (file 模式，--pipeline both)"
+    )
+    
     parser.add_argument(
         "--input-topic",
-        help="Pub/Sub 主題 (pubsub 模式)"
+        help="Pub/Sub 主題 (pubsub 模式；--pipeline both 時使用配置中的兩個主題)"
+    )
+    
+    parser.add_argument(
+        "--file-reader",
+        choices=FILE_READERS,
+        default="text",
+        help="text: ReadFromText；mmap: 記憶體映射讀取本地 NDJSON (default: text)"
     )
     
     # 輸出參數
@@ -67,7 +157,141 @@ def main():
     
     parser.add_argument(
         "--output-bigquery",
-        help="BigQuery 輸出表 (格式: project:dataset.table)"
+        help="BigQuery 輸出表 (格式: project:dataset.table)；"
+             "--pipeline both 時為數據集 (project:dataset)，表名取自配置"
+    )
+    
+    parser.add_argument(
+        "--bigquery-method",
+        choices=BIGQUERY_METHODS,
+        default="streaming",
+        help="streaming: streaming insert；file_loads: 暫存 Parquet 後以 load job 載入，"
+             "僅 file 輸入 (default: streaming)"
+    )
+    
+    parser.add_argument(
+        "--bigquery-temp-location",
+        default=None,
+        help="file_loads 的暫存目錄 (default: 配置中的 temp_location)"
+    )
+    
+    parser.add_argument(
+        "--output-redis",
+        default=None,
+        help="Redis URL (redis://host:6379/0)，寫入最新設備狀態並發佈變更通知 "
+             "(default: 配置中的 redis_url)"
+    )
+    
+    parser.add_argument(
+        "--output-rollups",
+        default=None,
+        help="Anchor 生命體徵每分鐘 / 每小時彙總的輸出前綴（--pipeline anchor / both）"
+    )
+    
+    parser.add_argument(
+        "--output-alerts",
+        default=None,
+        help="Anchor 生命體徵異常告警（相對個人基線的 z-score / 變化率）的輸出前綴（--pipeline anchor / both）"
+    )
+    
+    parser.add_argument(
+        "--priority-sink",
+        default=None,
+        help="危急告警（心率 / 體溫超出範圍、設備離線、生命體徵異常）的低延遲輸出："
+             "Pub/Sub 主題或 tcp://host:port (default: 配置中的 priority_alert_sink)"
+    )
+    
+    parser.add_argument(
+        "--device-registry",
+        default=None,
+        help="設備登記表快照（.csv / .json / .ndjson / .sqlite），為有效記錄補上 "
+             "facility_id / room_id / resident_id (default: 配置中的 device_registry)"
+    )
+    
+    parser.add_argument(
+        "--output-compression",
+        choices=CODECS,
+        default="none",
+        help="文件輸出（有效數據、錯誤日誌、dead letter）的壓縮編碼 (default: none)"
+    )
+    
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        default=None,
+        help="壓縮級別：gzip 1-9 / zstd 1-22 (default: gzip 6 / zstd 3)"
+    )
+    
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="ndjson",
+        help="有效數據的文件格式；parquet 時 --output-file 為分區數據集根目錄 (default: ndjson)"
+    )
+    
+    parser.add_argument(
+        "--row-group-size",
+        type=int,
+        default=DEFAULT_ROW_GROUP_SIZE,
+        help=f"Parquet 每個 row group 的記錄數 (default: {DEFAULT_ROW_GROUP_SIZE})"
+    )
+    
+    # 解碼參數
+    parser.add_argument(
+        "--json-backend",
+        choices=BACKEND_CHOICES,
+        default="auto",
+        help="JSON 解碼後端，未安裝時退回 stdlib json (default: auto)"
+    )
+    
+    parser.add_argument(
+        "--decode-batch-size",
+        type=int,
+        default=500,
+        help="每批解碼的最大訊息數 (default: 500)"
+    )
+    
+    # 處理圖參數
+    parser.add_argument(
+        "--stage-mode",
+        choices=STAGE_MODES,
+        default="staged",
+        help="staged: 多階段轉換圖；fused: 單一融合 DoFn (default: staged)"
+    )
+    
+    parser.add_argument(
+        "--validation-mode",
+        choices=VALIDATION_MODES,
+        default="record",
+        help="record: 逐筆驗證；batch: NumPy 向量化批量驗證 (default: record)"
+    )
+    
+    parser.add_argument(
+        "--suppress-unchanged",
+        action="store_true",
+        help="按 device_id 抑制無變化的有效記錄，只輸出超出死區的變更與心跳"
+    )
+    
+    parser.add_argument(
+        "--max-silence-seconds",
+        type=int,
+        default=DEFAULT_MAX_SILENCE_SECONDS,
+        help=f"變更抑制時，無變更最長多久輸出一筆 (default: {DEFAULT_MAX_SILENCE_SECONDS})"
+    )
+    
+    # LocalFast 參數
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="LocalFast 進程數 (default: CPU 核心數)"
+    )
+    
+    parser.add_argument(
+        "--chunk-mb",
+        type=int,
+        default=DEFAULT_CHUNK_BYTES >> 20,
+        help=f"LocalFast 每個分塊的最大 MB 數 (default: {DEFAULT_CHUNK_BYTES >> 20})"
     )
     
     # 日誌參數
@@ -89,47 +313,105 @@ def main():
     logger.info(f"項目: {config.project_id}, 區域: {config.region}")
     
     # 驗證輸入
-    if args.input_type == "file" and not args.input_file:
+    if args.pipeline == "both":
+        if args.input_type == "file" and not (
+            args.gateway_input_file or args.anchor_input_file or args.mixed_input_file
+        ):
+            logger.error("--gateway-input-file / --anchor-input-file / --mixed-input-file 參數至少提供一個")
+            sys.exit(1)
+        
+        if args.input_type == "pubsub" and not (
+            config.gateway_pubsub_topic or config.anchor_pubsub_topic or config.mixed_pubsub_topic
+        ):
+            logger.error("配置中缺少 gateway_pubsub_topic / anchor_pubsub_topic / mixed_pubsub_topic")
+            sys.exit(1)
+    
+    elif args.input_type == "file" and not args.input_file:
         logger.error("--input-file 參數必須提供")
         sys.exit(1)
     
-    if args.input_type == "pubsub" and not args.input_topic:
+    elif args.input_type == "pubsub" and not args.input_topic:
         logger.error("--input-topic 參數必須提供")
         sys.exit(1)
     
+    if (args.output_rollups or args.output_alerts) and args.pipeline == "gateway":
+        logger.error("--output-rollups / --output-alerts 只支持 Anchor 數據（--pipeline anchor / both）")
+        sys.exit(1)
+    
+    if args.runner == "LocalFast":
+        if args.input_type != "file" or not args.output_file:
+            logger.error("LocalFast 只支持 file 輸入，且必須提供 --output-file")
+            sys.exit(1)
+        unsupported = _local_fast_unsupported(args, parser)
+        if unsupported:
+            logger.error(f"LocalFast 不支持以下參數，請改用 DirectRunner / DataflowRunner: {', '.join(unsupported)}")
+            sys.exit(1)
+        return _run_local_fast(args, config, logger)
+    
     # 執行 Pipeline
+    outputs = OutputOptions.from_config(
+        config,
+        output_file=args.output_file,
+        output_format=args.output_format,
+        row_group_size=args.row_group_size,
+        output_compression=args.output_compression,
+        compression_level=args.compression_level,
+        # --pipeline both 時 --output-bigquery 為數據集，表名取自配置
+        output_bigquery=args.output_bigquery if args.pipeline != "both" else None,
+        bigquery_method=args.bigquery_method,
+        bigquery_temp_location=args.bigquery_temp_location,
+        output_redis=args.output_redis,
+        suppress_unchanged=args.suppress_unchanged,
+        max_silence_seconds=args.max_silence_seconds,
+        output_rollups=args.output_rollups,
+        output_alerts=args.output_alerts,
+        priority_sink=args.priority_sink,
+        device_registry=args.device_registry,
+    )
+    processing = {
+        "json_backend": args.json_backend,
+        "decode_batch_size": args.decode_batch_size,
+        "stage_mode": args.stage_mode,
+        "validation_mode": args.validation_mode,
+        "file_reader": args.file_reader,
+    }
+    
     try:
-        if args.pipeline in ["gateway", "both"]:
-            logger.info("執行 Gateway 扁平化 Pipeline...")
-            gateway_pipeline = GatewayFlatteningPipeline(
-                project_id=config.project_id,
-                region=config.region
-            )
-            gateway_pipeline.run(
+        if args.pipeline == "both":
+            logger.info("執行 Gateway + Anchor 合併扁平化 Pipeline...")
+            combined_pipeline = CombinedFlatteningPipeline(config)
+            start = time.perf_counter()
+            result = combined_pipeline.run(
                 runner=args.runner,
                 input_type=args.input_type,
-                input_path=args.input_file,
-                input_topic=args.input_topic,
-                output_bigquery=args.output_bigquery,
-                output_file=args.output_file
-            )
-            logger.info("✅ Gateway Pipeline 完成")
-        
-        if args.pipeline in ["anchor", "both"]:
-            logger.info("執行 Anchor 扁平化 Pipeline...")
-            anchor_pipeline = AnchorFlatteningPipeline(
-                project_id=config.project_id,
-                region=config.region
+                input_paths={
+                    "gateway": args.gateway_input_file,
+                    "anchor": args.anchor_input_file,
+                    "mixed": args.mixed_input_file,
+                },
+                outputs=outputs,
+                output_bigquery_dataset=args.output_bigquery,
+                **processing
             )
-            anchor_pipeline.run(
+            logger.info("✅ Gateway + Anchor Pipeline 完成")
+            _print_metrics("Gateway + Anchor", args.runner, result, time.perf_counter() - start)
+        else:
+            label = args.pipeline.capitalize()
+            logger.info(f"執行 {label} 扁平化 Pipeline...")
+            pipeline_cls = {"gateway": GatewayFlatteningPipeline, "anchor": AnchorFlatteningPipeline}[args.pipeline]
+            pipeline = pipeline_cls(project_id=config.project_id, region=config.region)
+            start = time.perf_counter()
+            result = pipeline.run(
                 runner=args.runner,
                 input_type=args.input_type,
                 input_path=args.input_file,
                 input_topic=args.input_topic,
-                output_bigquery=args.output_bigquery,
-                output_file=args.output_file
+                outputs=outputs,
+                validation_rules=config.validation_rules,
+                **processing
             )
-            logger.info("✅ Anchor Pipeline 完成")
+            logger.info(f"✅ {label} Pipeline 完成")
+            _print_metrics(label, args.runner, result, time.perf_counter() - start)
         
         logger.info("🎉 所有 Pipeline 執行完成")
         return 0
@@ -1,12 +1,15 @@
 """Anchor 數據模型 - 4層原始結構和扁平化結構"""
 
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field
 from typing import Any, Dict, Optional
 from datetime import datetime
 import json
 
+from .field_mapping import FieldSpec, MappingPlan
+from .records import RECORD_OPTIONS, make_serializer, make_tolerant_factory
 
-@dataclass
+
+@dataclass(**RECORD_OPTIONS)
 class AnchorData:
     """
     Anchor 原始 4層結構
@@ -61,8 +64,8 @@ class AnchorData:
     extra_data: Dict[str, Any] = field(default_factory=dict)
     
     def to_dict(self) -> Dict[str, Any]:
-        """轉換為字典"""
-        return asdict(self)
+        """轉換為字典（淺拷貝，巢狀字典與實例共享）"""
+        return _serialize_anchor(self)
     
     def to_json(self) -> str:
         """轉換為 JSON 字符串"""
@@ -70,8 +73,13 @@ class AnchorData:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "AnchorData":
-        """從字典建立實例"""
-        return cls(**data)
+        """
+        從字典建立實例
+        
+        接受 camelCase 或 snake_case 鍵名（cloudData / cloud_data），
+        未知的鍵放入 extra_data，缺失的必要字段留給後續驗證處理
+        """
+        return _from_dict_anchor(data)
     
     @classmethod
     def from_json(cls, json_str: str) -> "AnchorData":
@@ -80,7 +88,7 @@ class AnchorData:
         return cls.from_dict(data)
 
 
-@dataclass
+@dataclass(**RECORD_OPTIONS)
 class FlattenedAnchorData:
     """
     Anchor 扁平化結構（2層）
@@ -157,11 +165,8 @@ class FlattenedAnchorData:
     extra_data: Dict[str, Any] = field(default_factory=dict)
     
     def to_dict(self) -> Dict[str, Any]:
-        """轉換為字典（排除 None 值）"""
-        return {
-            k: v for k, v in asdict(self).items()
-            if v is not None and k != "extra_data"
-        } | self.extra_data
+        """轉換為字典（排除 None 值，extra_data 合併到頂層）"""
+        return _serialize_flattened_anchor(self)
     
     def to_json(self) -> str:
         """轉換為 JSON 字符串"""
@@ -191,91 +196,51 @@ class FlattenedAnchorData:
     @classmethod
     def from_anchor_data(cls, anchor: AnchorData) -> "FlattenedAnchorData":
         """從原始 AnchorData 轉換"""
-        # 提取 cloudData 中的數據
-        battery_voltage = None
-        rssi = None
-        heart_rate = None
-        temperature = None
-        humidity = None
-        fw_update = None
-        led_enabled = None
-        ble_enabled = None
-        is_initiator = None
-        
-        if anchor.cloud_data:
-            cloud_data = anchor.cloud_data
-            if isinstance(cloud_data, dict):
-                battery_voltage = cloud_data.get("battery_voltage")
-                rssi = cloud_data.get("rssi")
-                heart_rate = cloud_data.get("heart_rate")
-                temperature = cloud_data.get("temperature")
-                humidity = cloud_data.get("humidity")
-                fw_update = cloud_data.get("fw_update")
-                led_enabled = cloud_data.get("led")
-                ble_enabled = cloud_data.get("ble")
-                is_initiator = cloud_data.get("initiator")
-                
-                # 嘗試從 pub -> msg -> data 提取
-                pub = cloud_data.get("pub")
-                if pub and isinstance(pub, dict):
-                    msg = pub.get("msg")
-                    if msg and isinstance(msg, dict):
-                        data = msg.get("data")
-                        if data and isinstance(data, dict):
-                            battery_voltage = battery_voltage or data.get("battery_voltage")
-                            rssi = rssi or data.get("rssi")
-                            heart_rate = heart_rate or data.get("heart_rate")
-                            temperature = temperature or data.get("temperature")
-                            humidity = humidity or data.get("humidity")
-        
-        # 轉換布林值（0/1 -> False/True）
-        if isinstance(fw_update, int):
-            fw_update = bool(fw_update)
-        if isinstance(led_enabled, int):
-            led_enabled = bool(led_enabled)
-        if isinstance(ble_enabled, int):
-            ble_enabled = bool(ble_enabled)
-        if isinstance(is_initiator, int):
-            is_initiator = bool(is_initiator)
-        
-        # 提取位置信息
-        position_x, position_y, position_z = None, None, None
-        if anchor.position and isinstance(anchor.position, dict):
-            position_x = anchor.position.get("x")
-            position_y = anchor.position.get("y")
-            position_z = anchor.position.get("z")
-        elif anchor.cloud_data and isinstance(anchor.cloud_data, dict):
-            pos = anchor.cloud_data.get("position")
-            if pos and isinstance(pos, dict):
-                position_x = pos.get("x")
-                position_y = pos.get("y")
-                position_z = pos.get("z")
-        
         return cls(
-            device_id=anchor.anchor_id,
             device_type="anchor",
-            device_name=anchor.name,
-            gateway_id=anchor.gateway_id,
-            mac_address=anchor.mac_address,
-            position_x=position_x,
-            position_y=position_y,
-            position_z=position_z,
-            status=anchor.status,
-            last_seen=anchor.last_seen,
-            is_bound=anchor.is_bound,
-            battery_voltage=battery_voltage,
-            rssi=rssi,
-            heart_rate=heart_rate,
-            temperature=temperature,
-            humidity=humidity,
-            fw_update=fw_update,
-            led_enabled=led_enabled,
-            ble_enabled=ble_enabled,
-            is_initiator=is_initiator,
             processing_timestamp=datetime.utcnow().isoformat() + "Z",
-            timestamp=anchor.last_seen
+            **ANCHOR_FIELD_PLAN.extract(anchor)
         )
 
 
+# 扁平化提取規則：cloudData 頂層優先，再退回 cloudData -> pub -> msg -> data
+_ANCHOR_EVENT_DATA = "cloud_data.pub.msg.data"
+
+ANCHOR_FIELD_PLAN = MappingPlan("anchor", [
+    # 第1層：設備基本信息
+    FieldSpec("device_id", ("anchor_id",)),
+    FieldSpec("device_name", ("name",)),
+    FieldSpec("gateway_id", ("gateway_id",)),
+    FieldSpec("mac_address", ("mac_address",)),
+    FieldSpec("position_x", ("pos.x",)),
+    FieldSpec("position_y", ("pos.y",)),
+    FieldSpec("position_z", ("pos.z",)),
+    FieldSpec("status", ("status",)),
+    FieldSpec("last_seen", ("last_seen",)),
+    FieldSpec("is_bound", ("is_bound",)),
+    
+    # 第2層：傳感器數據
+    FieldSpec("battery_voltage", ("cloud_data.battery_voltage", f"{_ANCHOR_EVENT_DATA}.battery_voltage")),
+    FieldSpec("rssi", ("cloud_data.rssi", f"{_ANCHOR_EVENT_DATA}.rssi")),
+    FieldSpec("heart_rate", ("cloud_data.heart_rate", f"{_ANCHOR_EVENT_DATA}.heart_rate")),
+    FieldSpec("temperature", ("cloud_data.temperature", f"{_ANCHOR_EVENT_DATA}.temperature")),
+    FieldSpec("humidity", ("cloud_data.humidity", f"{_ANCHOR_EVENT_DATA}.humidity")),
+    
+    # 設備配置（0/1 -> False/True）
+    FieldSpec("fw_update", ("cloud_data.fw_update",), coerce="int_to_bool"),
+    FieldSpec("led_enabled", ("cloud_data.led",), coerce="int_to_bool"),
+    FieldSpec("ble_enabled", ("cloud_data.ble",), coerce="int_to_bool"),
+    FieldSpec("is_initiator", ("cloud_data.initiator",), coerce="int_to_bool"),
+    
+    # 中繼數據
+    FieldSpec("timestamp", ("last_seen",)),
+], aliases={
+    # 根層 position 優先，否則使用 cloudData.position
+    "pos": ("position", "cloud_data.position"),
+})
 
 
+# 預先計算字段順序的序列化函數（取代 dataclasses.asdict 的遞歸深拷貝）
+_serialize_anchor = make_serializer(AnchorData)
+_from_dict_anchor = make_tolerant_factory(AnchorData, required_defaults={"anchor_id": None})
+_serialize_flattened_anchor = make_serializer(FlattenedAnchorData, skip_none=True, extra_field="extra_data")
@@ -0,0 +1,199 @@
+"""字段映射引擎 - 將聲明式的提取規則編譯為專用的提取函數"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+
+# 內建的型別轉換
+def int_to_bool(value: Any) -> Any:
+    """0/1 -> False/True，其他值保持不變"""
+    if isinstance(value, int):
+        return bool(value)
+    return value
+
+
+COERCIONS: Dict[str, Callable[[Any], Any]] = {
+    "int_to_bool": int_to_bool,
+}
+
+# 可內聯展開的轉換（避免每筆記錄的函數調用）
+_INLINE_COERCIONS = {
+    "int_to_bool": "    if isinstance(v, int):\n        v = bool(v)\n",
+}
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """
+    單個輸出字段的提取規則
+
+    Args:
+        target: 輸出字段名稱
+        sources: 依序嘗試的來源路徑，使用點分隔
+                 第一段為來源對象的屬性（或別名），其餘為字典鍵
+                 例如 "cloud_data.pub.msg.data.rssi"
+                 多個來源以 `or` 串接，後備來源的容器不存在時不參與
+                 （與舊的手寫提取邏輯一致）
+        coerce: 型別轉換，COERCIONS 中的名稱或任意 callable
+
+    Example:
+        FieldSpec("led_enabled", ("cloud_data.led",), coerce="int_to_bool")
+    """
+
+    target: str
+    sources: Tuple[str, ...]
+    coerce: Optional[Union[str, Callable[[Any], Any]]] = None
+
+
+class MappingPlan:
+    """
+    聲明式字段映射計劃
+
+    描述來源路徑、後備來源、重命名和型別轉換，第一次使用時編譯為
+    單一的 Python 函數（每個 worker 編譯一次），之後每筆記錄只執行
+    一連串的 dict.get，不再重複走訪巢狀結構。
+
+    Args:
+        name: 計劃名稱（用於生成的函數名稱）
+        fields: FieldSpec 列表
+        aliases: 容器別名，值為依序嘗試的容器路徑，取第一個非空字典
+                 例如 {"pos": ("position", "cloud_data.position")}
+
+    Example:
+        plan = MappingPlan("gateway", [
+            FieldSpec("device_id", ("gateway_id",)),
+            FieldSpec("rssi", ("cloud_data.rssi", "cloud_data.pub.msg.data.rssi")),
+        ])
+        values = plan.extract(gateway)
+    """
+
+    def __init__(self,
+                 name: str,
+                 fields: Sequence[FieldSpec],
+                 aliases: Optional[Dict[str, Sequence[str]]] = None):
+        self.name = name
+        self.fields = tuple(fields)
+        self.aliases = {k: tuple(v) for k, v in (aliases or {}).items()}
+        self._extractor: Optional[Callable[[Any], Dict[str, Any]]] = None
+        self.source_code: Optional[str] = None
+
+    @property
+    def targets(self) -> Tuple[str, ...]:
+        """輸出字段名稱"""
+        return tuple(spec.target for spec in self.fields)
+
+    def extract(self, source: Any) -> Dict[str, Any]:
+        """提取字段（首次調用時編譯）"""
+        return self.compile()(source)
+
+    def compile(self) -> Callable[[Any], Dict[str, Any]]:
+        """編譯為提取函數（結果會被快取）"""
+        if self._extractor is None:
+            self._extractor = _PlanCompiler(self).build()
+        return self._extractor
+
+
+class _PlanCompiler:
+    """將 MappingPlan 生成為 Python 源碼並編譯"""
+
+    def __init__(self, plan: MappingPlan):
+        self.plan = plan
+        self.lines: List[str] = []
+        self.namespace: Dict[str, Any] = {"_EMPTY": {}}
+        self.containers: Dict[Tuple[str, ...], str] = {}
+
+    def build(self) -> Callable[[Any], Dict[str, Any]]:
+        for alias, paths in self.plan.aliases.items():
+            self._alias(alias, paths)
+
+        result_items = []
+        for index, spec in enumerate(self.plan.fields):
+            if not spec.sources:
+                raise ValueError(f"字段 {spec.target} 沒有來源路徑")
+            if len(spec.sources) == 1 and spec.coerce is None:
+                result_items.append(f"{spec.target!r}: {self._leaf(spec.sources[0])}")
+                continue
+
+            var = f"_v{index}"
+            self._fallbacks(spec.sources)
+            if spec.coerce is not None:
+                self.lines.append(self._coercion(spec.coerce, index))
+            self.lines.append(f"    {var} = v\n")
+            result_items.append(f"{spec.target!r}: {var}")
+
+        func_name = f"extract_{self.plan.name}"
+        source = (
+            f"def {func_name}(src):\n"
+            + "".join(self.lines)
+            + "    return {" + ", ".join(result_items) + "}\n"
+        )
+        exec(compile(source, f"<mapping plan {self.plan.name}>", "exec"), self.namespace)
+        self.plan.source_code = source
+        return self.namespace[func_name]
+
+    def _fallbacks(self, sources: Sequence[str]):
+        """
+        依序嘗試來源，結果存入 v
+
+        後備來源只在其容器為非空字典時以 `or` 併入（與舊的手寫提取一致：
+        巢狀的 pub.msg.data 不存在時保留頂層的值，即使為 0 / 0.0 等假值）。
+        """
+        first, *rest = (tuple(path.split(".")) for path in sources)
+        self.lines.append(f"    v = {self._value(first)}\n")
+        for path in rest:
+            value = self._value(path)
+            if len(path) > 1:
+                self.lines.append(f"    if {self._container(path[:-1])}:\n")
+                self.lines.append(f"        v = v or {value}\n")
+            else:
+                self.lines.append(f"    v = v or {value}\n")
+
+    def _coercion(self, coerce: Union[str, Callable[[Any], Any]], index: int) -> str:
+        if isinstance(coerce, str):
+            if coerce in _INLINE_COERCIONS:
+                return _INLINE_COERCIONS[coerce]
+            if coerce not in COERCIONS:
+                raise ValueError(f"未知的型別轉換: {coerce}")
+            coerce = COERCIONS[coerce]
+        name = f"_coerce{index}"
+        self.namespace[name] = coerce
+        return f"    v = {name}(v)\n"
+
+    def _alias(self, alias: str, paths: Sequence[str]):
+        """別名：依序取第一個非空字典容器"""
+        candidates = [self._value(tuple(path.split("."))) for path in paths]
+        var = f"_c{len(self.containers)}"
+        for depth, candidate in enumerate(candidates):
+            indent = "    " * (depth + 1)
+            self.lines.append(f"{indent}_t = {candidate}\n")
+            self.lines.append(f"{indent}if _t and isinstance(_t, dict):\n")
+            self.lines.append(f"{indent}    {var} = _t\n")
+            self.lines.append(f"{indent}else:\n")
+        self.lines.append(f"{'    ' * (len(candidates) + 1)}{var} = _EMPTY\n")
+        self.containers[(alias,)] = var
+
+    def _container(self, path: Tuple[str, ...]) -> str:
+        """返回保證為字典的容器變數（缺失時為 _EMPTY）"""
+        if path in self.containers:
+            return self.containers[path]
+        value = self._value(path)
+        var = f"_c{len(self.containers)}"
+        self.lines.append(f"    {var} = {value}\n")
+        self.lines.append(f"    if not isinstance({var}, dict):\n")
+        self.lines.append(f"        {var} = _EMPTY\n")
+        self.containers[path] = var
+        return var
+
+    def _value(self, path: Tuple[str, ...]) -> str:
+        """單一路徑的取值表達式"""
+        if len(path) > 1:
+            return f"{self._container(path[:-1])}.get({path[-1]!r})"
+        head = path[0]
+        if head in self.plan.aliases:
+            return self.containers[(head,)]
+        if not head.isidentifier():
+            raise ValueError(f"無效的屬性名稱: {head}")
+        return f"src.{head}"
+
+    def _leaf(self, path: str) -> str:
+        return self._value(tuple(path.split(".")))
@@ -1,12 +1,15 @@
 """Gateway 數據模型 - 4層原始結構和扁平化結構"""
 
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field
 from typing import Any, Dict, Optional, List
 from datetime import datetime
 import json
 
+from .field_mapping import FieldSpec, MappingPlan
+from .records import RECORD_OPTIONS, make_serializer, make_tolerant_factory
 
-@dataclass
+
+@dataclass(**RECORD_OPTIONS)
 class GatewayData:
     """
     Gateway 原始 4層結構
@@ -53,8 +56,8 @@ class GatewayData:
     extra_data: Dict[str, Any] = field(default_factory=dict)
     
     def to_dict(self) -> Dict[str, Any]:
-        """轉換為字典"""
-        return asdict(self)
+        """轉換為字典（淺拷貝，巢狀字典與實例共享）"""
+        return _serialize_gateway(self)
     
     def to_json(self) -> str:
         """轉換為 JSON 字符串"""
@@ -62,8 +65,13 @@ class GatewayData:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "GatewayData":
-        """從字典建立實例"""
-        return cls(**data)
+        """
+        從字典建立實例
+        
+        接受 camelCase 或 snake_case 鍵名（cloudData / cloud_data），
+        未知的鍵放入 extra_data，缺失的必要字段留給後續驗證處理
+        """
+        return _from_dict_gateway(data)
     
     @classmethod
     def from_json(cls, json_str: str) -> "GatewayData":
@@ -72,7 +80,7 @@ class GatewayData:
         return cls.from_dict(data)
 
 
-@dataclass
+@dataclass(**RECORD_OPTIONS)
 class FlattenedGatewayData:
     """
     Gateway 扁平化結構（2層）
@@ -142,11 +150,8 @@ class FlattenedGatewayData:
     extra_data: Dict[str, Any] = field(default_factory=dict)
     
     def to_dict(self) -> Dict[str, Any]:
-        """轉換為字典（排除 None 值）"""
-        return {
-            k: v for k, v in asdict(self).items()
-            if v is not None and k != "extra_data"
-        } | self.extra_data
+        """轉換為字典（排除 None 值，extra_data 合併到頂層）"""
+        return _serialize_flattened_gateway(self)
     
     def to_json(self) -> str:
         """轉換為 JSON 字符串"""
@@ -176,63 +181,43 @@ class FlattenedGatewayData:
     @classmethod
     def from_gateway_data(cls, gateway: GatewayData) -> "FlattenedGatewayData":
         """從原始 GatewayData 轉換"""
-        # 提取 cloudData 中的數據
-        battery_voltage = None
-        rssi = None
-        signal_quality = None
-        fw_version = None
-        config_mode = None
-        
-        if gateway.cloud_data:
-            # 深層提取：cloudData -> pub -> msg -> data
-            cloud_data = gateway.cloud_data
-            if isinstance(cloud_data, dict):
-                battery_voltage = cloud_data.get("battery_voltage")
-                rssi = cloud_data.get("rssi")
-                signal_quality = cloud_data.get("signal_quality")
-                fw_version = cloud_data.get("fw_version")
-                config_mode = cloud_data.get("config_mode")
-                
-                # 嘗試從 pub -> msg -> data 提取
-                pub = cloud_data.get("pub")
-                if pub and isinstance(pub, dict):
-                    msg = pub.get("msg")
-                    if msg and isinstance(msg, dict):
-                        data = msg.get("data")
-                        if data and isinstance(data, dict):
-                            battery_voltage = battery_voltage or data.get("battery_voltage")
-                            rssi = rssi or data.get("rssi")
-                            signal_quality = signal_quality or data.get("signal_quality")
-        
-        # 提取位置信息
-        position_x, position_y, position_z = None, None, None
-        if gateway.position and isinstance(gateway.position, dict):
-            position_x = gateway.position.get("x")
-            position_y = gateway.position.get("y")
-            position_z = gateway.position.get("z")
-        
         return cls(
-            device_id=gateway.gateway_id,
             device_type="gateway",
-            device_name=gateway.name,
-            ip_address=gateway.ip_address,
-            mac_address=gateway.mac_address,
-            position_x=position_x,
-            position_y=position_y,
-            position_z=position_z,
-            status=gateway.status,
-            created_at=gateway.created_at,
-            last_seen=gateway.last_seen,
-            battery_voltage=battery_voltage,
-            rssi=rssi,
-            signal_quality=signal_quality,
-            fw_version=fw_version,
-            config_mode=config_mode,
-            is_bound=gateway.is_bound,
             processing_timestamp=datetime.utcnow().isoformat() + "Z",
-            timestamp=gateway.last_seen
+            **GATEWAY_FIELD_PLAN.extract(gateway)
         )
 
 
+# 扁平化提取規則：cloudData 頂層優先，再退回 cloudData -> pub -> msg -> data
+_GATEWAY_EVENT_DATA = "cloud_data.pub.msg.data"
+
+GATEWAY_FIELD_PLAN = MappingPlan("gateway", [
+    # 第1層：設備基本信息
+    FieldSpec("device_id", ("gateway_id",)),
+    FieldSpec("device_name", ("name",)),
+    FieldSpec("ip_address", ("ip_address",)),
+    FieldSpec("mac_address", ("mac_address",)),
+    FieldSpec("position_x", ("position.x",)),
+    FieldSpec("position_y", ("position.y",)),
+    FieldSpec("position_z", ("position.z",)),
+    FieldSpec("status", ("status",)),
+    FieldSpec("created_at", ("created_at",)),
+    FieldSpec("last_seen", ("last_seen",)),
+    
+    # 第2層：事件數據
+    FieldSpec("battery_voltage", ("cloud_data.battery_voltage", f"{_GATEWAY_EVENT_DATA}.battery_voltage")),
+    FieldSpec("rssi", ("cloud_data.rssi", f"{_GATEWAY_EVENT_DATA}.rssi")),
+    FieldSpec("signal_quality", ("cloud_data.signal_quality", f"{_GATEWAY_EVENT_DATA}.signal_quality")),
+    FieldSpec("fw_version", ("cloud_data.fw_version",)),
+    FieldSpec("config_mode", ("cloud_data.config_mode",)),
+    
+    # 中繼數據
+    FieldSpec("is_bound", ("is_bound",)),
+    FieldSpec("timestamp", ("last_seen",)),
+])
 
 
+# 預先計算字段順序的序列化函數（取代 dataclasses.asdict 的遞歸深拷貝）
+_serialize_gateway = make_serializer(GatewayData)
+_from_dict_gateway = make_tolerant_factory(GatewayData, required_defaults={"gateway_id": None, "name": ""})
+_serialize_flattened_gateway = make_serializer(FlattenedGatewayData, skip_none=True, extra_field="extra_data")
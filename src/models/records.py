@@ -0,0 +1,126 @@
+"""記錄類工具 - __slots__ 數據類與淺拷貝序列化"""
+
+import re
+import sys
+from dataclasses import fields
+from operator import attrgetter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+# Python 3.10+ 的 dataclass 支援 slots=True（較小的實例、較快的屬性存取）
+RECORD_OPTIONS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# camelCase -> snake_case 快取（上限避免異常鍵無限增長）
+_KEY_CACHE: Dict[str, str] = {}
+_KEY_CACHE_LIMIT = 4096
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])([A-Z])")
+
+
+def normalize_key(key: str) -> str:
+    """
+    將鍵名標準化為 snake_case（結果會被快取）
+
+    Example:
+        >>> normalize_key("cloudData")
+        'cloud_data'
+        >>> normalize_key("lastSeen")
+        'last_seen'
+    """
+    normalized = _KEY_CACHE.get(key)
+    if normalized is None:
+        normalized = _CAMEL_BOUNDARY.sub(r"_\1", key).lower()
+        if len(_KEY_CACHE) < _KEY_CACHE_LIMIT:
+            _KEY_CACHE[key] = normalized
+    return normalized
+
+
+def field_order(cls: type, exclude: Tuple[str, ...] = ()) -> Tuple[str, ...]:
+    """按聲明順序返回數據類字段名稱"""
+    return tuple(f.name for f in fields(cls) if f.name not in exclude)
+
+
+def make_serializer(cls: type,
+                    skip_none: bool = False,
+                    extra_field: str = None) -> Callable[[Any], Dict[str, Any]]:
+    """
+    建立預先計算字段順序的序列化函數
+
+    與 dataclasses.asdict 不同，不會遞歸深拷貝：巢狀字典與實例共享。
+
+    Args:
+        cls: 數據類
+        skip_none: 是否省略值為 None 的字段
+        extra_field: 要合併到頂層的額外字段字典（如 "extra_data"），
+                     None 表示所有字段照原樣輸出
+
+    Returns:
+        instance -> dict 函數
+    """
+    names = field_order(cls, exclude=(extra_field,) if extra_field else ())
+    get_values = attrgetter(*names)
+    get_extra = attrgetter(extra_field) if extra_field else None
+
+    if skip_none:
+        def serialize(instance: Any) -> Dict[str, Any]:
+            result = {k: v for k, v in zip(names, get_values(instance)) if v is not None}
+            if get_extra is not None:
+                extra = get_extra(instance)
+                if extra:
+                    result.update(extra)
+            return result
+    else:
+        def serialize(instance: Any) -> Dict[str, Any]:
+            result = dict(zip(names, get_values(instance)))
+            if get_extra is not None:
+                extra = get_extra(instance)
+                if extra:
+                    result.update(extra)
+            return result
+
+    return serialize
+
+
+def make_tolerant_factory(cls: type,
+                          extra_field: str = "extra_data",
+                          required_defaults: Optional[Dict[str, Any]] = None) -> Callable[[Dict[str, Any]], Any]:
+    """
+    建立容錯的 from_dict 函數
+
+    - 鍵名經快取表標準化（cloudData -> cloud_data, lastSeen -> last_seen）
+    - 未知的鍵保留原名放入 extra_field，不拋出例外
+    - 缺失的必要字段以 required_defaults 補齊，由後續驗證處理
+
+    Args:
+        cls: 數據類
+        extra_field: 存放未知鍵的字段名稱
+        required_defaults: 必要字段缺失時的預設值
+
+    Returns:
+        dict -> instance 函數
+    """
+    known = frozenset(field_order(cls, exclude=(extra_field,)))
+    defaults = tuple((required_defaults or {}).items())
+    cache_get = _KEY_CACHE.get
+
+    def from_dict(data: Dict[str, Any]) -> Any:
+        kwargs = {}
+        extra = None
+        for key, value in data.items():
+            name = cache_get(key) or normalize_key(key)
+            if name in known:
+                kwargs[name] = value
+            elif name == extra_field and isinstance(value, dict):
+                extra = {**value, **extra} if extra else dict(value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+
+        for name, default in defaults:
+            if name not in kwargs:
+                kwargs[name] = default
+        if extra:
+            kwargs[extra_field] = extra
+        return cls(**kwargs)
+
+    return from_dict
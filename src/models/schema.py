@@ -0,0 +1,208 @@
+"""扁平化記錄的欄位結構 - 由 Flattened*Data 數據類推導，供列式輸出、Beam schema 行與 BigQuery 使用"""
+
+import json
+import typing
+from dataclasses import fields
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from .gateway_data import FlattenedGatewayData
+from .anchor_data import FlattenedAnchorData
+
+
+# 欄位類型（與具體格式無關；各輸出格式自行映射）
+STRING = "string"
+FLOAT = "float"
+INT = "int"
+BOOL = "bool"
+
+_PY_TYPES = {
+    str: STRING,
+    float: FLOAT,
+    int: INT,
+    bool: BOOL,
+}
+
+FLATTENED_MODELS = {
+    "gateway": FlattenedGatewayData,
+    "anchor": FlattenedAnchorData,
+}
+
+# 增強與驗證階段添加的字段（不在數據類中）
+ENRICHED_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("signal_level", STRING),
+    ("battery_level", STRING),
+    ("validation_code", INT),
+    ("is_valid", BOOL),
+    # 設備登記表（transforms/registry_enrichment.py）
+    ("facility_id", STRING),
+    ("room_id", STRING),
+    ("resident_id", STRING),
+)
+
+# 數據類以外的字段序列化為 JSON 後存放於此欄位
+EXTRA_COLUMN = "extra_data"
+
+# 低基數字段（列式格式適合字典編碼）
+LOW_CARDINALITY_COLUMNS = ("device_type", "status", "signal_level", "battery_level")
+
+# ISO 8601 時間字段（模型中為字符串；BigQuery 中為 TIMESTAMP）
+TIMESTAMP_COLUMNS = ("created_at", "last_seen", "timestamp", "processing_timestamp")
+
+_ROW_TYPES = {
+    STRING: str,
+    FLOAT: float,
+    INT: int,
+    BOOL: bool,
+}
+
+_BIGQUERY_TYPES = {
+    STRING: "STRING",
+    FLOAT: "FLOAT",
+    INT: "INTEGER",
+    BOOL: "BOOLEAN",
+}
+
+
+class Column(NamedTuple):
+    """單一欄位：名稱、類型、是否可為 null"""
+    name: str
+    type: str
+    nullable: bool
+
+
+def _column_type(annotation: Any) -> str:
+    """數據類字段註解（含 Optional[...]）-> 欄位類型"""
+    args = typing.get_args(annotation)
+    if typing.get_origin(annotation) is typing.Union and type(None) in args:
+        annotation = next(a for a in args if a is not type(None))
+    return _PY_TYPES[annotation]
+
+
+def record_columns(device_type: str) -> List[Column]:
+    """
+    扁平化記錄（經增強與驗證後）的欄位
+
+    順序：數據類字段（聲明順序，不含 extra_data）→ ENRICHED_COLUMNS → extra_data（JSON 字符串）。
+    除 device_id 外所有欄位皆可為 null（輸出時省略 None 的字段）。
+
+    Args:
+        device_type: "gateway" 或 "anchor"
+
+    Raises:
+        ValueError: 未知的設備類型
+    """
+    model = FLATTENED_MODELS.get(device_type)
+    if model is None:
+        raise ValueError(f"未支持的設備類型: {device_type}")
+
+    hints = typing.get_type_hints(model)
+    columns = []
+    for f in fields(model):
+        if f.name == EXTRA_COLUMN:
+            continue
+        columns.append(Column(f.name, _column_type(hints[f.name]), f.name != "device_id"))
+    columns.extend(Column(name, column_type, True) for name, column_type in ENRICHED_COLUMNS)
+    columns.append(Column(EXTRA_COLUMN, STRING, True))
+    return columns
+
+
+
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+
+def _coerce_int(value: Any) -> Optional[int]:
+    # bool 是 int 的子類，需先轉換（Arrow 的 int64 不接受 bool）
+    if type(value) is bool:
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and _INT64_MIN <= value <= _INT64_MAX:
+        return value
+    return None
+
+
+def _coerce_float(value: Any) -> Optional[float]:
+    if value is None or isinstance(value, float):
+        return value
+    if isinstance(value, (int, bool)):
+        return float(value)
+    return None
+
+
+def _coerce_bool(value: Any) -> Optional[bool]:
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return bool(value)
+    return None
+
+
+def _coerce_str(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+# 欄位類型 -> 轉換函數（類型不符的值轉換為欄位類型，無法轉換時為 None）
+COERCERS: Dict[str, Callable[[Any], Any]] = {
+    STRING: _coerce_str,
+    FLOAT: _coerce_float,
+    INT: _coerce_int,
+    BOOL: _coerce_bool,
+}
+
+
+def encode_extra(record: Dict[str, Any], known: FrozenSet[str]) -> Optional[str]:
+    """不在 known 中的字段序列化為 JSON 字符串（extra_data 欄位），無則返回 None"""
+    extra = {k: v for k, v in record.items() if k not in known}
+    return json.dumps(extra, ensure_ascii=False, default=str) if extra else None
+
+
+def _make_row_type(device_type: str) -> type:
+    """由 record_columns 生成 NamedTuple（Beam 以 RowCoder 編碼）"""
+    name = FLATTENED_MODELS[device_type].__name__.replace("Data", "Row")
+    row_fields = []
+    for column in record_columns(device_type):
+        py_type = _ROW_TYPES[column.type]
+        row_fields.append((column.name, Optional[py_type] if column.nullable else py_type))
+    return NamedTuple(name, row_fields)
+
+
+# Beam schema 類型（模組層級定義，可按名稱 pickle）
+FlattenedGatewayRow = _make_row_type("gateway")
+FlattenedAnchorRow = _make_row_type("anchor")
+
+ROW_TYPES = {
+    "gateway": FlattenedGatewayRow,
+    "anchor": FlattenedAnchorRow,
+}
+
+
+def row_type(device_type: str) -> type:
+    """
+    扁平化記錄的 Beam schema 類型（NamedTuple，欄位與 record_columns 相同）
+
+    Raises:
+        ValueError: 未知的設備類型
+    """
+    if device_type not in ROW_TYPES:
+        raise ValueError(f"未支持的設備類型: {device_type}")
+    return ROW_TYPES[device_type]
+
+
+def bigquery_schema(device_type: str) -> Dict[str, List[Dict[str, str]]]:
+    """
+    BigQuery 表結構（WriteToBigQuery 的 schema 參數格式）
+
+    欄位與 record_columns 相同；TIMESTAMP_COLUMNS 為 TIMESTAMP，device_id 為 REQUIRED。
+    """
+    schema_fields = []
+    for column in record_columns(device_type):
+        column_type = "TIMESTAMP" if column.name in TIMESTAMP_COLUMNS else _BIGQUERY_TYPES[column.type]
+        schema_fields.append({
+            "name": column.name,
+            "type": column_type,
+            "mode": "NULLABLE" if column.nullable else "REQUIRED",
+        })
+    return {"fields": schema_fields}
@@ -2,10 +2,14 @@
 
 from .gateway_flattening import GatewayFlatteningPipeline
 from .anchor_flattening import AnchorFlatteningPipeline
+from .combined_flattening import CombinedFlatteningPipeline
+from .common import OutputOptions
 
 __all__ = [
     "GatewayFlatteningPipeline",
     "AnchorFlatteningPipeline",
+    "CombinedFlatteningPipeline",
+    "OutputOptions",
 ]
 
 
@@ -0,0 +1,242 @@
+"""Gateway + Anchor 合併扁平化 Pipeline"""
+
+import apache_beam as beam
+from apache_beam.options.pipeline_options import PipelineOptions, StandardOptions
+import logging
+import json
+from dataclasses import replace
+from typing import Dict, Optional
+
+from ..config import Config
+from ..transforms.decode_transform import DecodeJson
+from ..transforms.ndjson_source import read_file_lines
+from ..transforms.ndjson_sink import WriteNdjson
+from ..transforms.router_transform import RouteByDeviceType, DEVICE_TYPES
+from .common import OutputOptions, expand_device_branch
+
+
+logger = logging.getLogger(__name__)
+
+
+# 混合來源（同時含 Gateway 與 Anchor），依內容判定類型
+MIXED = "mixed"
+SOURCE_TYPES = DEVICE_TYPES + (MIXED,)
+
+
+class CombinedFlatteningPipeline:
+    """
+    Gateway 與 Anchor 共用一個 Pipeline 圖
+
+    Flow:
+    1. 讀取各來源（Pub/Sub 主題取自 Config，或文件），標記來源類型
+       （gateway / anchor / mixed）
+    2. 合併後共用一個批量 JSON 解碼階段（含 Metrics 與 dead letter）
+    3. 路由：gateway / anchor 來源直接分派，mixed 來源依鍵簽名判定類型，
+       無法識別的訊息進入隔離輸出
+    4. 各設備類型的 扁平化 → 驗證 → 增強 → 分類 分支
+    5. 分支輸出：
+       - 有效數據 → BigQuery（Config 的 gateway_table / anchor_table）或文件
+       - 無效數據 → 錯誤日誌
+
+    相較於依序執行兩個 Pipeline，只需一個作業（一組 worker），
+    串流模式下兩種數據同時處理。
+
+    Example:
+        pipeline = CombinedFlatteningPipeline(get_config("dev"))
+        pipeline.run(
+            runner="DirectRunner",
+            input_type="file",
+            input_paths={"gateway": "test_data/gateways.json", "anchor": "test_data/anchors.json"},
+            outputs=OutputOptions(output_file="/tmp/flattened")
+        )
+    """
+
+    def __init__(self, config: Config):
+        """
+        初始化 Pipeline
+
+        Args:
+            config: Pipeline 配置（Pub/Sub 主題、BigQuery 表、驗證規則）
+        """
+        self.config = config
+
+    def topics(self) -> Dict[str, Optional[str]]:
+        """各來源類型的 Pub/Sub 主題"""
+        return {
+            "gateway": self.config.gateway_pubsub_topic,
+            "anchor": self.config.anchor_pubsub_topic,
+            MIXED: self.config.mixed_pubsub_topic,
+        }
+
+    def bigquery_tables(self, dataset: Optional[str] = None) -> Dict[str, str]:
+        """
+        各設備類型的 BigQuery 表
+
+        Args:
+            dataset: "project:dataset" 或 "dataset"，None 表示使用 Config.bigquery_dataset
+
+        Returns:
+            {設備類型: "project:dataset.table"}
+        """
+        dataset = dataset or self.config.bigquery_dataset
+        if ":" not in dataset:
+            dataset = f"{self.config.project_id}:{dataset}"
+        return {
+            "gateway": f"{dataset}.{self.config.gateway_table}",
+            "anchor": f"{dataset}.{self.config.anchor_table}",
+        }
+
+    def run(self,
+            runner: str = "DirectRunner",
+            input_type: str = "file",
+            input_paths: Optional[Dict[str, str]] = None,
+            outputs: Optional[OutputOptions] = None,
+            output_bigquery_dataset: Optional[str] = None,
+            json_backend: str = "auto",
+            decode_batch_size: int = 500,
+            stage_mode: str = "staged",
+            validation_mode: str = "record",
+            file_reader: str = "text"):
+        """
+        執行 Pipeline
+
+        Args:
+            runner: "DirectRunner" (本地) 或 "DataflowRunner" (GCP)
+            input_type: "file" 或 "pubsub"（主題取自 Config）
+            input_paths: {來源類型: 文件路徑} (file 模式，"gateway" / "anchor" / "mixed"，
+                         缺少的類型不讀取)
+            outputs: 增強、告警與輸出選項，None 表示 OutputOptions.from_config(Config)；
+                     NDJSON 時每種類型寫入 <output_file>_<類型>，parquet 時兩種類型
+                     寫入同一數據集根目錄（按 device_type 分區）；
+                     output_rollups / output_alerts 只作用於 Anchor 分支
+            output_bigquery_dataset: BigQuery 數據集（"project:dataset" 或 "dataset"），
+                                     提供時寫入該數據集下 Config 的 gateway_table / anchor_table
+            json_backend: JSON 解碼後端 ("auto", "orjson", "simdjson", "json")
+            decode_batch_size: 每批解碼的最大訊息數
+            stage_mode: "staged"（多階段圖）或 "fused"（單一融合 DoFn）
+            validation_mode: "record"（逐筆驗證）或 "batch"（向量化批量驗證）
+            file_reader: "text"（ReadFromText）或 "mmap"（記憶體映射讀取本地文件）
+
+        Returns:
+            PipelineResult（可查詢 Beam Metrics）
+        """
+        sources = self._sources(input_type, input_paths)
+        outputs = outputs or OutputOptions.from_config(self.config)
+        tables = self.bigquery_tables(output_bigquery_dataset) if output_bigquery_dataset else {}
+        branch_outputs = {
+            device_type: replace(
+                outputs,
+                output_bigquery=tables.get(device_type),
+                # 生命體徵只存在於 Anchor
+                output_rollups=outputs.output_rollups if device_type == "anchor" else None,
+                output_alerts=outputs.output_alerts if device_type == "anchor" else None,
+            )
+            for device_type in DEVICE_TYPES
+        }
+        for branch in branch_outputs.values():
+            branch.check(input_type)
+        compression = outputs.compression
+
+        # 建立 Pipeline Options
+        options = PipelineOptions()
+        options.view_as(StandardOptions).runner = runner
+        options.view_as(StandardOptions).streaming = input_type == "pubsub"
+
+        if runner == "DataflowRunner":
+            options.view_as(StandardOptions).project = self.config.project_id
+            options.view_as(StandardOptions).region = self.config.region
+
+        # 建立 Pipeline
+        with beam.Pipeline(options=options) as pipeline:
+            # 讀取各來源並標記來源類型
+            keyed_sources = []
+            for device_type, source in sources.items():
+                label = device_type.capitalize()
+                if input_type == "file":
+                    raw_bytes = (
+                        pipeline
+                        | f"讀取文件 {label}" >> read_file_lines(source, file_reader)
+                    )
+                else:
+                    raw_bytes = (
+                        pipeline
+                        | f"讀取 Pub/Sub {label}" >> beam.io.gcp.pubsub.ReadFromPubSub(topic=source)
+                    )
+                keyed_sources.append(
+                    raw_bytes
+                    | f"標記 {label}" >> beam.Map(lambda payload, kind=device_type: (kind, payload))
+                )
+
+            # 共用的批量解碼，無法解析的訊息進入 dead letter（含 source）
+            decoded = (
+                tuple(keyed_sources)
+                | "合併來源" >> beam.Flatten()
+                | "解析 JSON" >> DecodeJson(
+                    backend=json_backend, max_batch_size=decode_batch_size, keyed=True
+                )
+            )
+
+            (
+                decoded.dead_letter
+                | "序列化 Dead Letter" >> beam.Map(json.dumps)
+                | "寫入 Dead Letter" >> WriteNdjson("/tmp/combined_dead_letter", *compression)
+            )
+
+            # 按設備類型分流（mixed 來源依內容判定）
+            routed = decoded.decoded | "按類型分流" >> RouteByDeviceType()
+
+            if MIXED in sources:
+                (
+                    routed.quarantine
+                    | "序列化隔離記錄" >> beam.Map(json.dumps)
+                    | "寫入隔離區" >> WriteNdjson("/tmp/combined_quarantine", *compression)
+                )
+
+            for device_type in DEVICE_TYPES:
+                if device_type not in sources and MIXED not in sources:
+                    continue
+                branch = branch_outputs[device_type]
+                expand_device_branch(
+                    device_type, routed[device_type], branch,
+                    stage_mode, validation_mode, decode_batch_size, self.config.validation_rules,
+                    file_prefix=f"{branch.output_file}_{device_type}" if branch.output_file else None,
+                )
+
+        # with 區塊結束時已執行並等待完成
+        return pipeline.result
+
+    def _sources(self, input_type: str, input_paths: Optional[Dict[str, str]]) -> Dict[str, str]:
+        """按來源類型整理輸入來源（保持 SOURCE_TYPES 順序）"""
+        if input_type == "file":
+            sources = input_paths or {}
+        elif input_type == "pubsub":
+            sources = self.topics()
+        else:
+            raise ValueError(f"未支持的輸入類型: {input_type}")
+
+        unknown = set(sources) - set(SOURCE_TYPES)
+        if unknown:
+            raise ValueError(f"未支持的來源類型: {sorted(unknown)}")
+        sources = {kind: sources[kind] for kind in SOURCE_TYPES if sources.get(kind)}
+        if not sources:
+            raise ValueError(f"{input_type} 模式至少需要一個輸入來源")
+        return sources
+
+
+def run_local_test():
+    """本地測試"""
+    from ..config import get_config
+
+    pipeline = CombinedFlatteningPipeline(get_config("dev"))
+    pipeline.run(
+        runner="DirectRunner",
+        input_type="file",
+        input_paths={"gateway": "test_data/gateways.json", "anchor": "test_data/anchors.json"},
+        outputs=OutputOptions(output_file="/tmp/combined_flattened")
+    )
+    print("✅ Gateway + Anchor 扁平化完成")
+    print("輸出位置: /tmp/combined_flattened_*")
+
+
+if __name__ == "__main__":
+    run_local_test()
@@ -0,0 +1,348 @@
+"""Pipeline 共用部分 - 輸出選項、單一設備類型的處理分支、單一類型 Pipeline 基類"""
+
+import apache_beam as beam
+from apache_beam.options.pipeline_options import PipelineOptions, StandardOptions
+import logging
+import json
+from dataclasses import dataclass, fields
+from typing import Dict, Any, Optional, Tuple
+
+from ..transforms.decode_transform import DecodeJson
+from ..transforms.ndjson_source import read_file_lines
+from ..transforms.ndjson_sink import WriteNdjson
+from ..transforms.parquet_sink import WriteParquet, DEFAULT_ROW_GROUP_SIZE
+from ..transforms.fused_transform import FlattenAndClassify
+from ..transforms.bigquery_sink import WriteBigQuery
+from ..transforms.change_suppression import SuppressUnchanged, DEFAULT_MAX_SILENCE_SECONDS
+from ..transforms.redis_sink import WriteToRedis, DEFAULT_TTL_SECONDS as DEFAULT_REDIS_TTL_SECONDS, DEFAULT_CHANNEL
+from ..transforms.vital_rollups import VitalRollups
+from ..transforms.anomaly_detection import DetectVitalAnomalies, make_thresholds
+from ..transforms.priority_alerts import PriorityAlertLane
+from ..transforms.registry_enrichment import EnrichFromRegistry, DEFAULT_TTL_SECONDS as DEFAULT_REGISTRY_TTL_SECONDS
+from ..transforms.validation_rules import compile_rules
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OutputOptions:
+    """
+    扁平化之後的增強、告警與輸出選項（三個 Pipeline 共用）
+
+    Attributes:
+        output_file: 有效數據的輸出文件前綴；parquet 時為分區數據集根目錄
+        output_format: "ndjson" 或 "parquet"
+        row_group_size: Parquet 每個 row group 的記錄數
+        output_compression: 文件輸出（有效數據、錯誤日誌、dead letter）的壓縮編碼
+                            ("none", "gzip", "zstd")
+        compression_level: 壓縮級別，None 表示預設（gzip 6 / zstd 3）
+        output_bigquery: BigQuery 表 ("project:dataset.table")；
+                         合併 Pipeline 按設備類型另行指定（見 CombinedFlatteningPipeline）
+        bigquery_method: "streaming"（streaming insert）或 "file_loads"
+                         （暫存 Parquet + load job，僅 file 輸入）
+        bigquery_temp_location: file_loads 的暫存目錄（gs:// 或本地路徑）
+        output_redis: Redis URL（redis://host:6379/0），提供時寫入最新設備狀態
+        redis_ttl_seconds: Redis Hash 過期秒數，None 表示不過期
+        redis_channel: 變更通知的 channel，None 表示不發佈
+        suppress_unchanged: 按 device_id 抑制無變化的有效記錄（作用於所有有效數據輸出）
+        change_deadbands: {設備類型: {字段: 死區}}（同 Config.change_deadbands），None 表示內建死區
+        max_silence_seconds: 變更抑制時，無變更最長多久轉發一筆
+        output_rollups: 生命體徵彙總的輸出前綴，寫入 <前綴>_minute* / <前綴>_hour*（僅 Anchor）
+        output_alerts: 生命體徵異常告警的輸出前綴，提供時啟用按設備基線的異常偵測（僅 Anchor）
+        anomaly_thresholds: {字段: {z_score, max_rate_per_minute, min_stddev}}，None 表示內建閾值
+        priority_sink: 危急告警的低延遲輸出："tcp://host:port" 或 Pub/Sub 主題
+        device_registry: 設備登記表快照（CSV / JSON / SQLite），提供時補上
+                         facility_id / room_id / resident_id
+        registry_ttl_seconds: 登記表的重新載入間隔
+
+    Example:
+        outputs = OutputOptions.from_config(config, output_file="/tmp/anchor_flattened")
+        AnchorFlatteningPipeline().run(input_path="test_data/anchors.json", outputs=outputs)
+    """
+
+    output_file: Optional[str] = None
+    output_format: str = "ndjson"
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE
+    output_compression: str = "none"
+    compression_level: Optional[int] = None
+    output_bigquery: Optional[str] = None
+    bigquery_method: str = "streaming"
+    bigquery_temp_location: Optional[str] = None
+    output_redis: Optional[str] = None
+    redis_ttl_seconds: Optional[int] = DEFAULT_REDIS_TTL_SECONDS
+    redis_channel: Optional[str] = DEFAULT_CHANNEL
+    suppress_unchanged: bool = False
+    change_deadbands: Optional[Dict[str, Dict[str, float]]] = None
+    max_silence_seconds: int = DEFAULT_MAX_SILENCE_SECONDS
+    output_rollups: Optional[str] = None
+    output_alerts: Optional[str] = None
+    anomaly_thresholds: Optional[Dict[str, Dict[str, float]]] = None
+    priority_sink: Optional[str] = None
+    device_registry: Optional[str] = None
+    registry_ttl_seconds: int = DEFAULT_REGISTRY_TTL_SECONDS
+
+    @classmethod
+    def from_config(cls, config, **overrides) -> "OutputOptions":
+        """
+        以 Config 的 Redis / 登記表 / 告警 / 死區 / 暫存目錄為預設值
+
+        overrides 中值為 None 的項目不覆寫（命令行未提供時沿用 Config）。
+        """
+        options = cls(
+            bigquery_temp_location=config.temp_location,
+            output_redis=config.redis_url,
+            redis_ttl_seconds=config.redis_ttl_seconds,
+            redis_channel=config.redis_channel,
+            change_deadbands=config.change_deadbands,
+            anomaly_thresholds=config.anomaly_thresholds,
+            priority_sink=config.priority_alert_sink,
+            device_registry=config.device_registry,
+            registry_ttl_seconds=config.device_registry_ttl_seconds,
+        )
+        known = {f.name for f in fields(cls)}
+        unknown = set(overrides) - known
+        if unknown:
+            raise TypeError(f"未知的輸出選項: {sorted(unknown)}")
+        for name, value in overrides.items():
+            if value is not None:
+                setattr(options, name, value)
+        return options
+
+    @property
+    def compression(self) -> Tuple[str, Optional[int]]:
+        """(壓縮編碼, 級別)，傳給 WriteNdjson / WriteParquet"""
+        return (self.output_compression, self.compression_level)
+
+    def check(self, input_type: str):
+        """檢查與輸入類型的組合"""
+        if self.output_bigquery and self.bigquery_method == "file_loads" and input_type != "file":
+            raise ValueError("BigQuery file_loads 只支持 file 輸入（有界數據）")
+
+
+def expand_device_branch(device_type: str,
+                         raw_data,
+                         outputs: OutputOptions,
+                         stage_mode: str = "staged",
+                         validation_mode: str = "record",
+                         batch_size: int = 500,
+                         validation_rules: Optional[Dict[str, Any]] = None,
+                         file_prefix: Optional[str] = None):
+    """
+    單一設備類型的 扁平化 → 驗證 → 增強 → 分類 → 輸出
+
+    順序：登記表增強 → 生命體徵彙總 / 異常偵測 → 危急告警 → 變更抑制 →
+    BigQuery / Redis / Parquet / NDJSON；無效數據寫入 /tmp/<設備類型>_errors。
+
+    Args:
+        device_type: "gateway" 或 "anchor"
+        raw_data: 解碼後的原始字典
+        outputs: 輸出選項
+        stage_mode: "staged"（多階段圖）或 "fused"（單一融合 DoFn）
+        validation_mode: "record"（逐筆驗證）或 "batch"（向量化批量驗證）
+        batch_size: 批量驗證的最大批次
+        validation_rules: 驗證規則（Config.validation_rules），None 表示內建規則
+        file_prefix: NDJSON 輸出前綴，None 表示 outputs.output_file
+    """
+    label = device_type.capitalize()
+    compression = outputs.compression
+    file_prefix = file_prefix or outputs.output_file
+
+    valid_only, invalid_only = (
+        raw_data
+        | f"扁平化 {label}" >> FlattenAndClassify(
+            device_type, stage_mode, validation_mode,
+            batch_size=batch_size, validation_rules=validation_rules
+        )
+    )
+
+    # 登記表增強：補上機構 / 房間 / 長者（之後的所有輸出都帶有這些字段）
+    if outputs.device_registry:
+        valid_only = valid_only | f"登記表增強 {label}" >> EnrichFromRegistry(
+            device_type, outputs.device_registry, outputs.registry_ttl_seconds
+        )
+
+    # 生命體徵彙總（在變更抑制之前，所有有效記錄都計入）
+    if outputs.output_rollups:
+        rollups = valid_only | f"彙總生命體徵 {label}" >> VitalRollups(device_type)
+        for granularity, rows in rollups.items():
+            (
+                rows
+                | f"序列化 {granularity} 彙總 {label}" >> beam.Map(json.dumps)
+                | f"寫入 {granularity} 彙總 {label}" >> WriteNdjson(
+                    f"{outputs.output_rollups}_{granularity}", *compression
+                )
+            )
+
+    # 生命體徵異常偵測（相對個人基線的 z-score / 變化率）
+    anomaly_alerts = []
+    if outputs.output_alerts:
+        alerts = valid_only | f"偵測生命體徵異常 {label}" >> DetectVitalAnomalies(
+            device_type, make_thresholds(outputs.anomaly_thresholds)
+        )
+        anomaly_alerts.append(alerts)
+        (
+            alerts
+            | f"序列化告警 {label}" >> beam.Map(json.dumps)
+            | f"寫入告警 {label}" >> WriteNdjson(outputs.output_alerts, *compression)
+        )
+
+    # 危急告警走獨立的低延遲通道（不經文件輸出的分片與緩衝）
+    if outputs.priority_sink:
+        (
+            (valid_only, invalid_only, *anomaly_alerts)
+            | f"危急告警 {label}" >> PriorityAlertLane(
+                device_type, outputs.priority_sink, validation_rules=validation_rules
+            )
+        )
+
+    # 變更抑制（只保留超出死區的變更與心跳）
+    if outputs.suppress_unchanged:
+        valid_only = valid_only | f"抑制重複 {label}" >> SuppressUnchanged(
+            device_type, (outputs.change_deadbands or {}).get(device_type), outputs.max_silence_seconds
+        )
+
+    # 有效數據輸出
+    if outputs.output_bigquery:
+        (
+            valid_only
+            | f"寫入 BigQuery {label}" >> WriteBigQuery(
+                outputs.output_bigquery, device_type, outputs.bigquery_method, outputs.bigquery_temp_location
+            )
+        )
+
+    if outputs.output_redis:
+        (
+            valid_only
+            | f"寫入 Redis {label}" >> WriteToRedis(
+                device_type, url=outputs.output_redis,
+                ttl_seconds=outputs.redis_ttl_seconds, channel=outputs.redis_channel
+            )
+        )
+
+    if outputs.output_file and outputs.output_format == "parquet":
+        (
+            valid_only
+            | f"寫入 Parquet {label}" >> WriteParquet(
+                outputs.output_file, device_type, outputs.row_group_size, *compression
+            )
+        )
+    elif file_prefix:
+        (
+            valid_only
+            | f"序列化 {label}" >> beam.Map(json.dumps)
+            | f"寫入文件 {label}" >> WriteNdjson(file_prefix, *compression)
+        )
+
+    # 無效數據記錄（錯誤碼只在此處轉換為可讀訊息）
+    rule_set = compile_rules(device_type, validation_rules)
+    (
+        invalid_only
+        | f"記錄無效 {label}" >> beam.Map(lambda x: f"Invalid: {json.dumps(rule_set.annotate(x))}")
+        | f"寫入錯誤日誌 {label}" >> WriteNdjson(f"/tmp/{device_type}_errors", *compression)
+    )
+
+
+class SingleTypeFlatteningPipeline:
+    """
+    單一設備類型的扁平化 Pipeline（子類設置 DEVICE_TYPE）
+
+    Flow:
+    1. 讀取原始 4層數據 (Pub/Sub 或文件)，批量解碼，無法解析的訊息進入 dead letter
+    2. 扁平化 → 驗證 → 增強 → 分類（expand_device_branch，與合併 Pipeline 共用）
+    3. 分支輸出：
+       - 有效數據 → BigQuery / Redis / Parquet / NDJSON（見 OutputOptions）
+       - 無效數據 → 錯誤日誌
+    """
+
+    DEVICE_TYPE = ""
+
+    def __init__(self, project_id: str = None, region: str = "asia-east1"):
+        """
+        初始化 Pipeline
+
+        Args:
+            project_id: GCP 項目 ID
+            region: GCP 區域
+        """
+        self.project_id = project_id
+        self.region = region
+
+    def run(self,
+            runner: str = "DirectRunner",
+            input_type: str = "file",
+            input_path: str = None,
+            input_topic: str = None,
+            outputs: Optional[OutputOptions] = None,
+            json_backend: str = "auto",
+            decode_batch_size: int = 500,
+            stage_mode: str = "staged",
+            validation_mode: str = "record",
+            validation_rules: Optional[Dict[str, Any]] = None,
+            file_reader: str = "text"):
+        """
+        執行 Pipeline
+
+        Args:
+            runner: "DirectRunner" (本地) 或 "DataflowRunner" (GCP)
+            input_type: "file" 或 "pubsub"
+            input_path: 輸入文件路徑 (file 模式)
+            input_topic: Pub/Sub 主題 (pubsub 模式)
+            outputs: 增強、告警與輸出選項，None 表示只寫錯誤日誌
+            json_backend: JSON 解碼後端 ("auto", "orjson", "simdjson", "json")
+            decode_batch_size: 每批解碼的最大訊息數
+            stage_mode: "staged"（多階段圖）或 "fused"（單一融合 DoFn）
+            validation_mode: "record"（逐筆驗證）或 "batch"（向量化批量驗證）
+            validation_rules: 驗證規則（Config.validation_rules），None 表示內建規則
+            file_reader: "text"（ReadFromText）或 "mmap"（記憶體映射讀取本地文件）
+
+        Returns:
+            PipelineResult（可查詢 Beam Metrics）
+        """
+        device_type = self.DEVICE_TYPE
+        outputs = outputs or OutputOptions()
+        outputs.check(input_type)
+
+        # 建立 Pipeline Options
+        options = PipelineOptions()
+        options.view_as(StandardOptions).runner = runner
+
+        if runner == "DataflowRunner":
+            options.view_as(StandardOptions).project = self.project_id
+            options.view_as(StandardOptions).region = self.region
+
+        # 建立 Pipeline
+        with beam.Pipeline(options=options) as pipeline:
+            # 讀取輸入
+            if input_type == "file":
+                raw_bytes = (
+                    pipeline
+                    | "讀取文件" >> read_file_lines(input_path, file_reader)
+                )
+            elif input_type == "pubsub":
+                raw_bytes = (
+                    pipeline
+                    | "讀取 Pub/Sub" >> beam.io.gcp.pubsub.ReadFromPubSub(topic=input_topic)
+                )
+            else:
+                raise ValueError(f"未支持的輸入類型: {input_type}")
+
+            # 直接從 bytes 批量解析，無法解析的訊息進入 dead letter
+            decoded = (
+                raw_bytes
+                | "解析 JSON" >> DecodeJson(backend=json_backend, max_batch_size=decode_batch_size)
+            )
+
+            (
+                decoded.dead_letter
+                | "序列化 Dead Letter" >> beam.Map(json.dumps)
+                | "寫入 Dead Letter" >> WriteNdjson(f"/tmp/{device_type}_dead_letter", *outputs.compression)
+            )
+
+            expand_device_branch(
+                device_type, decoded.decoded, outputs,
+                stage_mode, validation_mode, decode_batch_size, validation_rules
+            )
+
+        # with 區塊結束時已執行並等待完成
+        return pipeline.result
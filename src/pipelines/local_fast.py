@@ -0,0 +1,405 @@
+"""本地多進程批量引擎 - 不經 Beam runner 的快速回填"""
+
+import glob
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Any, Dict, IO, Iterator, List, NamedTuple, Optional
+
+from apache_beam.pvalue import TaggedOutput
+
+from ..transforms.decode_transform import DecodeJsonTransform
+from ..transforms.fused_transform import FusedFlattenTransform, VALIDATION_MODES
+from ..transforms.router_transform import DeviceTypeRouter, DEVICE_TYPES
+from ..transforms.validation_rules import compile_rules
+from ..utils.compression import NONE, detect_codec, open_input, open_output, output_suffix, validate_codec
+from ..utils.json_codec import get_json_encoder
+from ..utils.ndjson_reader import MmapNdjsonReader
+from .combined_flattening import SOURCE_TYPES
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CHUNK_BYTES = 32 << 20
+MIN_CHUNK_BYTES = 1 << 20
+
+# 每個 worker 最多排隊的分塊數（限制主進程持有的待處理任務）
+_INFLIGHT_PER_WORKER = 2
+
+
+class Chunk(NamedTuple):
+    """輸入文件的一個位元組範圍 [start, end)，end 為 None 表示讀到文件結尾"""
+    index: int
+    source: str
+    path: str
+    start: int
+    end: Optional[int]
+
+
+@dataclass
+class LocalRunStats:
+    """本地引擎執行結果"""
+    counts: Dict[str, int]
+    shards: int
+    workers: int
+    elapsed_seconds: float
+
+    @property
+    def records_per_sec(self) -> float:
+        records = self.counts.get("records_in", 0)
+        return records / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    @property
+    def bytes_per_sec(self) -> float:
+        total = self.counts.get("bytes_in", 0)
+        return total / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def format_table(self) -> str:
+        """格式化為文字表格（與 format_metrics_table 相同的欄位排列）"""
+        rows = [(name, str(value)) for name, value in sorted(self.counts.items())]
+        rows.append(("records_per_sec", f"{self.records_per_sec:.1f}"))
+        rows.append(("bytes_per_sec", f"{self.bytes_per_sec:.1f}"))
+        width = max(len(name) for name, _ in rows)
+        return "\n".join(f"{name.ljust(width)}  {value}" for name, value in rows)
+
+
+def _is_compressed(path: str) -> bool:
+    return detect_codec(path) != NONE
+
+
+def plan_chunks(sources: Dict[str, str], chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> List[Chunk]:
+    """
+    將輸入文件切分為位元組範圍
+
+    只依文件大小切分，不讀取內容；實際的行邊界由 worker 在讀取時對齊。
+    壓縮文件（gzip / zstd）無法隨機讀取，整個文件為一個分塊。
+
+    Args:
+        sources: {來源類型: 文件路徑或 glob}
+        chunk_bytes: 每個分塊的目標位元組數
+
+    Returns:
+        分塊列表（index 為全域序號，也是輸出分片序號）
+    """
+    chunks: List[Chunk] = []
+    for source, pattern in sources.items():
+        paths = sorted(glob.glob(pattern)) or [pattern]
+        for path in paths:
+            size = os.path.getsize(path)
+            if _is_compressed(path) or size <= chunk_bytes:
+                chunks.append(Chunk(len(chunks), source, path, 0, None))
+                continue
+            for start in range(0, size, chunk_bytes):
+                end = start + chunk_bytes
+                chunks.append(Chunk(len(chunks), source, path, start, end if end < size else None))
+    return chunks
+
+
+def read_chunk_lines(chunk: Chunk, batch_lines: int = 500) -> Iterator[List[Any]]:
+    """
+    讀取分塊內的完整行（按批產出，空行略過）
+
+    未壓縮文件以 MmapNdjsonReader 讀取：起始位置落在 [start, end) 的行屬於此分塊，
+    每行為 memoryview 切片（不複製）。壓縮文件串流解壓後逐行讀取（bytes）。
+
+    Yields:
+        每批最多 batch_lines 行（不含換行符）
+    """
+    codec = detect_codec(chunk.path)
+    if codec != NONE:
+        with open_input(chunk.path, codec) as f:
+            yield from _batched_lines(f, batch_lines)
+        return
+
+    with MmapNdjsonReader(chunk.path) as reader:
+        yield from reader.iter_batches(chunk.start, chunk.end, batch_lines)
+
+
+def _batched_lines(f: IO[bytes], batch_lines: int) -> Iterator[List[bytes]]:
+    batch = []
+    for line in f:
+        line = line.rstrip(b"\r\n")
+        if not line.strip():
+            continue
+        batch.append(line)
+        if len(batch) >= batch_lines:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def shard_path(prefix: str, index: int, total: int, codec: str = NONE) -> str:
+    """輸出分片路徑（與 WriteToText / WriteNdjson 的命名相同）"""
+    return f"{prefix}-{index:05d}-of-{total:05d}{output_suffix(codec)}"
+
+
+class _ChunkProcessor:
+    """
+    單一進程內的處理狀態
+
+    重用 Beam 管線中的 DoFn（直接調用 process，不經 runner）：
+    DecodeJsonTransform(keyed) → DeviceTypeRouter → FusedFlattenTransform(batch / record)
+    """
+
+    def __init__(self,
+                 json_backend: str = "auto",
+                 validation_mode: str = "batch",
+                 validation_rules: Optional[Dict[str, Any]] = None,
+                 batch_size: int = 500,
+                 output_compression: str = NONE,
+                 compression_level: Optional[int] = None):
+        self.batch_size = batch_size
+        self.compression = (output_compression, compression_level)
+        self.validation_mode = validation_mode
+        self.decoder = DecodeJsonTransform(json_backend, keyed=True)
+        self.decoder.setup()
+        self.router = DeviceTypeRouter()
+        self.flatteners = {}
+        self.rule_sets = {}
+        for device_type in DEVICE_TYPES:
+            dofn = FusedFlattenTransform(device_type, validation_mode, validation_rules)
+            dofn.setup()
+            self.flatteners[device_type] = dofn
+            self.rule_sets[device_type] = compile_rules(device_type, validation_rules)
+        _, self.dumps = get_json_encoder(json_backend)
+
+    def process(self, chunk: Chunk, output_prefix: str, total: int) -> Counter:
+        """處理一個分塊並寫出本分塊的輸出分片，返回計數"""
+        counts: Counter = Counter()
+        writers = _ShardWriters(output_prefix, chunk.index, total, *self.compression)
+        try:
+            for lines in read_chunk_lines(chunk, self.batch_size):
+                self._process_lines(chunk.source, lines, writers, counts)
+        finally:
+            writers.close()
+            for dofn in self.flatteners.values():
+                dofn.finish_bundle()
+        counts["chunks"] += 1
+        return counts
+
+    def _process_lines(self, source: str, lines: List[bytes], writers: "_ShardWriters", counts: Counter):
+        dumps = self.dumps
+        counts["records_in"] += len(lines)
+        counts["bytes_in"] += sum(len(line) + 1 for line in lines)
+
+        routed: Dict[str, List[Dict[str, Any]]] = {device_type: [] for device_type in DEVICE_TYPES}
+        for output in self.decoder.process([(source, line) for line in lines]):
+            if isinstance(output, TaggedOutput):
+                counts["dead_letters"] += 1
+                writers.write("dead_letter", dumps(output.value))
+                continue
+            for tagged in self.router.process(output):
+                if tagged.tag == DeviceTypeRouter.QUARANTINE_TAG:
+                    counts["quarantined"] += 1
+                    writers.write("quarantine", dumps(tagged.value))
+                else:
+                    routed[tagged.tag].append(tagged.value)
+
+        for device_type, records in routed.items():
+            if records:
+                self._classify(device_type, records, writers, counts)
+
+    def _classify(self, device_type: str, records: List[Dict[str, Any]],
+                  writers: "_ShardWriters", counts: Counter):
+        dofn = self.flatteners[device_type]
+        if self.validation_mode == "batch":
+            outputs = dofn.process(records)
+        else:
+            outputs = (output for record in records for output in dofn.process(record))
+
+        dumps = self.dumps
+        rule_set = self.rule_sets[device_type]
+        for output in outputs:
+            if not isinstance(output, TaggedOutput):
+                counts[f"valid.{device_type}"] += 1
+                writers.write(device_type, dumps(output))
+            elif output.tag == FusedFlattenTransform.INVALID_TAG:
+                counts[f"invalid.{device_type}"] += 1
+                writers.write(f"{device_type}_errors", dumps(rule_set.annotate(output.value)))
+            else:
+                counts[f"flatten_errors.{device_type}"] += 1
+                writers.write(f"{device_type}_errors", dumps(output.value))
+
+
+class _ShardWriters:
+    """一個分塊的輸出分片（<前綴>_<名稱>-NNNNN-of-NNNNN[.gz|.zst]），有內容時才建立文件"""
+
+    def __init__(self, prefix: str, index: int, total: int,
+                 codec: str = NONE, level: Optional[int] = None):
+        self.prefix = prefix
+        self.index = index
+        self.total = total
+        self.codec = codec
+        self.level = level
+        self._files: Dict[str, IO[bytes]] = {}
+
+    def write(self, name: str, line: bytes):
+        f = self._files.get(name)
+        if f is None:
+            path = shard_path(f"{self.prefix}_{name}", self.index, self.total, self.codec)
+            f = self._files[name] = open_output(path, self.codec, self.level)
+        f.write(line)
+        f.write(b"\n")
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+
+# worker 進程內的處理器（由 ProcessPoolExecutor 的 initializer 建立）
+_WORKER: Optional[_ChunkProcessor] = None
+
+
+def _init_worker(json_backend: str,
+                 validation_mode: str,
+                 validation_rules: Optional[Dict[str, Any]],
+                 batch_size: int,
+                 output_compression: str,
+                 compression_level: Optional[int]):
+    global _WORKER
+    _WORKER = _ChunkProcessor(
+        json_backend, validation_mode, validation_rules, batch_size, output_compression, compression_level
+    )
+
+
+def _run_chunk(chunk: Chunk, output_prefix: str, total: int) -> Counter:
+    return _WORKER.process(chunk, output_prefix, total)
+
+
+class LocalFastEngine:
+    """
+    本地多進程批量引擎（--runner LocalFast）
+
+    用於歷史數據回填：不建立 Beam 圖，直接在 ProcessPoolExecutor 中調用
+    與 Beam 管線相同的 DoFn（解碼 → 路由 → 扁平化/驗證/增強/分類）。
+
+    Flow:
+    1. 依文件大小將輸入切為位元組範圍分塊（不讀取內容）
+    2. 各 worker 讀取自己的分塊（對齊行邊界），按批處理
+    3. 每個分塊寫出自己的輸出分片，只把計數返回主進程
+
+    記憶體上限約為 workers × (chunk_bytes + 一批記錄)；
+    主進程最多持有 workers × 2 個待處理分塊。
+    各分塊互不共享狀態，吞吐量隨核心數近似線性增長。
+
+    輸出（<前綴> 為 output_prefix）：
+    - <前綴>_gateway-* / <前綴>_anchor-*：有效記錄（NDJSON）
+    - <前綴>_<類型>_errors-*：無效記錄（含 validation_errors）與扁平化錯誤
+    - <前綴>_dead_letter-*：無法解析的訊息
+    - <前綴>_quarantine-*：mixed 來源中無法識別類型的訊息
+
+    Example:
+        engine = LocalFastEngine(workers=16)
+        stats = engine.run({"anchor": "/data/anchors/2025-*.ndjson"}, "/tmp/backfill/out")
+        print(stats.format_table())
+    """
+
+    def __init__(self,
+                 workers: Optional[int] = None,
+                 chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                 json_backend: str = "auto",
+                 validation_mode: str = "batch",
+                 validation_rules: Optional[Dict[str, Any]] = None,
+                 batch_size: int = 500,
+                 output_compression: str = NONE,
+                 compression_level: Optional[int] = None,
+                 min_chunk_bytes: int = MIN_CHUNK_BYTES):
+        """
+        Args:
+            workers: 進程數，None 表示 os.cpu_count()；1 表示在當前進程內執行
+            chunk_bytes: 每個分塊的最大位元組數
+            json_backend: JSON 編解碼後端
+            validation_mode: "batch"（向量化驗證）或 "record"（逐筆驗證）
+            validation_rules: 驗證規則（Config.validation_rules），None 表示內建規則
+            batch_size: 每批處理的行數
+            output_compression: 輸出分片的壓縮編碼 ("none", "gzip", "zstd")
+            compression_level: 壓縮級別，None 表示預設
+            min_chunk_bytes: 按 worker 數平衡分塊時的最小分塊位元組數
+        """
+        if validation_mode not in VALIDATION_MODES:
+            raise ValueError(f"未支持的驗證模式: {validation_mode}")
+        if chunk_bytes <= 0 or batch_size <= 0 or min_chunk_bytes <= 0:
+            raise ValueError("chunk_bytes、min_chunk_bytes 與 batch_size 必須大於 0")
+        validate_codec(output_compression, compression_level)
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.chunk_bytes = chunk_bytes
+        self.min_chunk_bytes = min_chunk_bytes
+        self.json_backend = json_backend
+        self.validation_mode = validation_mode
+        self.validation_rules = validation_rules
+        self.batch_size = batch_size
+        self.output_compression = output_compression
+        self.compression_level = compression_level
+
+    def _chunk_size(self, sources: Dict[str, str]) -> int:
+        """分塊大小：不超過 chunk_bytes，且讓每個 worker 至少分到約 4 個分塊以平衡負載"""
+        total = sum(
+            os.path.getsize(path)
+            for pattern in sources.values()
+            for path in (glob.glob(pattern) or [pattern])
+        )
+        balanced = total // (self.workers * 4) + 1
+        return max(self.min_chunk_bytes, min(self.chunk_bytes, balanced))
+
+    def run(self, input_paths: Dict[str, Optional[str]], output_prefix: str) -> LocalRunStats:
+        """
+        執行回填
+
+        Args:
+            input_paths: {來源類型: 文件路徑或 glob}（"gateway" / "anchor" / "mixed"，
+                         值為 None 的類型不讀取）
+            output_prefix: 輸出文件前綴
+
+        Returns:
+            LocalRunStats
+        """
+        sources = {kind: path for kind, path in input_paths.items() if path}
+        unknown = set(sources) - set(SOURCE_TYPES)
+        if unknown:
+            raise ValueError(f"未支持的來源類型: {sorted(unknown)}")
+        if not sources:
+            raise ValueError("至少需要一個輸入來源")
+
+        output_dir = os.path.dirname(output_prefix)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        start = time.perf_counter()
+        chunks = plan_chunks(sources, self._chunk_size(sources))
+        total = len(chunks)
+        workers = min(self.workers, total) or 1
+        logger.info(f"LocalFast: {total} 個分塊, {workers} 個進程")
+
+        init_args = (
+            self.json_backend, self.validation_mode, self.validation_rules, self.batch_size,
+            self.output_compression, self.compression_level,
+        )
+        counts: Counter = Counter()
+        if workers == 1:
+            processor = _ChunkProcessor(*init_args)
+            for chunk in chunks:
+                counts.update(processor.process(chunk, output_prefix, total))
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=init_args) as pool:
+                pending = set()
+                for chunk in chunks:
+                    if len(pending) >= workers * _INFLIGHT_PER_WORKER:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            counts.update(future.result())
+                    pending.add(pool.submit(_run_chunk, chunk, output_prefix, total))
+                for future in pending:
+                    counts.update(future.result())
+
+        return LocalRunStats(
+            counts=dict(counts),
+            shards=total,
+            workers=workers,
+            elapsed_seconds=time.perf_counter() - start,
+        )
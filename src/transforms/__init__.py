@@ -1,13 +1,42 @@
 """Apache Beam 轉換模塊"""
 
+from .decode_transform import DecodeJsonTransform, DecodeJson
 from .flatten_transform import FlattenGatewayTransform, FlattenAnchorTransform
 from .validation_transform import ValidateGatewayTransform, ValidateAnchorTransform
+from .fused_transform import FusedFlattenTransform, FlattenAndClassify
+from .router_transform import DeviceTypeRouter, RouteByDeviceType, classify_payload
+from .ndjson_source import ReadNdjson
+from .ndjson_sink import WriteNdjson
+from .parquet_sink import WriteParquet
+from .schema_rows import ToRows
+from .bigquery_sink import WriteBigQuery, WriteToBigQueryBatch
+from .vital_rollups import VitalRollups
+from .anomaly_detection import DetectVitalAnomalies
+from .priority_alerts import PriorityAlertLane
+from .registry_enrichment import EnrichFromRegistry
 
 __all__ = [
+    "DecodeJsonTransform",
+    "DecodeJson",
     "FlattenGatewayTransform",
     "FlattenAnchorTransform",
     "ValidateGatewayTransform",
     "ValidateAnchorTransform",
+    "FusedFlattenTransform",
+    "FlattenAndClassify",
+    "DeviceTypeRouter",
+    "RouteByDeviceType",
+    "classify_payload",
+    "ReadNdjson",
+    "WriteNdjson",
+    "WriteParquet",
+    "ToRows",
+    "WriteBigQuery",
+    "WriteToBigQueryBatch",
+    "VitalRollups",
+    "DetectVitalAnomalies",
+    "PriorityAlertLane",
+    "EnrichFromRegistry",
 ]
 
 
@@ -0,0 +1,221 @@
+"""生命體徵異常偵測 - 按設備的固定大小基線（EWMA 均值 / 方差）與 z-score、變化率閾值"""
+
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import apache_beam as beam
+from apache_beam.coders import FastPrimitivesCoder
+from apache_beam.transforms.userstate import ReadModifyWriteStateSpec
+from apache_beam.typehints import Tuple
+
+from ..utils.metrics import StageMetricsMixin, parse_timestamp_ms
+from .custom_coders import FlattenedRecordType
+
+
+class VitalThreshold(NamedTuple):
+    """單一字段的告警閾值"""
+    # |值 - 基線均值| / 基線標準差 超過此值時告警
+    z_score: float
+    # 與上一筆讀數相比，每分鐘變化量超過此值時告警
+    max_rate_per_minute: float
+    # 基線標準差下限，避免讀數長期不變時微小波動即觸發 z-score 告警
+    min_stddev: float
+
+
+DEFAULT_THRESHOLDS: Dict[str, VitalThreshold] = {
+    "heart_rate": VitalThreshold(z_score=4.0, max_rate_per_minute=30.0, min_stddev=2.0),
+    "temperature": VitalThreshold(z_score=4.0, max_rate_per_minute=0.5, min_stddev=0.1),
+}
+
+# EWMA 平滑係數：約等於最近 1/alpha 筆讀數的基線
+DEFAULT_ALPHA = 0.05
+# 基線至少累計的讀數，之前只更新基線不做 z-score 判斷
+DEFAULT_MIN_SAMPLES = 20
+
+ALERT_TYPE = "vital_anomaly"
+
+# 每個字段的狀態槽位：count, mean, variance, 上一筆值, 上一筆事件時間（毫秒）
+_COUNT, _MEAN, _VAR, _LAST_VALUE, _LAST_MS = range(5)
+
+
+def make_thresholds(overrides: Optional[Dict[str, Dict[str, float]]] = None) -> Dict[str, VitalThreshold]:
+    """
+    配置（{字段: {z_score, max_rate_per_minute, min_stddev}}）-> {字段: VitalThreshold}
+
+    None 表示 DEFAULT_THRESHOLDS；已知字段未提供的鍵沿用預設值，新字段必須提供全部鍵。
+    """
+    if overrides is None:
+        return dict(DEFAULT_THRESHOLDS)
+    thresholds = {}
+    for field, values in overrides.items():
+        default = DEFAULT_THRESHOLDS.get(field)
+        merged = {**default._asdict(), **values} if default else dict(values)
+        missing = set(VitalThreshold._fields) - set(merged)
+        if missing:
+            raise ValueError(f"字段 {field} 的異常閾值缺少: {sorted(missing)}")
+        thresholds[field] = VitalThreshold(**{k: float(merged[k]) for k in VitalThreshold._fields})
+    return thresholds
+
+
+def update_baseline(slots: List[float], value: float, alpha: float) -> None:
+    """
+    以一筆讀數更新 [count, mean, variance, ...]（原地）
+
+    前 1/alpha 筆使用 1/count 作為權重（等同 Welford 的總體均值 / 方差），
+    之後使用固定 alpha 的 EWMA，基線隨個人的長期變化緩慢漂移。
+    """
+    slots[_COUNT] += 1
+    weight = max(alpha, 1.0 / slots[_COUNT])
+    diff = value - slots[_MEAN]
+    increment = weight * diff
+    slots[_MEAN] += increment
+    slots[_VAR] = (1 - weight) * (slots[_VAR] + diff * increment)
+
+
+class DetectVitalAnomaliesFn(StageMetricsMixin, beam.DoFn):
+    """
+    按 device_id 偵測生命體徵相對個人基線的異常
+
+    輸入：(device_id, 記錄)；輸出：告警事件
+    狀態：每個字段 5 個數值（count / mean / variance / 上一筆值 / 上一筆事件時間），
+          大小固定，與歷史長度無關。
+    判斷（在更新基線之前，與舊基線比較）：
+        - z_score：累計至少 min_samples 筆後，|值 - 均值| / max(標準差, min_stddev) 超過閾值
+        - rate_of_change：與上一筆讀數的每分鐘變化量超過閾值
+    異常讀數同樣更新基線（持續的水平變化會逐漸成為新基線）；
+    事件時間早於上一筆的讀數視為過期，不判斷也不更新。
+
+    Metrics（階段 anomaly_<device_type>）：records_in / records_out（告警數）/
+    alerts.<字段>.<原因> / stale；processing_us 為每筆的處理耗時
+    """
+
+    BASELINE = ReadModifyWriteStateSpec("baseline", FastPrimitivesCoder())
+
+    def __init__(self,
+                 device_type: str = "anchor",
+                 thresholds: Optional[Dict[str, VitalThreshold]] = None,
+                 alpha: float = DEFAULT_ALPHA,
+                 min_samples: int = DEFAULT_MIN_SAMPLES):
+        self.device_type = device_type
+        self.thresholds = dict(DEFAULT_THRESHOLDS if thresholds is None else thresholds)
+        self.fields = tuple(self.thresholds)
+        self.alpha = alpha
+        self.min_samples = min_samples
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"anomaly_{self.device_type}"
+
+    def process(self, element, baseline=beam.DoFn.StateParam(BASELINE)):
+        start = time.perf_counter_ns()
+        device_id, record = element
+        self.metrics.records_in.inc()
+        event_ms = parse_timestamp_ms(record.get("timestamp") or record.get("last_seen"))
+
+        state = baseline.read() or {}
+        alerts = []
+        for field in self.fields:
+            value = record.get(field)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            slots = state.get(field)
+            if slots is None:
+                slots = state[field] = [0, 0.0, 0.0, None, None]
+            elif event_ms is not None and slots[_LAST_MS] is not None and event_ms < slots[_LAST_MS]:
+                self.metrics.counter("stale").inc()
+                continue
+
+            alert = self._check(field, value, event_ms, slots)
+            if alert:
+                alerts.append(alert)
+            update_baseline(slots, value, self.alpha)
+            slots[_LAST_VALUE] = value
+            slots[_LAST_MS] = event_ms
+        baseline.write(state)
+
+        for alert in alerts:
+            for reason in alert["reasons"]:
+                self.metrics.counter(f"alerts.{alert['field']}.{reason}").inc()
+            alert.update(
+                device_id=device_id,
+                device_type=self.device_type,
+                timestamp=record.get("timestamp") or record.get("last_seen"),
+                detected_at=datetime.utcnow().isoformat() + "Z",
+            )
+        # 只計偵測本身的耗時（不含下游融合階段）
+        self.metrics.observe_elapsed(start)
+        self.metrics.records_out.inc(len(alerts))
+        yield from alerts
+
+    def _check(self, field: str, value: float, event_ms: Optional[float], slots: List[float]) -> Optional[Dict[str, Any]]:
+        threshold = self.thresholds[field]
+        reasons = []
+        z_score = None
+        if slots[_COUNT] >= self.min_samples:
+            stddev = max(math.sqrt(slots[_VAR]), threshold.min_stddev)
+            z_score = (value - slots[_MEAN]) / stddev
+            if abs(z_score) > threshold.z_score:
+                reasons.append("z_score")
+
+        rate = None
+        if slots[_LAST_VALUE] is not None and event_ms is not None and slots[_LAST_MS] is not None:
+            elapsed_minutes = (event_ms - slots[_LAST_MS]) / 60000
+            if elapsed_minutes > 0:
+                rate = (value - slots[_LAST_VALUE]) / elapsed_minutes
+                if abs(rate) > threshold.max_rate_per_minute:
+                    reasons.append("rate_of_change")
+
+        if not reasons:
+            return None
+        return {
+            "alert_type": ALERT_TYPE,
+            "field": field,
+            "value": value,
+            "reasons": reasons,
+            "baseline_mean": slots[_MEAN] if slots[_COUNT] else None,
+            "baseline_stddev": math.sqrt(slots[_VAR]) if slots[_COUNT] else None,
+            "z_score": z_score,
+            "rate_per_minute": rate,
+            "previous_value": slots[_LAST_VALUE],
+        }
+
+
+class DetectVitalAnomalies(beam.PTransform):
+    """
+    生命體徵異常偵測：輸入有效的扁平化記錄，輸出告警事件
+
+    補充 ValidateAnchorTransform 的靜態範圍（心率 30–200、體溫 35–42）：
+    範圍內但相對長者本人基線突然變化的讀數也會告警。缺少 device_id 的記錄不參與偵測。
+
+    Args:
+        device_type: 設備類型（決定 Metrics 階段與告警中的 device_type）
+        thresholds: {字段: VitalThreshold}，None 表示 DEFAULT_THRESHOLDS（見 make_thresholds）
+        alpha: EWMA 平滑係數
+        min_samples: 開始做 z-score 判斷前基線至少累計的讀數
+
+    Example:
+        alerts = valid_only | "偵測異常" >> DetectVitalAnomalies("anchor")
+    """
+
+    def __init__(self,
+                 device_type: str = "anchor",
+                 thresholds: Optional[Dict[str, VitalThreshold]] = None,
+                 alpha: float = DEFAULT_ALPHA,
+                 min_samples: int = DEFAULT_MIN_SAMPLES):
+        super().__init__()
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha 必須在 (0, 1] 之間: {alpha}")
+        self.device_type = device_type
+        self.fn = DetectVitalAnomaliesFn(device_type, thresholds, alpha, min_samples)
+
+    def expand(self, pcoll):
+        return (
+            pcoll
+            | "篩選有設備 ID" >> beam.Filter(lambda record: bool(record.get("device_id")))
+            | "加上鍵" >> beam.Map(lambda record: (record["device_id"], record)).with_output_types(
+                Tuple[str, FlattenedRecordType(self.device_type)]
+            )
+            | "偵測" >> beam.ParDo(self.fn)
+        )
@@ -0,0 +1,172 @@
+"""批量驗證轉換 - 以 NumPy 向量運算檢查整批記錄"""
+
+import apache_beam as beam
+import logging
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .validation_rules import ValidationRuleSet, compile_rules
+from ..utils.logger import AggregatedLoggingMixin
+from ..utils.metrics import StageMetricsMixin
+
+
+logger = logging.getLogger(__name__)
+
+
+_NUMERIC_TYPES = (int, float)
+
+
+class BatchValidator:
+    """
+    向量化驗證器
+
+    將整批記錄的數值字段載入 NumPy 陣列（缺失值為 NaN），以向量遮罩
+    一次完成所有值域與型別檢查，每筆記錄得到一個錯誤位元碼。
+    規則與逐筆驗證相同（同一個 ValidationRuleSet），包括短路語義：
+    required 失敗不再檢查型別，型別錯誤不再檢查值域。
+
+    Example:
+        validator = BatchValidator("anchor")
+        codes = validator.validate_batch(records)
+    """
+
+    def __init__(self, device_type: str, rules: Optional[Dict[str, Any]] = None):
+        self.device_type = device_type
+        self.rule_set: ValidationRuleSet = compile_rules(device_type, rules)
+
+    def validate_batch(self, records: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """
+        驗證整批記錄
+
+        Args:
+            records: 扁平化記錄列表（不會被修改）
+
+        Returns:
+            int64 陣列，每筆記錄的錯誤位元碼（0 表示有效）
+        """
+        n = len(records)
+        codes = np.zeros(n, dtype=np.int64)
+        if n == 0:
+            return codes
+
+        for check in self.rule_set.checks:
+            column = [r.get(check.field) for r in records]
+            # skip：該字段已失敗，後續檢查短路
+            skip = np.fromiter((v is None for v in column), dtype=bool, count=n)
+
+            if check.required_bit:
+                missing = np.fromiter((not v for v in column), dtype=bool, count=n)
+                codes[missing] |= check.required_bit
+                skip |= missing
+
+            if check.numeric_bit:
+                wrong_type = np.fromiter(
+                    (not isinstance(v, _NUMERIC_TYPES) for v in column),
+                    dtype=bool, count=n
+                ) & ~skip
+                codes[wrong_type] |= check.numeric_bit
+                skip |= wrong_type
+
+            if check.range_bit:
+                # 被跳過的值設為 NaN；NaN 的比較結果為 False，不會觸發值域錯誤。
+                # 記錄本身的 NaN / ±inf 與逐筆驗證一致（low < v < high 不成立）視為超出範圍
+                values = np.array(
+                    [None if s else v for v, s in zip(column, skip.tolist())], dtype=np.float64
+                )
+                out_of_range = (values <= check.low) | (values >= check.high) | (~np.isfinite(values) & ~skip)
+                codes[out_of_range] |= check.range_bit
+
+        return codes
+
+    def describe(self, code: int, record: Dict[str, Any]) -> List[str]:
+        """將位元碼轉換為可讀的錯誤訊息（只對無效記錄調用）"""
+        return self.rule_set.describe(code, record)
+
+    def apply(self, records: Sequence[Dict[str, Any]], codes: np.ndarray) -> int:
+        """
+        將位元碼寫回記錄（validation_code / is_valid）
+
+        Returns:
+            無效記錄數
+        """
+        invalid = 0
+        for record, code in zip(records, codes.tolist()):
+            record["validation_code"] = code
+            record["is_valid"] = not code
+            if code:
+                invalid += 1
+        return invalid
+
+    def rule_failures(self, codes: np.ndarray) -> List[Tuple[str, int, int]]:
+        """
+        按規則統計整批的失敗（每條規則一次向量運算）
+
+        Returns:
+            [(規則名稱, 失敗次數, 第一筆失敗記錄的索引)]
+        """
+        failures = []
+        for bit, name in self.rule_set.rule_names.items():
+            hits = np.flatnonzero(codes & bit)
+            if hits.size:
+                failures.append((name, int(hits.size), int(hits[0])))
+        return failures
+
+
+class BatchValidateTransform(AggregatedLoggingMixin, StageMetricsMixin, beam.DoFn):
+    """
+    批量驗證轉換
+
+    輸入：BatchElements 產生的扁平化記錄列表
+    輸出：逐筆記錄（添加 validation_code / is_valid）
+
+    Metrics（階段 validate_<device_type>，與逐筆驗證相同）：records_in /
+    records_out / valid / invalid / failed.<規則名稱> / batch_processing_us
+
+    Example:
+        records | beam.BatchElements() | beam.ParDo(BatchValidateTransform("anchor"))
+    """
+
+    def __init__(self, device_type: str, rules: Optional[Dict[str, Any]] = None):
+        self.device_type = device_type
+        self.rules = rules
+        self._validator = None
+
+    def setup(self):
+        self._validator = BatchValidator(self.device_type, self.rules)
+
+    @property
+    def log_scope(self) -> str:
+        return f"{self.device_type.capitalize()} 批量驗證"
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"validate_{self.device_type}"
+
+    def process(self, batch: List[Dict[str, Any]]):
+        """
+        驗證一批記錄
+
+        Args:
+            batch: 扁平化記錄列表
+
+        Yields:
+            驗證後的記錄
+        """
+        if self._validator is None:
+            self.setup()
+
+        start = time.perf_counter_ns()
+        metrics = self.metrics
+        metrics.records_in.inc(len(batch))
+        codes = self._validator.validate_batch(batch)
+        invalid = self._validator.apply(batch, codes)
+        if invalid:
+            metrics.counter("invalid").inc(invalid)
+            for reason, n, first in self._validator.rule_failures(codes):
+                metrics.counter(f"failed.{reason}").inc(n)
+                self.log.count(reason, batch[first].get("device_id"), n=n)
+        metrics.counter("valid").inc(len(batch) - invalid)
+        metrics.records_out.inc(len(batch))
+        metrics.observe_elapsed(start, "batch_processing_us")
+        yield from batch
@@ -0,0 +1,471 @@
+"""BigQuery 輸出 - streaming insert 或 Parquet 暫存文件 + load job（分區、分群表）"""
+
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import apache_beam as beam
+import pyarrow as pa
+import pyarrow.parquet as pq
+from apache_beam.io.filesystems import FileSystems
+
+from ..models.schema import TIMESTAMP_COLUMNS, bigquery_schema, record_columns
+from ..utils.metrics import StageMetricsMixin
+from .parquet_sink import arrow_schema, records_to_table
+from .schema_rows import make_dict_converter
+
+
+logger = logging.getLogger(__name__)
+
+
+# "streaming"：WriteToBigQuery streaming insert；"file_loads"：暫存 Parquet + load job（僅批次）
+BIGQUERY_METHODS = ("streaming", "file_loads")
+
+# 按 timestamp 的日期分區，按設備 ID 分群（只取表中存在的欄位）
+PARTITION_FIELD = "timestamp"
+CLUSTERING_CANDIDATES = ("device_id", "gateway_id")
+
+# BigQuery load job 上限：每個 job 最多 10,000 個來源 URI、15 TB
+MAX_FILES_PER_JOB = 10_000
+MAX_BYTES_PER_JOB = 15 * (1 << 40)
+
+# 每個暫存文件的最大記錄數
+DEFAULT_ROWS_PER_FILE = 200_000
+
+_UTC_TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+
+def clustering_fields(device_type: str) -> List[str]:
+    """分群欄位（gateway：device_id；anchor：device_id、gateway_id）"""
+    names = {column.name for column in record_columns(device_type)}
+    return [name for name in CLUSTERING_CANDIDATES if name in names]
+
+
+def table_options(device_type: str) -> Dict[str, Any]:
+    """
+    建表參數（REST API 格式）：按 timestamp 日分區、按設備 ID 分群
+
+    用於 WriteToBigQuery 的 additional_bq_parameters（CREATE_IF_NEEDED 時生效）。
+    """
+    return {
+        "timePartitioning": {"type": "DAY", "field": PARTITION_FIELD},
+        "clustering": {"fields": clustering_fields(device_type)},
+    }
+
+
+def staging_arrow_schema(device_type: str) -> pa.Schema:
+    """暫存 Parquet 的 schema：與 arrow_schema 相同，但時間欄位為 UTC timestamp"""
+    schema = arrow_schema(device_type)
+    for name in TIMESTAMP_COLUMNS:
+        index = schema.get_field_index(name)
+        if index >= 0:
+            schema = schema.set(index, schema.field(index).with_type(_UTC_TIMESTAMP))
+    return schema
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """ISO 8601 字符串 -> UTC datetime（無時區視為 UTC），無法解析時為 None"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _to_timestamps(column: pa.Array) -> pa.Array:
+    # 整欄轉換；有無法解析或無時區的值時才逐筆處理
+    try:
+        return column.cast(_UTC_TIMESTAMP)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return pa.array([_parse_timestamp(v) for v in column.to_pylist()], type=_UTC_TIMESTAMP)
+
+
+def staging_table(records: List[Dict[str, Any]], device_type: str) -> pa.Table:
+    """
+    記錄字典 -> 暫存用 Arrow Table
+
+    直接按欄建表（不逐筆重建字典）；類型轉換與 extra_data 同 Parquet 輸出，
+    時間欄位轉為 UTC timestamp（BigQuery 以 TIMESTAMP 載入，分區欄位才能生效）。
+    """
+    table = records_to_table(records, record_columns(device_type), arrow_schema(device_type))
+    schema = staging_arrow_schema(device_type)
+    for name in TIMESTAMP_COLUMNS:
+        index = table.schema.get_field_index(name)
+        if index >= 0:
+            column = _to_timestamps(table.column(index).combine_chunks())
+            table = table.set_column(index, schema.field(index), column)
+    return table
+
+
+class StagedFile(NamedTuple):
+    """一個暫存文件：路徑、記錄數、位元組數"""
+    path: str
+    rows: int
+    size: int
+
+
+class LoadJob(NamedTuple):
+    """一個 BigQuery load job 的完整描述（與執行端無關，可直接比對）"""
+    job_id: str
+    table: str
+    source_uris: List[str]
+    rows: int
+    schema: Dict[str, List[Dict[str, str]]]
+    time_partitioning: Dict[str, str]
+    clustering_fields: List[str]
+    source_format: str = "PARQUET"
+    write_disposition: str = "WRITE_APPEND"
+    create_disposition: str = "CREATE_IF_NEEDED"
+
+
+def plan_load_jobs(files: Iterable[StagedFile],
+                   table: str,
+                   device_type: str,
+                   job_prefix: str,
+                   max_files_per_job: int = MAX_FILES_PER_JOB,
+                   max_bytes_per_job: int = MAX_BYTES_PER_JOB) -> List[LoadJob]:
+    """
+    將暫存文件分組為 load job（每組不超過文件數與位元組上限）
+
+    文件按路徑排序，job_id 為 <job_prefix>_<device_type>_<序號>，
+    同一批文件重試時得到相同的 job_id（BigQuery 拒絕重複的 job_id，避免重複載入）。
+    空文件（0 筆記錄）不載入。
+
+    Args:
+        files: 暫存文件
+        table: "project:dataset.table" 或 "project.dataset.table"
+        device_type: "gateway" 或 "anchor"
+        job_prefix: job_id 前綴（只含字母、數字、_ 與 -）
+    """
+    files = sorted((f for f in files if f.rows > 0), key=lambda f: f.path)
+    options = table_options(device_type)
+    schema = bigquery_schema(device_type)
+
+    groups: List[List[StagedFile]] = []
+    current: List[StagedFile] = []
+    current_bytes = 0
+    for staged in files:
+        if current and (len(current) >= max_files_per_job or current_bytes + staged.size > max_bytes_per_job):
+            groups.append(current)
+            current, current_bytes = [], 0
+        current.append(staged)
+        current_bytes += staged.size
+    if current:
+        groups.append(current)
+
+    return [
+        LoadJob(
+            job_id=f"{job_prefix}_{device_type}_{i:05d}",
+            table=table,
+            source_uris=[f.path for f in group],
+            rows=sum(f.rows for f in group),
+            schema=schema,
+            time_partitioning=options["timePartitioning"],
+            clustering_fields=options["clustering"]["fields"],
+        )
+        for i, group in enumerate(groups)
+    ]
+
+
+class BigQueryLoader:
+    """
+    以 google-cloud-bigquery 執行 load job
+
+    job_id 已存在（重試）時等待既有的 job，不重複載入。
+    """
+
+    def __init__(self, project: Optional[str] = None):
+        self.project = project
+
+    def load(self, job: LoadJob) -> int:
+        """執行並等待 load job，返回載入的記錄數"""
+        from google.api_core.exceptions import Conflict
+        from google.cloud import bigquery
+
+        client = bigquery.Client(project=self.project)
+        job_config = bigquery.LoadJobConfig(
+            source_format=job.source_format,
+            schema=[bigquery.SchemaField.from_api_repr(f) for f in job.schema["fields"]],
+            time_partitioning=bigquery.TimePartitioning(
+                type_=job.time_partitioning["type"], field=job.time_partitioning["field"]
+            ),
+            clustering_fields=job.clustering_fields or None,
+            write_disposition=job.write_disposition,
+            create_disposition=job.create_disposition,
+        )
+        try:
+            load_job = client.load_table_from_uri(
+                job.source_uris, job.table.replace(":", "."), job_id=job.job_id, job_config=job_config
+            )
+        except Conflict:
+            logger.info(f"load job {job.job_id} 已存在，等待既有的 job")
+            load_job = client.get_job(job.job_id)
+        load_job.result()
+        return load_job.output_rows or 0
+
+
+class LocalLoader:
+    """
+    本地文件系統上的 BigQuery 替身（測試與離線回填）
+
+    表對應 <root>/<project>/<dataset>/<table>/，每個 job 寫出一個 <job_id>.parquet，
+    並在 _jobs.jsonl 記錄 job 描述；已載入的 job_id 不會重複載入。
+    載入前檢查來源文件的欄位都在 schema 中、REQUIRED 欄位沒有 null。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def table_dir(self, table: str) -> str:
+        return os.path.join(self.root, *table.replace(":", ".").split("."))
+
+    def jobs(self, table: str) -> List[Dict[str, Any]]:
+        """已執行的 load job（依執行順序）"""
+        path = os.path.join(self.table_dir(table), "_jobs.jsonl")
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def read_table(self, table: str) -> pa.Table:
+        """讀取表的所有已載入記錄"""
+        return pq.ParquetDataset(self.table_dir(table)).read()
+
+    def load(self, job: LoadJob) -> int:
+        if any(existing["job_id"] == job.job_id for existing in self.jobs(job.table)):
+            logger.info(f"load job {job.job_id} 已執行，略過")
+            return 0
+
+        fields = {f["name"]: f for f in job.schema["fields"]}
+        tables = []
+        for uri in job.source_uris:
+            with FileSystems.open(uri) as f:
+                table = pq.read_table(f)
+            unknown = set(table.column_names) - set(fields)
+            if unknown:
+                raise ValueError(f"{uri} 含 schema 以外的欄位: {sorted(unknown)}")
+            for name, field in fields.items():
+                if field["mode"] == "REQUIRED" and name in table.column_names and table.column(name).null_count:
+                    raise ValueError(f"{uri} 的 REQUIRED 欄位 {name} 含 null")
+            tables.append(table)
+
+        table_dir = self.table_dir(job.table)
+        os.makedirs(table_dir, exist_ok=True)
+        loaded = pa.concat_tables(tables) if tables else None
+        rows = loaded.num_rows if loaded is not None else 0
+        if loaded is not None:
+            temp_path = os.path.join(table_dir, f".tmp-{job.job_id}.parquet")
+            pq.write_table(loaded, temp_path)
+            shutil.move(temp_path, os.path.join(table_dir, f"{job.job_id}.parquet"))
+        with open(os.path.join(table_dir, "_jobs.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({**job._asdict(), "output_rows": rows}, ensure_ascii=False))
+            f.write("\n")
+        return rows
+
+
+class StageParquetFn(StageMetricsMixin, beam.DoFn):
+    """
+    每批記錄寫出一個暫存 Parquet 文件
+
+    輸入：記錄字典的 list（BatchElements）
+    輸出：StagedFile
+
+    Metrics（階段 bq_stage_<device_type>）：records_in / files_staged / bytes_staged
+    """
+
+    def __init__(self, temp_dir: str, device_type: str):
+        self.temp_dir = temp_dir
+        self.device_type = device_type
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"bq_stage_{self.device_type}"
+
+    def process(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        path = f"{self.temp_dir}/{uuid.uuid4().hex}.parquet"
+        table = staging_table(batch, self.device_type)
+        with FileSystems.create(path) as f:
+            pq.write_table(table, f, compression="snappy")
+        size = FileSystems.match([path])[0].metadata_list[0].size_in_bytes
+
+        self.metrics.records_in.inc(len(batch))
+        self.metrics.counter("files_staged").inc()
+        self.metrics.counter("bytes_staged").inc(size)
+        yield StagedFile(path, len(batch), size)
+
+
+class ToBigQueryRowFn(StageMetricsMixin, beam.DoFn):
+    """
+    記錄字典 -> streaming insert 的行字典（按 schema 轉換類型，未知字段存入 extra_data）
+
+    Metrics（階段 bq_rows_<device_type>）：records_in / records_out
+    """
+
+    def __init__(self, device_type: str):
+        self.device_type = device_type
+        self._to_dict = None
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"bq_rows_{self.device_type}"
+
+    def setup(self):
+        self._to_dict = make_dict_converter(self.device_type)
+
+    def process(self, element: Dict[str, Any]):
+        self.metrics.records_in.inc()
+        self.metrics.records_out.inc()
+        yield self._to_dict(element)
+
+
+class IssueLoadJobsFn(StageMetricsMixin, beam.DoFn):
+    """
+    規劃並執行 load job，成功後刪除暫存文件
+
+    輸入：所有 StagedFile 的 list
+    輸出：LoadJob（已完成）
+
+    Metrics（階段 bq_load_<device_type>）：load_jobs / rows_loaded
+    """
+
+    def __init__(self, table: str, device_type: str, job_prefix: str, loader, job_limits: Dict[str, int],
+                 cleanup: bool = True):
+        self.table = table
+        self.device_type = device_type
+        self.job_prefix = job_prefix
+        self.loader = loader
+        self.job_limits = job_limits
+        self.cleanup = cleanup
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"bq_load_{self.device_type}"
+
+    def process(self, files: List[StagedFile]):
+        jobs = plan_load_jobs(files, self.table, self.device_type, self.job_prefix, **self.job_limits)
+        for job in jobs:
+            rows = self.loader.load(job)
+            self.metrics.counter("load_jobs").inc()
+            self.metrics.counter("rows_loaded").inc(rows)
+            logger.info(f"load job {job.job_id}: {len(job.source_uris)} 個文件，{rows} 筆 -> {job.table}")
+            yield job
+        if self.cleanup and files:
+            FileSystems.delete([f.path for f in files])
+
+
+class WriteToBigQueryBatch(beam.PTransform):
+    """
+    以暫存 Parquet + load job 寫入 BigQuery（批次 / 回填用）
+
+    相較於 streaming insert：不逐筆重建字典、沒有 insert 配額與費用；
+    表按 timestamp 日分區、按 device_id（anchor 另加 gateway_id）分群，
+    schema 由扁平化模型推導（bigquery_schema），不依賴自動偵測。
+    所有暫存文件寫出後才開始載入，因此只適用於有界輸入。
+
+    Args:
+        table: "project:dataset.table"
+        device_type: "gateway" 或 "anchor"
+        temp_location: 暫存目錄（gs:// 或本地路徑）
+        loader: 執行 load job 的對象（load(LoadJob) -> 記錄數），None 表示 BigQueryLoader
+        rows_per_file: 每個暫存文件的最大記錄數
+        job_prefix: job_id 前綴，None 表示每次建構時隨機生成
+        cleanup: 載入後是否刪除暫存文件
+
+    Example:
+        valid_only | "寫入 BigQuery" >> WriteToBigQueryBatch(
+            "my-project:analytics.anchor_events", "anchor", "gs://my-bucket/temp"
+        )
+    """
+
+    def __init__(self,
+                 table: str,
+                 device_type: str,
+                 temp_location: str,
+                 loader=None,
+                 rows_per_file: int = DEFAULT_ROWS_PER_FILE,
+                 max_files_per_job: int = MAX_FILES_PER_JOB,
+                 max_bytes_per_job: int = MAX_BYTES_PER_JOB,
+                 job_prefix: Optional[str] = None,
+                 cleanup: bool = True):
+        super().__init__()
+        if not temp_location:
+            raise ValueError("file_loads 模式需要 temp_location")
+        self.table = table
+        self.device_type = device_type
+        self.loader = loader or BigQueryLoader()
+        self.rows_per_file = rows_per_file
+        self.job_limits = {"max_files_per_job": max_files_per_job, "max_bytes_per_job": max_bytes_per_job}
+        self.job_prefix = job_prefix or f"beam_load_{uuid.uuid4().hex[:12]}"
+        self.cleanup = cleanup
+        self.temp_dir = f"{temp_location.rstrip('/')}/bq_load/{self.job_prefix}/{device_type}"
+
+    def expand(self, pcoll):
+        return (
+            pcoll
+            | "批次" >> beam.BatchElements(
+                min_batch_size=min(self.rows_per_file, 1000), max_batch_size=self.rows_per_file
+            )
+            | "暫存 Parquet" >> beam.ParDo(StageParquetFn(self.temp_dir, self.device_type))
+            | "收集文件" >> beam.combiners.ToList()
+            | "載入" >> beam.ParDo(IssueLoadJobsFn(
+                self.table, self.device_type, self.job_prefix, self.loader, self.job_limits, self.cleanup
+            ))
+        )
+
+
+class WriteBigQuery(beam.PTransform):
+    """
+    扁平化記錄寫入 BigQuery（method 選擇 streaming insert 或 load job）
+
+    兩種方式都使用由模型推導的 schema，建表時按 timestamp 日分區、按設備 ID 分群。
+
+    Args:
+        table: "project:dataset.table"
+        device_type: "gateway" 或 "anchor"
+        method: "streaming" 或 "file_loads"
+        temp_location: file_loads 的暫存目錄
+        **batch_options: 傳給 WriteToBigQueryBatch 的其他參數（loader、rows_per_file 等）
+    """
+
+    def __init__(self,
+                 table: str,
+                 device_type: str,
+                 method: str = "streaming",
+                 temp_location: Optional[str] = None,
+                 **batch_options):
+        super().__init__()
+        if method not in BIGQUERY_METHODS:
+            raise ValueError(f"未支持的 BigQuery 寫入方式: {method}")
+        self.table = table
+        self.device_type = device_type
+        self.method = method
+        self._batch = (
+            WriteToBigQueryBatch(table, device_type, temp_location, **batch_options)
+            if method == "file_loads" else None
+        )
+
+    def expand(self, pcoll):
+        if self._batch is not None:
+            return pcoll | "Load Job" >> self._batch
+
+        from apache_beam.io.gcp.bigquery import BigQueryDisposition, WriteToBigQuery
+
+        return (
+            pcoll
+            | "轉換為 BigQuery 行" >> beam.ParDo(ToBigQueryRowFn(self.device_type))
+            | "Streaming Insert" >> WriteToBigQuery(
+                table=self.table,
+                schema=bigquery_schema(self.device_type),
+                additional_bq_parameters=table_options(self.device_type),
+                create_disposition=BigQueryDisposition.CREATE_IF_NEEDED,
+                write_disposition=BigQueryDisposition.WRITE_APPEND,
+            )
+        )
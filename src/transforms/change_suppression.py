@@ -0,0 +1,206 @@
+"""變更抑制 - 按 device_id 的狀態化 DoFn，只轉發超出死區的變更或靜默過久後的記錄"""
+
+from typing import Any, Dict, Optional
+
+import apache_beam as beam
+from apache_beam.coders import FastPrimitivesCoder
+from apache_beam.transforms.timeutil import TimeDomain
+from apache_beam.transforms.userstate import ReadModifyWriteStateSpec, TimerSpec, on_timer
+from apache_beam.typehints import Tuple
+
+from ..utils.metrics import StageMetricsMixin, parse_timestamp_ms
+from .custom_coders import FlattenedRecordType, with_record_coder
+
+
+# 靜默超過此秒數時，即使沒有變更也轉發一筆（心跳）
+DEFAULT_MAX_SILENCE_SECONDS = 300
+
+# 追蹤的字段與死區：數值字段變化超過死區才算變更；死區為 0 或非數值字段時任何變化都算
+DEFAULT_DEADBANDS: Dict[str, Dict[str, float]] = {
+    "gateway": {
+        "status": 0,
+        "is_bound": 0,
+        "config_mode": 0,
+        "fw_version": 0,
+        "rssi": 3,
+        "battery_voltage": 0.05,
+        "position_x": 0.1,
+        "position_y": 0.1,
+        "position_z": 0.1,
+    },
+    "anchor": {
+        "status": 0,
+        "is_bound": 0,
+        "gateway_id": 0,
+        "rssi": 3,
+        "battery_voltage": 0.05,
+        "heart_rate": 2,
+        "temperature": 0.1,
+        "humidity": 1,
+        "position_x": 0.1,
+        "position_y": 0.1,
+        "position_z": 0.1,
+    },
+}
+
+# 快照中保存事件時間（毫秒）的鍵
+_EVENT_MS = "_event_ms"
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def changed_fields(previous: Dict[str, Any], record: Dict[str, Any], deadbands: Dict[str, float]) -> list:
+    """
+    與上次轉發的快照相比，超出死區的字段
+
+    與上次「轉發」而非上次「收到」的值比較，緩慢漂移累積超過死區後仍會轉發。
+    None 與數值之間的變化一律視為變更。
+    """
+    changed = []
+    for field, band in deadbands.items():
+        new = record.get(field)
+        old = previous.get(field)
+        if new == old:
+            continue
+        if band and _is_number(new) and _is_number(old) and abs(new - old) <= band:
+            continue
+        changed.append(field)
+    return changed
+
+
+class SuppressUnchangedFn(StageMetricsMixin, beam.DoFn):
+    """
+    按 device_id 抑制無變化的記錄
+
+    輸入：(device_id, 記錄)；輸出：記錄
+    狀態：上次轉發的追蹤字段快照、最後一筆被抑制的記錄
+    轉發條件（任一）：
+        - 該設備的第一筆記錄
+        - 任一追蹤字段超出死區
+        - 事件時間（last_seen / timestamp）距上次轉發超過 max_silence_seconds
+    事件時間早於上次轉發的記錄視為過期，直接丟棄。
+
+    每次轉發後設置 event-time 計時器（元素時間戳 + max_silence_seconds）；
+    計時器觸發時若有被抑制的記錄，轉發最後一筆，讓下游的最新狀態不落後
+    （批次輸入在結束時觸發，相當於補上每個設備的最終狀態）。
+
+    Metrics（階段 suppress_<device_type>）：records_in / records_out /
+    suppressed / stale / heartbeats / timer_flushes；
+    summarize_metrics 會附加 suppression_ratio。
+    """
+
+    LAST_EMITTED = ReadModifyWriteStateSpec("last_emitted", FastPrimitivesCoder())
+    PENDING = ReadModifyWriteStateSpec("pending", FastPrimitivesCoder())
+    SILENCE_TIMER = TimerSpec("max_silence", TimeDomain.WATERMARK)
+
+    def __init__(self,
+                 device_type: str,
+                 deadbands: Optional[Dict[str, float]] = None,
+                 max_silence_seconds: int = DEFAULT_MAX_SILENCE_SECONDS):
+        self.device_type = device_type
+        self.deadbands = dict(DEFAULT_DEADBANDS[device_type] if deadbands is None else deadbands)
+        self.max_silence_seconds = max_silence_seconds
+        self._max_silence_ms = max_silence_seconds * 1000
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"suppress_{self.device_type}"
+
+    def _snapshot(self, record: Dict[str, Any], event_ms: Optional[float]) -> Dict[str, Any]:
+        snapshot = {field: record.get(field) for field in self.deadbands}
+        snapshot[_EVENT_MS] = event_ms
+        return snapshot
+
+    def process(self,
+                element,
+                timestamp=beam.DoFn.TimestampParam,
+                last_emitted=beam.DoFn.StateParam(LAST_EMITTED),
+                pending=beam.DoFn.StateParam(PENDING),
+                silence_timer=beam.DoFn.TimerParam(SILENCE_TIMER)):
+        _, record = element
+        self.metrics.records_in.inc()
+        previous = last_emitted.read()
+        event_ms = parse_timestamp_ms(record.get("last_seen") or record.get("timestamp"))
+
+        if previous is not None:
+            previous_ms = previous.get(_EVENT_MS)
+            if event_ms is not None and previous_ms is not None:
+                if event_ms < previous_ms:
+                    self.metrics.counter("stale").inc()
+                    return
+                silent = event_ms - previous_ms >= self._max_silence_ms
+            else:
+                silent = False
+
+            if not changed_fields(previous, record, self.deadbands):
+                if not silent:
+                    self.metrics.counter("suppressed").inc()
+                    pending.write(record)
+                    return
+                self.metrics.counter("heartbeats").inc()
+
+        last_emitted.write(self._snapshot(record, event_ms))
+        pending.clear()
+        silence_timer.set(timestamp + self.max_silence_seconds)
+        self.metrics.records_out.inc()
+        yield record
+
+    @on_timer(SILENCE_TIMER)
+    def flush_pending(self,
+                      fire_timestamp=beam.DoFn.TimestampParam,
+                      last_emitted=beam.DoFn.StateParam(LAST_EMITTED),
+                      pending=beam.DoFn.StateParam(PENDING),
+                      silence_timer=beam.DoFn.TimerParam(SILENCE_TIMER)):
+        record = pending.read()
+        if record is None:
+            return
+        event_ms = parse_timestamp_ms(record.get("last_seen") or record.get("timestamp"))
+        last_emitted.write(self._snapshot(record, event_ms))
+        pending.clear()
+        silence_timer.set(fire_timestamp + self.max_silence_seconds)
+        self.metrics.counter("timer_flushes").inc()
+        self.metrics.records_out.inc()
+        yield record
+
+
+class SuppressUnchanged(beam.PTransform):
+    """
+    按 device_id 抑制重複上報的遙測，只保留有意義的變更
+
+    缺少 device_id 的記錄無法按設備追蹤，原樣通過。
+    按鍵分組時記錄使用緊湊 Coder（custom_coders.FlattenedRecordCoder）。
+
+    Args:
+        device_type: "gateway" 或 "anchor"
+        deadbands: {字段: 死區}，None 表示 DEFAULT_DEADBANDS[device_type]
+        max_silence_seconds: 無變更時最長多久轉發一筆
+
+    Example:
+        changes = valid_only | "抑制重複" >> SuppressUnchanged("anchor", {"rssi": 3, "temperature": 0.1, "status": 0})
+    """
+
+    def __init__(self,
+                 device_type: str,
+                 deadbands: Optional[Dict[str, float]] = None,
+                 max_silence_seconds: int = DEFAULT_MAX_SILENCE_SECONDS):
+        super().__init__()
+        if max_silence_seconds <= 0:
+            raise ValueError(f"max_silence_seconds 必須大於 0: {max_silence_seconds}")
+        self.device_type = device_type
+        self.fn = SuppressUnchangedFn(device_type, deadbands, max_silence_seconds)
+
+    def expand(self, pcoll):
+        keyed, unkeyed = pcoll | "按設備 ID 分流" >> beam.Partition(
+            lambda record, _: 0 if record.get("device_id") else 1, 2
+        )
+        changes = (
+            keyed
+            | "加上鍵" >> beam.Map(lambda record: (record["device_id"], record)).with_output_types(
+                Tuple[str, FlattenedRecordType(self.device_type)]
+            )
+            | "抑制" >> beam.ParDo(self.fn)
+        )
+        merged = (changes, unkeyed) | "合併" >> beam.Flatten()
+        return with_record_coder(merged, self.device_type)
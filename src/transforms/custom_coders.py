@@ -0,0 +1,210 @@
+"""扁平化記錄的緊湊 Coder - 固定字段順序、varint / double 編碼、null 位圖與字符串字典"""
+
+from typing import Any, Dict, List, Tuple
+
+import apache_beam as beam
+from apache_beam.coders.stream import InputStream, OutputStream
+from apache_beam.typehints.typehints import DictConstraint
+
+from ..models.schema import BOOL, EXTRA_COLUMN, FLOAT, INT, STRING, record_columns
+
+
+# 編碼格式版本（第一個位元組）
+FORMAT_VERSION = 1
+
+# 常見的低基數字符串：編碼為字典序號，解碼時返回同一個 str 對象
+STRING_DICTIONARY: Tuple[str, ...] = (
+    "gateway", "anchor",
+    "online", "offline", "unknown",
+    "excellent", "good", "fair", "poor",
+    "high", "medium", "low",
+)
+
+# zigzag 後仍在 var_int64 正數範圍內的整數；範圍外的整數放入其餘字段
+_VARINT_MIN = -(1 << 62)
+_VARINT_MAX = (1 << 62) - 1
+
+# 字段的編碼方式
+_STR, _NUM, _BOOL = 0, 1, 2
+_KINDS = {
+    STRING: _STR,
+    FLOAT: _NUM,
+    INT: _NUM,
+    BOOL: _BOOL,
+}
+
+
+class FlattenedRecordCoder(beam.coders.Coder):
+    """
+    扁平化 Gateway / Anchor 記錄（字典）的 Coder
+
+    字段順序取自 models/schema.record_columns（數據類聲明順序 + 增強字段）。
+    編碼：
+        版本 | present 位圖 (varint) | flags 位圖 (varint) | 各字段值 | 其餘字段
+    - present：字段存在且值可按類型編碼（None 與類型不符的值歸入其餘字段）
+    - flags：數值字段 1 = double、0 = zigzag varint；布林字段即為其值（不佔額外位元組）
+    - 字符串：varint 字典序號（STRING_DICTIONARY 序號 + 1），0 表示隨後為 UTF-8 內容
+    - 其餘字段（未知鍵、None、巢狀值）：以 FastPrimitivesCoder 編碼的字典
+
+    整數與浮點數原樣保留（72 不會變成 72.0），解碼結果與輸入字典相等；
+    鍵順序為 schema 順序，其餘字段在後。
+
+    通常不直接使用，而是透過 with_record_coder 為 PCollection 指定。
+    """
+
+    def __init__(self, device_type: str):
+        self.device_type = device_type
+        columns = [c for c in record_columns(self.device_type) if c.name != EXTRA_COLUMN]
+        if len(columns) > 62:
+            raise ValueError(f"字段數超過位圖上限: {len(columns)}")
+        self._fields: List[Tuple[str, int, int]] = [
+            (column.name, _KINDS[column.type], 1 << i) for i, column in enumerate(columns)
+        ]
+        self._bits = {name: bit for name, _, bit in self._fields}
+        self._dictionary = {value: i + 1 for i, value in enumerate(STRING_DICTIONARY)}
+        self._fallback = beam.coders.FastPrimitivesCoder()
+
+    def encode(self, value: Dict[str, Any]) -> bytes:
+        out = OutputStream()
+        body = OutputStream()
+        write_varint = body.write_var_int64
+        write_double = body.write_bigendian_double
+        dictionary = self._dictionary
+        get = value.get
+        present = 0
+        flags = 0
+
+        for name, kind, bit in self._fields:
+            v = get(name)
+            if v is None:
+                continue
+            t = type(v)
+            if kind == _STR:
+                if t is not str:
+                    continue
+                index = dictionary.get(v)
+                if index is None:
+                    write_varint(0)
+                    body.write(v.encode("utf-8"), True)
+                else:
+                    write_varint(index)
+            elif kind == _NUM:
+                if t is float:
+                    flags |= bit
+                    write_double(v)
+                elif t is int and _VARINT_MIN <= v <= _VARINT_MAX:
+                    write_varint((v << 1) ^ (v >> 63))
+                else:
+                    continue
+            elif t is bool:
+                if v:
+                    flags |= bit
+            else:
+                continue
+            present |= bit
+
+        out.write_byte(FORMAT_VERSION)
+        out.write_var_int64(present)
+        out.write_var_int64(flags)
+        out.write(body.get())
+
+        # 所有字段都已按類型編碼時，其餘字段為空（只寫一個 0）
+        if len(value) == bin(present).count("1"):
+            out.write_var_int64(0)
+        else:
+            bits = self._bits
+            extra = {k: v for k, v in value.items() if not present & bits.get(k, 0)}
+            out.write(self._fallback.encode(extra), True)
+        return out.get()
+
+    def decode(self, encoded: bytes) -> Dict[str, Any]:
+        stream = InputStream(encoded)
+        version = stream.read_byte()
+        if version != FORMAT_VERSION:
+            raise ValueError(f"未支持的記錄編碼版本: {version}")
+        present = stream.read_var_int64()
+        flags = stream.read_var_int64()
+
+        record: Dict[str, Any] = {}
+        for name, kind, bit in self._fields:
+            if not present & bit:
+                continue
+            if kind == _STR:
+                index = stream.read_var_int64()
+                record[name] = STRING_DICTIONARY[index - 1] if index else stream.read_all(True).decode("utf-8")
+            elif kind == _NUM:
+                if flags & bit:
+                    record[name] = stream.read_bigendian_double()
+                else:
+                    n = stream.read_var_int64()
+                    record[name] = (n >> 1) ^ -(n & 1)
+            else:
+                record[name] = bool(flags & bit)
+
+        extra = stream.read_all(True)
+        if extra:
+            record.update(self._fallback.decode(extra))
+        return record
+
+    def is_deterministic(self) -> bool:
+        # 其餘字段為字典，編碼結果依插入順序而定
+        return False
+
+    def to_type_hint(self):
+        return FlattenedRecordType(self.device_type)
+
+    @classmethod
+    def from_type_hint(cls, typehint, unused_registry):
+        return cls(typehint.device_type)
+
+    def __eq__(self, other):
+        return type(self) == type(other) and self.device_type == other.device_type
+
+    def __hash__(self):
+        return hash((type(self), self.device_type))
+
+    def __repr__(self):
+        return f"FlattenedRecordCoder[{self.device_type}]"
+
+
+class FlattenedRecordType(DictConstraint):
+    """
+    扁平化記錄的類型提示：與 Dict[str, Any] 相容（下游 DoFn 的類型檢查照常通過），
+    但在 Coder 註冊表中對應 FlattenedRecordCoder
+    """
+
+    def __init__(self, device_type: str):
+        super().__init__(str, Any)
+        self.device_type = device_type
+
+    def bind_type_variables(self, bindings):
+        # 不含類型變數；保留自身，否則類型推導會還原為一般的 Dict[str, Any]
+        return self
+
+    def __repr__(self):
+        return f"FlattenedRecord[{self.device_type}]"
+
+    def __eq__(self, other):
+        return type(self) == type(other) and self.device_type == other.device_type
+
+    def __hash__(self):
+        return hash((type(self), self.device_type))
+
+
+beam.coders.registry.register_coder(FlattenedRecordType, FlattenedRecordCoder)
+
+
+def with_record_coder(pcoll, device_type: str):
+    """
+    為扁平化記錄的 PCollection 指定緊湊 Coder（在 fusion break / shuffle 時生效）
+
+    Beam Python 以元素類型推導 Coder；這裡把元素類型設為已註冊 Coder 的
+    FlattenedRecordType（與 Dict[str, Any] 相容），元素本身不變。
+    下游以 lambda 轉換後類型會回到 Dict[str, Any]；按鍵分組的步驟可聲明
+    .with_output_types(Tuple[str, FlattenedRecordType(device_type)]) 讓 shuffle 沿用此 Coder。
+
+    Returns:
+        同一個 PCollection
+    """
+    pcoll.element_type = FlattenedRecordType(device_type)
+    return pcoll
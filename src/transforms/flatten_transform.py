@@ -3,119 +3,175 @@
 import apache_beam as beam
 import json
 import logging
+import time
 from typing import Any, Dict, Tuple
 from datetime import datetime
 
 from ..models.gateway_data import GatewayData, FlattenedGatewayData
 from ..models.anchor_data import AnchorData, FlattenedAnchorData
+from ..utils.logger import AggregatedLoggingMixin
+from ..utils.metrics import StageMetricsMixin, event_time_lag_ms
 
 
 logger = logging.getLogger(__name__)
 
 
-class FlattenGatewayTransform(beam.DoFn):
+def _error_record(element: Any, message: str) -> Dict[str, Any]:
+    """建立轉換失敗記錄"""
+    return {
+        "error": True,
+        "error_message": message,
+        "original_data": element,
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+
+# 各設備類型的 (原始模型, 扁平化函數)
+_FLATTENERS = {
+    "gateway": (GatewayData, FlattenedGatewayData.from_gateway_data),
+    "anchor": (AnchorData, FlattenedAnchorData.from_anchor_data),
+}
+
+
+def flatten_element(element: Any, device_type: str) -> Dict[str, Any]:
+    """
+    將單筆原始記錄扁平化為字典
+    
+    Args:
+        element: 原始 JSON 對象或字符串
+        device_type: "gateway" 或 "anchor"
+        
+    Returns:
+        扁平化字典；失敗時返回帶有 "error": True 的錯誤記錄（不寫日誌，由調用方統計）
+    """
+    raw_cls, convert = _FLATTENERS[device_type]
+    
+    # 解析輸入
+    data = element
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError as e:
+            return _error_record(element, str(e))
+    
+    if not isinstance(data, dict):
+        return _error_record(element, f"預期 JSON 物件，實際為 {type(data).__name__}")
+    
+    try:
+        # 建立原始對象（容錯：camelCase 鍵、未知鍵不會拋出例外）並扁平化
+        flattened = convert(raw_cls.from_dict(data))
+    except Exception as e:
+        # 非預期的數據形狀（正常記錄不會走到這裡）
+        return _error_record(element, str(e))
+    
+    return flattened.to_dict()
+
+
+def enrich_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    原地添加計算字段（處理時間、信號等級、電池等級）
+    
+    Args:
+        record: 扁平化數據字典（會被修改）
+        
+    Returns:
+        同一個字典
+    """
+    record["processing_timestamp"] = datetime.utcnow().isoformat() + "Z"
+    
+    # 信號品質等級
+    rssi = record.get("rssi")
+    if rssi is not None:
+        if rssi > -30:
+            record["signal_level"] = "excellent"
+        elif rssi > -67:
+            record["signal_level"] = "good"
+        elif rssi > -70:
+            record["signal_level"] = "fair"
+        else:
+            record["signal_level"] = "poor"
+    
+    # 電池狀態等級
+    voltage = record.get("battery_voltage")
+    if voltage is not None:
+        if voltage > 3.5:
+            record["battery_level"] = "high"
+        elif voltage > 3.0:
+            record["battery_level"] = "medium"
+        else:
+            record["battery_level"] = "low"
+    
+    return record
+
+
+class _FlattenTransform(AggregatedLoggingMixin, StageMetricsMixin, beam.DoFn):
+    """
+    扁平化轉換基類
+    
+    Metrics（命名空間 senior_care，階段 flatten_<device_type>）：
+    records_in / records_out / flatten_errors / processing_us
+    """
+    
+    DEVICE_TYPE = None
+    
+    @property
+    def log_scope(self) -> str:
+        return f"{self.DEVICE_TYPE.capitalize()} 扁平化"
+    
+    @property
+    def metrics_stage(self) -> str:
+        return f"flatten_{self.DEVICE_TYPE}"
+    
+    def process(self, element: Dict[str, Any]):
+        start = time.perf_counter_ns()
+        metrics = self.metrics
+        metrics.records_in.inc()
+        record = flatten_element(element, self.DEVICE_TYPE)
+        if record.get("error"):
+            metrics.counter("flatten_errors").inc()
+            self.log.count("flatten_error", record["error_message"])
+        metrics.records_out.inc()
+        metrics.observe_elapsed(start)
+        yield record
+
+
+class FlattenGatewayTransform(_FlattenTransform):
     """
     Gateway 扁平化轉換
     
     輸入：4層嵌套的 Gateway 原始數據
-    輸出：2層扁平化的 Gateway 數據
+    輸出：2層扁平化的 Gateway 數據（FlattenedGatewayData 的字典表示）
     
     Example:
         pipeline | beam.ParDo(FlattenGatewayTransform())
     """
     
-    def process(self, element: Dict[str, Any]):
-        """
-        處理單個 Gateway 記錄
-        
-        Args:
-            element: Gateway JSON 對象或字典
-            
-        Yields:
-            FlattenedGatewayData 的字典表示
-        """
-        try:
-            # 解析輸入
-            if isinstance(element, str):
-                data = json.loads(element)
-            else:
-                data = element
-            
-            # 建立原始 GatewayData 對象
-            gateway = GatewayData.from_dict(data)
-            
-            # 轉換為扁平化格式
-            flattened = FlattenedGatewayData.from_gateway_data(gateway)
-            
-            # 輸出為字典
-            yield flattened.to_dict()
-            
-        except Exception as e:
-            logger.error(f"Gateway 轉換失敗: {str(e)}", extra={"element": element})
-            # 輸出失敗記錄
-            yield {
-                "error": True,
-                "error_message": str(e),
-                "original_data": element,
-                "timestamp": datetime.utcnow().isoformat() + "Z"
-            }
+    DEVICE_TYPE = "gateway"
 
 
-class FlattenAnchorTransform(beam.DoFn):
+class FlattenAnchorTransform(_FlattenTransform):
     """
     Anchor 扁平化轉換
     
     輸入：4層嵌套的 Anchor 原始數據
-    輸出：2層扁平化的 Anchor 數據
+    輸出：2層扁平化的 Anchor 數據（FlattenedAnchorData 的字典表示）
     
     Example:
         pipeline | beam.ParDo(FlattenAnchorTransform())
     """
     
-    def process(self, element: Dict[str, Any]):
-        """
-        處理單個 Anchor 記錄
-        
-        Args:
-            element: Anchor JSON 對象或字典
-            
-        Yields:
-            FlattenedAnchorData 的字典表示
-        """
-        try:
-            # 解析輸入
-            if isinstance(element, str):
-                data = json.loads(element)
-            else:
-                data = element
-            
-            # 建立原始 AnchorData 對象
-            anchor = AnchorData.from_dict(data)
-            
-            # 轉換為扁平化格式
-            flattened = FlattenedAnchorData.from_anchor_data(anchor)
-            
-            # 輸出為字典
-            yield flattened.to_dict()
-            
-        except Exception as e:
-            logger.error(f"Anchor 轉換失敗: {str(e)}", extra={"element": element})
-            # 輸出失敗記錄
-            yield {
-                "error": True,
-                "error_message": str(e),
-                "original_data": element,
-                "timestamp": datetime.utcnow().isoformat() + "Z"
-            }
+    DEVICE_TYPE = "anchor"
 
 
-class ExtractFieldsTransform(beam.DoFn):
+class ExtractFieldsTransform(AggregatedLoggingMixin, beam.DoFn):
     """
     提取指定字段轉換
     
     用途：從扁平化數據中提取特定字段
     """
     
+    LOG_SCOPE = "字段提取"
+    
     def __init__(self, fields: list):
         """
         Args:
@@ -137,17 +193,23 @@ class ExtractFieldsTransform(beam.DoFn):
             result = {field: element.get(field) for field in self.fields}
             yield result
         except Exception as e:
-            logger.error(f"字段提取失敗: {str(e)}")
+            self.log.count("extract_error", str(e))
             yield {}
 
 
-class EnrichDataTransform(beam.DoFn):
+class EnrichDataTransform(AggregatedLoggingMixin, StageMetricsMixin, beam.DoFn):
     """
     數據增強轉換
     
     用途：添加計算字段或外部數據
+    
+    Metrics（階段 enrich）：records_in / records_out / enrich_errors /
+    processing_us / event_time_lag_ms（processing_timestamp - last_seen）
     """
     
+    LOG_SCOPE = "數據增強"
+    METRICS_STAGE = "enrich"
+    
     def process(self, element: Dict[str, Any]):
         """
         增強數據
@@ -158,40 +220,23 @@ class EnrichDataTransform(beam.DoFn):
         Yields:
             增強後的字典
         """
+        start = time.perf_counter_ns()
+        metrics = self.metrics
+        metrics.records_in.inc()
         try:
-            # 複製原始數據
-            enriched = element.copy()
-            
-            # 添加計算字段
-            enriched["processing_timestamp"] = datetime.utcnow().isoformat() + "Z"
-            
-            # 信號品質等級
-            if "rssi" in enriched and enriched["rssi"] is not None:
-                rssi = enriched["rssi"]
-                if rssi > -30:
-                    enriched["signal_level"] = "excellent"
-                elif rssi > -67:
-                    enriched["signal_level"] = "good"
-                elif rssi > -70:
-                    enriched["signal_level"] = "fair"
-                else:
-                    enriched["signal_level"] = "poor"
-            
-            # 電池狀態等級
-            if "battery_voltage" in enriched and enriched["battery_voltage"] is not None:
-                voltage = enriched["battery_voltage"]
-                if voltage > 3.5:
-                    enriched["battery_level"] = "high"
-                elif voltage > 3.0:
-                    enriched["battery_level"] = "medium"
-                else:
-                    enriched["battery_level"] = "low"
-            
-            yield enriched
-            
+            # 複製原始數據後原地增強
+            record = enrich_record(element.copy())
         except Exception as e:
-            logger.error(f"數據增強失敗: {str(e)}")
-            yield element
+            metrics.counter("enrich_errors").inc()
+            self.log.count("enrich_error", str(e))
+            record = element
+        else:
+            lag = event_time_lag_ms(record)
+            if lag is not None:
+                metrics.distribution("event_time_lag_ms").update(lag)
+        metrics.records_out.inc()
+        metrics.observe_elapsed(start)
+        yield record
 
 
 
@@ -0,0 +1,294 @@
+"""融合轉換 - 單一 DoFn 完成扁平化、驗證、增強與分類"""
+
+import apache_beam as beam
+from apache_beam.pvalue import TaggedOutput
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from .flatten_transform import (
+    FlattenGatewayTransform, FlattenAnchorTransform, EnrichDataTransform,
+    flatten_element, enrich_record,
+)
+from .validation_transform import (
+    ValidateGatewayTransform, ValidateAnchorTransform, FilterValidRecordsTransform,
+)
+from .batch_validation import BatchValidator, BatchValidateTransform
+from .custom_coders import with_record_coder
+from .validation_rules import compile_rules
+from ..utils.logger import AggregatedLoggingMixin
+from ..utils.metrics import StageMetricsMixin, event_time_lag_ms
+
+
+logger = logging.getLogger(__name__)
+
+
+STAGE_MODES = ("staged", "fused")
+VALIDATION_MODES = ("record", "batch")
+
+_VALIDATORS = {
+    "gateway": ValidateGatewayTransform,
+    "anchor": ValidateAnchorTransform,
+}
+
+_FLATTEN_DOFNS = {
+    "gateway": FlattenGatewayTransform,
+    "anchor": FlattenAnchorTransform,
+}
+
+
+class FusedFlattenTransform(AggregatedLoggingMixin, StageMetricsMixin, beam.DoFn):
+    """
+    融合的 扁平化 → 驗證 → 增強 → 分類 轉換
+
+    取代多階段圖中的 6 次逐筆跳轉：每筆記錄只產生一個字典並原地修改，
+    不再有 element.copy() 與 (is_valid, record) 元組。
+
+    輸出：
+    - 主輸出 (valid)：有效記錄
+    - invalid：未通過驗證的記錄（含 validation_code）
+    - error：無法扁平化的記錄
+
+    Metrics（階段 fused_<device_type>）：records_in / records_out / flatten_errors /
+    valid / invalid / failed.<規則名稱> / event_time_lag_ms /
+    processing_us（record 模式）或 batch_processing_us（batch 模式）
+
+    Example:
+        results = raw | beam.ParDo(FusedFlattenTransform("anchor")).with_outputs(
+            FusedFlattenTransform.INVALID_TAG, FusedFlattenTransform.ERROR_TAG,
+            main=FusedFlattenTransform.VALID_TAG
+        )
+    """
+
+    VALID_TAG = "valid"
+    INVALID_TAG = "invalid"
+    ERROR_TAG = "error"
+
+    def __init__(self,
+                 device_type: str,
+                 validation_mode: str = "record",
+                 validation_rules: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            device_type: "gateway" 或 "anchor"
+            validation_mode: "record"（逐筆驗證）或 "batch"（輸入為列表，向量化驗證）
+            validation_rules: 驗證規則（Config.validation_rules），None 表示內建規則
+        """
+        if device_type not in _VALIDATORS:
+            raise ValueError(f"未支持的設備類型: {device_type}")
+        if validation_mode not in VALIDATION_MODES:
+            raise ValueError(f"未支持的驗證模式: {validation_mode}")
+        self.device_type = device_type
+        self.validation_mode = validation_mode
+        self.validation_rules = validation_rules
+        self._validator = None
+
+    def setup(self):
+        if self.validation_mode == "batch":
+            self._validator = BatchValidator(self.device_type, self.validation_rules)
+        else:
+            self._validator = compile_rules(self.device_type, self.validation_rules)
+
+    @property
+    def log_scope(self) -> str:
+        return f"{self.device_type.capitalize()} 融合處理"
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"fused_{self.device_type}"
+
+    def process(self, element: Any):
+        """
+        處理單筆原始記錄（batch 模式下為一批原始記錄）
+
+        Args:
+            element: 原始 JSON 對象，或其列表
+
+        Yields:
+            有效記錄（主輸出）或 TaggedOutput(invalid / error)
+        """
+        if self._validator is None:
+            self.setup()
+        if self.validation_mode == "batch":
+            yield from self._process_batch(element)
+            return
+
+        start = time.perf_counter_ns()
+        metrics = self.metrics
+        metrics.records_in.inc()
+        output = self._process_record(element, metrics)
+        metrics.records_out.inc()
+        metrics.observe_elapsed(start)
+        yield output
+
+    def _process_record(self, element: Any, metrics):
+        record = flatten_element(element, self.device_type)
+        if record.get("error"):
+            metrics.counter("flatten_errors").inc()
+            self.log.count("flatten_error", record["error_message"])
+            return TaggedOutput(self.ERROR_TAG, record)
+
+        code = self._validator.check(record)
+        enrich_record(record)
+        self._observe_lag(record, metrics)
+        record["validation_code"] = code
+        record["is_valid"] = not code
+        if code:
+            metrics.counter("invalid").inc()
+            device_id = record.get("device_id")
+            for reason in self._validator.reasons(code):
+                metrics.counter(f"failed.{reason}").inc()
+                self.log.count(reason, device_id)
+            return TaggedOutput(self.INVALID_TAG, record)
+        metrics.counter("valid").inc()
+        return record
+
+    @staticmethod
+    def _observe_lag(record: Dict[str, Any], metrics):
+        lag = event_time_lag_ms(record)
+        if lag is not None:
+            metrics.distribution("event_time_lag_ms").update(lag)
+
+    def _process_batch(self, batch: List[Any]):
+        start = time.perf_counter_ns()
+        metrics = self.metrics
+        metrics.records_in.inc(len(batch))
+
+        outputs = []
+        records = []
+        for element in batch:
+            record = flatten_element(element, self.device_type)
+            if record.get("error"):
+                metrics.counter("flatten_errors").inc()
+                self.log.count("flatten_error", record["error_message"])
+                outputs.append(TaggedOutput(self.ERROR_TAG, record))
+            else:
+                records.append(record)
+
+        codes = self._validator.validate_batch(records)
+        invalid = self._validator.apply(records, codes)
+        if invalid:
+            metrics.counter("invalid").inc(invalid)
+            for reason, n, first in self._validator.rule_failures(codes):
+                metrics.counter(f"failed.{reason}").inc(n)
+                self.log.count(reason, records[first].get("device_id"), n=n)
+        metrics.counter("valid").inc(len(records) - invalid)
+
+        for record in records:
+            enrich_record(record)
+            self._observe_lag(record, metrics)
+            outputs.append(record if record["is_valid"] else TaggedOutput(self.INVALID_TAG, record))
+
+        metrics.records_out.inc(len(outputs))
+        metrics.observe_elapsed(start, "batch_processing_us")
+        return outputs
+
+
+class FlattenAndClassify(beam.PTransform):
+    """
+    扁平化並分類有效/無效記錄
+
+    Args:
+        device_type: "gateway" 或 "anchor"
+        stage_mode: "staged"（多階段圖）或 "fused"（單一融合 DoFn）
+        validation_mode: "record"（逐筆驗證）或 "batch"（BatchElements + 向量化驗證）
+        batch_size: batch 模式下每批的最大記錄數
+        validation_rules: 驗證規則（Config.validation_rules），None 表示內建規則
+
+    Returns:
+        (valid, invalid) - invalid 包含驗證失敗（含 validation_code）與扁平化失敗的記錄；
+        兩者皆使用 FlattenedRecordCoder（custom_coders.py）
+
+    Example:
+        valid, invalid = raw | "扁平化 Anchor" >> FlattenAndClassify("anchor", "fused")
+    """
+
+    def __init__(self,
+                 device_type: str,
+                 stage_mode: str = "staged",
+                 validation_mode: str = "record",
+                 batch_size: int = 500,
+                 validation_rules: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        if stage_mode not in STAGE_MODES:
+            raise ValueError(f"未支持的階段模式: {stage_mode}")
+        if validation_mode not in VALIDATION_MODES:
+            raise ValueError(f"未支持的驗證模式: {validation_mode}")
+        self.device_type = device_type
+        self.stage_mode = stage_mode
+        self.validation_mode = validation_mode
+        self.batch_size = batch_size
+        self.validation_rules = validation_rules
+
+    def expand(self, raw_data):
+        if self.stage_mode == "fused":
+            return self._expand_fused(raw_data)
+        return self._expand_staged(raw_data)
+
+    def _batched(self, pcoll):
+        return pcoll | "批次" >> beam.BatchElements(min_batch_size=1, max_batch_size=self.batch_size)
+
+    def _expand_fused(self, raw_data):
+        if self.validation_mode == "batch":
+            raw_data = self._batched(raw_data)
+        results = (
+            raw_data
+            | "融合處理" >> beam.ParDo(
+                FusedFlattenTransform(self.device_type, self.validation_mode, self.validation_rules)
+            ).with_outputs(
+                FusedFlattenTransform.INVALID_TAG,
+                FusedFlattenTransform.ERROR_TAG,
+                main=FusedFlattenTransform.VALID_TAG
+            )
+        )
+        invalid = (
+            (results[FusedFlattenTransform.INVALID_TAG], results[FusedFlattenTransform.ERROR_TAG])
+            | "合併無效" >> beam.Flatten()
+        )
+        return self._typed(results[FusedFlattenTransform.VALID_TAG], invalid)
+
+    def _expand_staged(self, raw_data):
+        label = self.device_type.capitalize()
+
+        # Step 1: 扁平化
+        flattened = (
+            raw_data
+            | f"扁平化 {label}" >> beam.ParDo(_FLATTEN_DOFNS[self.device_type]())
+        )
+
+        # Step 2: 驗證數據（驗證規則針對扁平化字段）
+        if self.validation_mode == "batch":
+            validated = (
+                self._batched(flattened)
+                | f"批量驗證 {label}" >> beam.ParDo(BatchValidateTransform(self.device_type, self.validation_rules))
+            )
+        else:
+            validated = (
+                flattened
+                | f"驗證 {label}" >> beam.ParDo(_VALIDATORS[self.device_type](self.validation_rules))
+            )
+
+        # Step 3: 數據增強
+        enriched = (
+            validated
+            | "數據增強" >> beam.ParDo(EnrichDataTransform())
+        )
+
+        # Step 4: 過濾有效記錄
+        valid_records, invalid_records = (
+            enriched
+            | "分類有效性" >> beam.ParDo(FilterValidRecordsTransform())
+            | "分支" >> beam.Partition(
+                lambda element, num_partitions: 0 if element[0] else 1,
+                2
+            )
+        )
+
+        # 解開元組
+        valid_only = valid_records | "提取有效" >> beam.Map(lambda x: x[1])
+        invalid_only = invalid_records | "提取無效" >> beam.Map(lambda x: x[1])
+        return self._typed(valid_only, invalid_only)
+
+    def _typed(self, valid, invalid):
+        # 跨 fusion 邊界（shuffle、runner 間傳輸）時使用緊湊 Coder
+        return with_record_coder(valid, self.device_type), with_record_coder(invalid, self.device_type)
@@ -0,0 +1,184 @@
+"""NDJSON 文件來源 - 以記憶體映射讀取的可分割 Beam Source"""
+
+import glob
+import logging
+import os
+from typing import List
+
+import apache_beam as beam
+from apache_beam.io import iobase
+from apache_beam.io.filesystem import CompressionTypes
+from apache_beam.io.filesystems import FileSystems
+from apache_beam.io.range_trackers import OffsetRangeTracker
+
+from ..utils.compression import NONE, beam_compression_type, codec_from_extension, codec_from_magic
+from ..utils.metrics import StageMetrics
+from ..utils.ndjson_reader import MmapNdjsonReader
+
+
+logger = logging.getLogger(__name__)
+
+
+# 文件讀取方式："text" 為 ReadFromText，"mmap" 為 ReadNdjson
+FILE_READERS = ("text", "mmap")
+
+
+class NdjsonSource(iobase.BoundedSource):
+    """
+    單一本地 NDJSON 文件的可分割來源
+
+    以位元組偏移量分割，支持 runner 的動態再分割（OffsetRangeTracker）；
+    起點落在範圍內的行屬於該範圍。輸出每行的 bytes（不含換行符），
+    與 ReadFromText(coder=BytesCoder()) 相同，可直接接 DecodeJson。
+
+    Metrics（階段 read）：records_out / bytes
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def estimate_size(self) -> int:
+        return os.path.getsize(self.path)
+
+    def split(self, desired_bundle_size, start_position=None, stop_position=None):
+        start = start_position or 0
+        stop = self.estimate_size() if stop_position is None else stop_position
+        while start < stop:
+            end = min(start + desired_bundle_size, stop)
+            yield iobase.SourceBundle(end - start, self, start, end)
+            start = end
+
+    def get_range_tracker(self, start_position, stop_position):
+        start = start_position or 0
+        stop = self.estimate_size() if stop_position is None else stop_position
+        return OffsetRangeTracker(start, stop)
+
+    def read(self, range_tracker):
+        metrics = StageMetrics("read")
+        total_bytes = 0
+        with MmapNdjsonReader(self.path) as reader:
+            try:
+                for position, line in reader.iter_lines(range_tracker.start_position()):
+                    if not range_tracker.try_claim(position):
+                        break
+                    # 元素會離開本函數（可能被編碼），這裡是唯一一次複製
+                    payload = line.tobytes()
+                    total_bytes += len(payload) + 1
+                    metrics.records_out.inc()
+                    yield payload
+            finally:
+                metrics.counter("bytes").inc(total_bytes)
+
+    def default_output_coder(self):
+        return beam.coders.BytesCoder()
+
+
+class ReadNdjson(beam.PTransform):
+    """
+    以記憶體映射讀取本地 NDJSON 文件（支持 glob，多個文件時合併）
+
+    相較於 ReadFromText，不逐行解碼為 str，也不經過額外的緩衝區複製。
+    只適用於本地未壓縮的文件；GCS 或壓縮文件請使用 ReadFromText。
+
+    Example:
+        raw_bytes = pipeline | "讀取文件" >> ReadNdjson("/data/anchors-*.ndjson")
+    """
+
+    def __init__(self, file_pattern: str):
+        super().__init__()
+        self.file_pattern = file_pattern
+
+    def _paths(self) -> List[str]:
+        paths = sorted(glob.glob(self.file_pattern))
+        if not paths:
+            raise ValueError(f"找不到輸入文件: {self.file_pattern}")
+        return paths
+
+    def expand(self, pbegin):
+        paths = self._paths()
+        if len(paths) == 1:
+            return pbegin | "讀取" >> beam.io.Read(NdjsonSource(paths[0]))
+        reads = [
+            pbegin | f"讀取 {i}" >> beam.io.Read(NdjsonSource(path))
+            for i, path in enumerate(paths)
+        ]
+        return tuple(reads) | "合併文件" >> beam.Flatten()
+
+
+def _not_blank(line: bytes) -> bool:
+    return bool(line.strip())
+
+
+class ReadTextLines(beam.PTransform):
+    """
+    ReadFromText（bytes 元素），略過空行與只含空白的行
+
+    與 ReadNdjson（MmapNdjsonReader）及 LocalFast 的分塊讀取一致，
+    同一輸入文件不論讀取方式，dead letter 的數量相同。
+
+    Args:
+        file_pattern: 文件路徑或 glob（支持 GCS）
+        codec: 輸入壓縮編碼（"none" / "gzip" / "zstd"）
+    """
+
+    def __init__(self, file_pattern: str, codec: str = NONE):
+        super().__init__()
+        self.file_pattern = file_pattern
+        self.codec = codec
+
+    def expand(self, pbegin):
+        return (
+            pbegin
+            | "讀取文本" >> beam.io.ReadFromText(
+                self.file_pattern,
+                coder=beam.coders.BytesCoder(),
+                compression_type=beam_compression_type(self.codec),
+            )
+            | "略過空行" >> beam.Filter(_not_blank)
+        )
+
+
+def detect_input_codec(file_pattern: str) -> str:
+    """
+    偵測輸入的壓縮編碼：先看副檔名，無法判定時讀取第一個匹配文件的 magic bytes
+
+    支持 Beam FileSystems 的所有路徑（本地、gs://）；無法讀取時視為未壓縮。
+    """
+    codec = codec_from_extension(file_pattern)
+    if codec:
+        return codec
+    try:
+        metadata = FileSystems.match([file_pattern])[0].metadata_list
+        if not metadata:
+            return NONE
+        path = metadata[0].path
+        codec = codec_from_extension(path)
+        if codec:
+            return codec
+        with FileSystems.open(path, compression_type=CompressionTypes.UNCOMPRESSED) as f:
+            return codec_from_magic(f.read(4))
+    except Exception as e:
+        logger.warning(f"無法偵測輸入壓縮格式 {file_pattern}: {e}")
+        return NONE
+
+
+def read_file_lines(file_pattern: str, reader: str = "text") -> beam.PTransform:
+    """
+    文件讀取轉換（每行一個 bytes 元素）
+
+    gzip / zstd 壓縮文件（依副檔名或 magic bytes 偵測）以串流方式解壓，
+    支持多成員 gzip 與多幀 zstd；壓縮文件無法記憶體映射，"mmap" 會退回 ReadFromText。
+
+    Args:
+        file_pattern: 文件路徑或 glob
+        reader: "text"（ReadFromText，支持 GCS）或 "mmap"（ReadNdjson，僅本地未壓縮文件）
+    """
+    if reader not in FILE_READERS:
+        raise ValueError(f"未支持的文件讀取方式: {reader}")
+
+    codec = detect_input_codec(file_pattern)
+    if reader == "mmap":
+        if codec == NONE:
+            return ReadNdjson(file_pattern)
+        logger.info(f"{file_pattern} 為 {codec} 壓縮，改用 ReadFromText 串流解壓")
+    return ReadTextLines(file_pattern, codec)
@@ -0,0 +1,362 @@
+"""Parquet 輸出 - 扁平化記錄的列式分區寫入（pyarrow）"""
+
+import logging
+import re
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import apache_beam as beam
+import pyarrow as pa
+import pyarrow.parquet as pq
+from apache_beam.io.filesystems import FileSystems
+from apache_beam.transforms.window import FixedWindows, GlobalWindow
+from apache_beam.typehints import Tuple
+
+from ..models.schema import (
+    BOOL, COERCERS, EXTRA_COLUMN, FLOAT, INT, LOW_CARDINALITY_COLUMNS, STRING, Column, encode_extra, record_columns,
+)
+from ..utils.compression import NONE
+from ..utils.metrics import StageMetricsMixin
+from .custom_coders import FlattenedRecordType
+
+
+logger = logging.getLogger(__name__)
+
+
+OUTPUT_FORMATS = ("ndjson", "parquet")
+
+DEFAULT_ROW_GROUP_SIZE = 100_000
+
+# 同一 ParquetPartitionWriter 最多同時開啟的分區文件
+DEFAULT_MAX_OPEN_FILES = 32
+
+# WriteParquet 每個分區的文件數
+DEFAULT_NUM_SHARDS = 4
+
+# 無界輸入每個窗口寫出一組文件
+DEFAULT_WINDOW_SECONDS = 300
+
+# 輸出壓縮編碼 -> Parquet 壓縮（none 使用 Parquet 慣用的 snappy）
+_PARQUET_CODECS = {
+    NONE: "snappy",
+    "gzip": "gzip",
+    "zstd": "zstd",
+}
+
+_ARROW_TYPES = {
+    STRING: pa.string(),
+    FLOAT: pa.float64(),
+    INT: pa.int64(),
+    BOOL: pa.bool_(),
+}
+
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+UNKNOWN_DATE = "unknown"
+
+
+def arrow_schema(device_type: str) -> pa.Schema:
+    """由 record_columns 推導的 Arrow schema"""
+    return pa.schema([
+        pa.field(column.name, _ARROW_TYPES[column.type], nullable=column.nullable)
+        for column in record_columns(device_type)
+    ])
+
+
+def parquet_codec(codec: str) -> str:
+    """輸出壓縮編碼（"none" / "gzip" / "zstd"）-> Parquet 壓縮名稱"""
+    if codec not in _PARQUET_CODECS:
+        raise ValueError(f"未支持的壓縮編碼: {codec}")
+    return _PARQUET_CODECS[codec]
+
+
+def partition_path(record: Dict[str, Any], device_type: str) -> str:
+    """
+    Hive 風格的分區目錄：device_type=<類型>/date=<YYYY-MM-DD>
+
+    日期取自 last_seen（無則 timestamp），無法解析時為 date=unknown。
+    """
+    event_time = record.get("last_seen") or record.get("timestamp")
+    date = event_time[:10] if isinstance(event_time, str) and _DATE.match(event_time) else UNKNOWN_DATE
+    return f"device_type={device_type}/date={date}"
+
+
+def records_to_table(records: List[Dict[str, Any]], columns: List[Column], schema: pa.Schema) -> pa.Table:
+    """
+    記錄字典 -> Arrow Table
+
+    類型不符的值會轉換（如 72.0 -> 72、1 -> True），無法轉換時為 null；
+    不在 columns 中的字段以 JSON 字符串存入 extra_data。
+    """
+    names = [column.name for column in columns if column.name != EXTRA_COLUMN]
+    known = frozenset(names)
+    arrays = []
+    for column in columns:
+        if column.name == EXTRA_COLUMN:
+            values = [encode_extra(record, known) for record in records]
+        else:
+            coerce = COERCERS[column.type]
+            values = [coerce(record.get(column.name)) for record in records]
+        arrays.append(pa.array(values, type=_ARROW_TYPES[column.type]))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class ParquetPartitionWriter:
+    """
+    按分區寫出 Parquet 文件（不依賴 Beam，可直接在 Python 中使用）
+
+    每個分區一個文件，記錄累積到 row_group_size 筆時寫出一個 row group，
+    因此記憶體上限約為 分區數 × row_group_size 筆記錄；
+    開啟的文件超過 max_open_files 時關閉最早開啟的文件（之後的記錄寫入新文件）。
+
+    文件先以 .tmp- 前綴寫出，close 後重新命名，讀取端不會看到寫到一半的文件。
+    低基數字段（LOW_CARDINALITY_COLUMNS）使用字典編碼。
+
+    Example:
+        writer = ParquetPartitionWriter("/tmp/anchor_parquet", "anchor")
+        for record in records:
+            writer.write(record)
+        paths = writer.close()
+    """
+
+    def __init__(self,
+                 root: str,
+                 device_type: str,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 compression: str = NONE,
+                 compression_level: Optional[int] = None,
+                 max_open_files: int = DEFAULT_MAX_OPEN_FILES):
+        """
+        Args:
+            root: 輸出根目錄（本地路徑或 gs://）
+            device_type: "gateway" 或 "anchor"
+            row_group_size: 每個 row group 的記錄數
+            compression: "none"（snappy）、"gzip" 或 "zstd"
+            compression_level: 壓縮級別，None 表示 pyarrow 預設
+            max_open_files: 同時開啟的分區文件上限
+        """
+        if row_group_size <= 0:
+            raise ValueError(f"row_group_size 必須大於 0: {row_group_size}")
+        self.root = root.rstrip("/")
+        self.device_type = device_type
+        self.row_group_size = row_group_size
+        self.compression = parquet_codec(compression)
+        # snappy 不接受壓縮級別
+        self.compression_level = compression_level if self.compression != "snappy" else None
+        self.max_open_files = max(1, max_open_files)
+        self.columns = record_columns(device_type)
+        self.schema = arrow_schema(device_type)
+        self.dictionary_columns = [c.name for c in self.columns if c.name in LOW_CARDINALITY_COLUMNS]
+        self.rows_written = 0
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._files: Dict[str, tuple] = {}
+        self._written: List[str] = []
+
+    def write(self, record: Dict[str, Any]):
+        """寫入一筆記錄"""
+        partition = partition_path(record, self.device_type)
+        buffer = self._buffers.get(partition)
+        if buffer is None:
+            buffer = self._buffers[partition] = []
+        buffer.append(record)
+        if len(buffer) >= self.row_group_size:
+            self._flush(partition)
+
+    def close(self) -> List[str]:
+        """寫出剩餘記錄並關閉所有文件，返回本 writer 寫出的文件路徑"""
+        for partition in list(self._buffers):
+            self._flush(partition)
+        for partition in list(self._files):
+            self._close_file(partition)
+        written, self._written = self._written, []
+        return written
+
+    def _flush(self, partition: str):
+        records = self._buffers.pop(partition, None)
+        if not records:
+            return
+        if partition not in self._files:
+            if len(self._files) >= self.max_open_files:
+                self._close_file(next(iter(self._files)))
+            self._open_file(partition)
+        writer = self._files[partition][3]
+        writer.write_table(records_to_table(records, self.columns, self.schema), row_group_size=self.row_group_size)
+        self.rows_written += len(records)
+
+    def _open_file(self, partition: str):
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        final_path = f"{self.root}/{partition}/{name}"
+        temp_path = f"{self.root}/{partition}/.tmp-{name}"
+        handle = FileSystems.create(temp_path)
+        writer = pq.ParquetWriter(
+            handle, self.schema,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            use_dictionary=self.dictionary_columns,
+        )
+        self._files[partition] = (temp_path, final_path, handle, writer)
+
+    def _close_file(self, partition: str):
+        temp_path, final_path, handle, writer = self._files.pop(partition)
+        writer.close()
+        handle.close()
+        FileSystems.rename([temp_path], [final_path])
+        self._written.append(final_path)
+
+
+class KeyByPartitionFn(beam.DoFn):
+    """記錄 -> ("<分區目錄>/<分片>", 記錄)；分片由 device_id 的 crc32 決定，同一設備總在同一文件"""
+
+    def __init__(self, device_type: str, num_shards: int):
+        self.device_type = device_type
+        self.num_shards = num_shards
+
+    def process(self, record: Dict[str, Any]):
+        shard = zlib.crc32(str(record.get("device_id")).encode("utf-8")) % self.num_shards
+        yield f"{partition_path(record, self.device_type)}/{shard:05d}", record
+
+
+class WriteParquetFn(StageMetricsMixin, beam.DoFn):
+    """
+    每個 (分區, 分片[, 窗口]) 的全部記錄寫為一個 Parquet 文件
+
+    輸入為 GroupByKey 的結果，因此文件大小不受 bundle 大小限制，
+    記錄按 row_group_size 筆寫出 row group（記憶體上限約為一個 row group）。
+    文件名稱由分區、分片與窗口決定：先寫到 .tmp- 前綴的臨時文件，完成後重新命名
+    為最終文件（覆寫同名文件），bundle 重試只會覆寫同一文件，不會產生重複；
+    寫出失敗時刪除臨時文件。
+
+    輸出：最終文件路徑
+
+    Metrics（階段 parquet_<device_type>）：records_in / files_written / rows_per_file
+    """
+
+    def __init__(self,
+                 root: str,
+                 device_type: str,
+                 num_shards: int,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 compression: str = NONE,
+                 compression_level: Optional[int] = None):
+        if row_group_size <= 0:
+            raise ValueError(f"row_group_size 必須大於 0: {row_group_size}")
+        self.root = root.rstrip("/")
+        self.device_type = device_type
+        self.num_shards = num_shards
+        self.row_group_size = row_group_size
+        self.compression = parquet_codec(compression)
+        self.compression_level = compression_level if self.compression != "snappy" else None
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"parquet_{self.device_type}"
+
+    def setup(self):
+        self._columns = record_columns(self.device_type)
+        self._schema = arrow_schema(self.device_type)
+        self._dictionary_columns = [c.name for c in self._columns if c.name in LOW_CARDINALITY_COLUMNS]
+
+    def process(self, element, window=beam.DoFn.WindowParam):
+        key, records = element
+        partition, _, shard = key.rpartition("/")
+        name = f"part-{shard}-of-{self.num_shards:05d}.parquet"
+        if not isinstance(window, GlobalWindow):
+            start = datetime.fromtimestamp(float(window.start), tz=timezone.utc)
+            name = f"part-{start:%Y%m%dT%H%M%S}-{shard}-of-{self.num_shards:05d}.parquet"
+        final_path = f"{self.root}/{partition}/{name}"
+        temp_path = f"{self.root}/{partition}/.tmp-{uuid.uuid4().hex}-{name}"
+
+        rows = 0
+        try:
+            with FileSystems.create(temp_path) as handle:
+                writer = pq.ParquetWriter(
+                    handle, self._schema,
+                    compression=self.compression,
+                    compression_level=self.compression_level,
+                    use_dictionary=self._dictionary_columns,
+                )
+                buffer = []
+                for record in records:
+                    buffer.append(record)
+                    if len(buffer) >= self.row_group_size:
+                        rows += self._write_row_group(writer, buffer)
+                        buffer = []
+                if buffer:
+                    rows += self._write_row_group(writer, buffer)
+                writer.close()
+            # 重試或重複執行時覆寫同一最終文件
+            if FileSystems.exists(final_path):
+                FileSystems.delete([final_path])
+            FileSystems.rename([temp_path], [final_path])
+        except Exception:
+            if FileSystems.exists(temp_path):
+                FileSystems.delete([temp_path])
+            raise
+
+        self.metrics.counter("files_written").inc()
+        self.metrics.distribution("rows_per_file").update(rows)
+        logger.debug(f"Parquet 寫出 {rows} 筆: {final_path}")
+        yield final_path
+
+    def _write_row_group(self, writer: pq.ParquetWriter, records: List[Dict[str, Any]]) -> int:
+        writer.write_table(records_to_table(records, self._columns, self._schema), row_group_size=self.row_group_size)
+        self.metrics.records_in.inc(len(records))
+        return len(records)
+
+
+class WriteParquet(beam.PTransform):
+    """
+    將扁平化記錄寫為分區 Parquet 數據集
+
+    目錄結構：<root>/device_type=<類型>/date=<YYYY-MM-DD>/part-<分片>-of-<分片數>.parquet
+    Schema 由 Flattened*Data 數據類推導（models/schema.py）。
+
+    記錄按 (分區, 分片) 分組後每組寫一個文件，文件名稱固定，重試時覆寫而非重複；
+    文件大小取決於數據量與 num_shards，不受 bundle 大小限制。
+    無界輸入（Pub/Sub）先按 window_seconds 的固定窗口分組，每個窗口寫出一組文件
+    （文件名稱附加窗口開始時間）。返回已寫出文件路徑的 PCollection。
+
+    Args:
+        root: 輸出根目錄
+        device_type: "gateway" 或 "anchor"
+        row_group_size: 每個 row group 的記錄數
+        compression: "none"（snappy）、"gzip" 或 "zstd"
+        compression_level: 壓縮級別
+        num_shards: 每個分區的文件數（寫出並行度）
+        window_seconds: 無界輸入的窗口秒數
+
+    Example:
+        valid_only | "寫入 Parquet" >> WriteParquet("/tmp/flattened", "anchor", row_group_size=50000)
+    """
+
+    def __init__(self,
+                 root: str,
+                 device_type: str,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 compression: str = NONE,
+                 compression_level: Optional[int] = None,
+                 num_shards: int = DEFAULT_NUM_SHARDS,
+                 window_seconds: int = DEFAULT_WINDOW_SECONDS):
+        super().__init__()
+        if num_shards <= 0:
+            raise ValueError(f"num_shards 必須大於 0: {num_shards}")
+        if window_seconds <= 0:
+            raise ValueError(f"window_seconds 必須大於 0: {window_seconds}")
+        self.device_type = device_type
+        self.num_shards = num_shards
+        self.window_seconds = window_seconds
+        # 提前檢查參數
+        self.fn = WriteParquetFn(root, device_type, num_shards, row_group_size, compression, compression_level)
+
+    def expand(self, pcoll):
+        if not pcoll.is_bounded:
+            pcoll = pcoll | "固定窗口" >> beam.WindowInto(FixedWindows(self.window_seconds))
+        return (
+            pcoll
+            | "按分區加鍵" >> beam.ParDo(KeyByPartitionFn(self.device_type, self.num_shards)).with_output_types(
+                Tuple[str, FlattenedRecordType(self.device_type)]
+            )
+            | "按分區分組" >> beam.GroupByKey()
+            | "寫入分區文件" >> beam.ParDo(self.fn)
+        )
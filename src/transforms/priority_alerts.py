@@ -0,0 +1,286 @@
+"""高優先級告警通道 - 危急事件不經批次與分片，逐筆立即發佈到低延遲輸出"""
+
+import json
+import socket
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import apache_beam as beam
+from apache_beam.coders import StrUtf8Coder
+from apache_beam.transforms.userstate import ReadModifyWriteStateSpec
+from apache_beam.typehints import Tuple
+
+from ..utils.metrics import StageMetricsMixin, parse_timestamp_ms
+from .custom_coders import FlattenedRecordType
+from .validation_rules import compile_rules
+
+
+# 觸發告警的驗證規則（規則名稱見 ValidationRuleSet.reasons）
+DEFAULT_CRITICAL_RULES = ("range_heart_rate", "range_temperature")
+
+OFFLINE_STATUS = "offline"
+
+# 告警事件保留的字段（其餘字段不發佈，保持訊息精簡）
+ALERT_FIELDS = (
+    "alert_type", "device_id", "device_type", "field", "value", "reasons", "last_seen", "emitted_at",
+)
+
+TCP_SCHEME = "tcp://"
+
+
+def compact_alert(alert: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留 ALERT_FIELDS 中有值的字段；事件時間統一為 last_seen"""
+    compact = {k: alert[k] for k in ALERT_FIELDS if alert.get(k) is not None}
+    if "last_seen" not in compact and alert.get("timestamp"):
+        compact["last_seen"] = alert["timestamp"]
+    return compact
+
+
+class SocketAlertPublisher:
+    """
+    以 TCP 逐筆發送 NDJSON 告警（本地 / 測試用的低延遲輸出）
+
+    關閉 Nagle 演算法，每筆 sendall 後即送出，不在本地緩衝。
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 5.0):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def publish(self, data: bytes):
+        self._sock.sendall(data + b"\n")
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._sock.close()
+
+
+class PubSubAlertPublisher:
+    """
+    逐筆發佈到 Pub/Sub 主題
+
+    客戶端批次設為 1 筆、0 延遲，publish 後立即送出；
+    發佈結果在 flush（bundle 結束）時確認，不阻塞下一筆。
+    """
+
+    def __init__(self, topic: str):
+        from google.cloud import pubsub_v1
+
+        self.topic = topic
+        self._client = pubsub_v1.PublisherClient(
+            batch_settings=pubsub_v1.types.BatchSettings(max_messages=1, max_latency=0)
+        )
+        self._futures: List[Any] = []
+
+    def publish(self, data: bytes):
+        self._futures.append(self._client.publish(self.topic, data))
+
+    def flush(self):
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self.flush()
+
+
+class AlertPublisherFactory:
+    """
+    依目標建立告警發佈客戶端（可 pickle，在 worker 上執行）
+
+    - "tcp://host:port"：SocketAlertPublisher
+    - "projects/<project>/topics/<topic>"：PubSubAlertPublisher
+    """
+
+    def __init__(self, target: str):
+        if not (target.startswith(TCP_SCHEME) or target.startswith("projects/")):
+            raise ValueError(f"未支持的告警輸出: {target}（tcp://host:port 或 projects/<p>/topics/<t>）")
+        self.target = target
+
+    def __call__(self):
+        if self.target.startswith(TCP_SCHEME):
+            host, _, port = self.target[len(TCP_SCHEME):].rpartition(":")
+            return SocketAlertPublisher(host, int(port))
+        return PubSubAlertPublisher(self.target)
+
+
+class OutOfRangeAlertsFn(StageMetricsMixin, beam.DoFn):
+    """無效記錄中命中危急規則（如心率 / 體溫超出範圍）的字段 -> 告警"""
+
+    def __init__(self,
+                 device_type: str,
+                 validation_rules: Optional[Dict[str, Any]] = None,
+                 critical_rules: Sequence[str] = DEFAULT_CRITICAL_RULES):
+        self.device_type = device_type
+        rule_set = compile_rules(device_type, validation_rules)
+        # 位元 -> 字段；只保留此設備類型規則中存在的危急規則
+        self._critical = {
+            bit: name.partition("_")[2]
+            for bit, name in rule_set.rule_names.items()
+            if name in critical_rules
+        }
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"critical_{self.device_type}"
+
+    def process(self, record: Dict[str, Any]):
+        code = record.get("validation_code") or 0
+        for bit, field in self._critical.items():
+            if code & bit:
+                self.metrics.records_out.inc()
+                yield {
+                    "alert_type": "vital_out_of_range",
+                    "device_id": record.get("device_id"),
+                    "device_type": self.device_type,
+                    "field": field,
+                    "value": record.get(field),
+                    "last_seen": record.get("last_seen"),
+                }
+
+
+class OfflineTransitionFn(StageMetricsMixin, beam.DoFn):
+    """
+    按 device_id 偵測狀態變為 offline
+
+    只在狀態由其他值變為 offline（或第一筆即為 offline）時告警，
+    持續離線期間的重複上報不再告警。
+    """
+
+    LAST_STATUS = ReadModifyWriteStateSpec("last_status", StrUtf8Coder())
+
+    def __init__(self, device_type: str):
+        self.device_type = device_type
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"offline_{self.device_type}"
+
+    def process(self, element, last_status=beam.DoFn.StateParam(LAST_STATUS)):
+        device_id, record = element
+        status = record.get("status") or ""
+        previous = last_status.read()
+        if status == previous:
+            return
+        last_status.write(status)
+        if status == OFFLINE_STATUS:
+            self.metrics.records_out.inc()
+            yield {
+                "alert_type": "device_offline",
+                "device_id": device_id,
+                "device_type": self.device_type,
+                "field": "status",
+                "value": status,
+                "last_seen": record.get("last_seen"),
+            }
+
+
+class PublishAlertFn(StageMetricsMixin, beam.DoFn):
+    """
+    逐筆立即發佈告警（不緩衝、不分片）
+
+    發佈時附上 emitted_at；latency_ms 分佈記錄 last_seen 到發佈完成的端到端延遲。
+
+    Metrics（階段 priority_<device_type>）：records_in / records_out /
+    latency_ms / publish_us / missing_event_time
+    """
+
+    def __init__(self, device_type: str, publisher_factory: Callable[[], Any]):
+        self.device_type = device_type
+        self.publisher_factory = publisher_factory
+        self._publisher = None
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"priority_{self.device_type}"
+
+    def setup(self):
+        self._publisher = self.publisher_factory()
+
+    def process(self, alert: Dict[str, Any]):
+        self.metrics.records_in.inc()
+        start = time.perf_counter_ns()
+        compact = compact_alert(alert)
+        compact["emitted_at"] = datetime.utcnow().isoformat() + "Z"
+        self._publisher.publish(json.dumps(compact, ensure_ascii=False, default=str).encode("utf-8"))
+        self.metrics.observe_elapsed(start, "publish_us")
+
+        event_ms = parse_timestamp_ms(compact.get("last_seen"))
+        if event_ms is None:
+            self.metrics.counter("missing_event_time").inc()
+        else:
+            self.metrics.distribution("latency_ms").update(int(time.time() * 1000 - event_ms))
+        self.metrics.records_out.inc()
+        yield compact
+
+    def finish_bundle(self):
+        self._publisher.flush()
+
+    def teardown(self):
+        if self._publisher is not None:
+            self._publisher.close()
+        self._publisher = None
+
+
+class PriorityAlertLane(beam.PTransform):
+    """
+    危急事件的獨立低延遲輸出
+
+    輸入：(有效記錄, 無效記錄[, 其他告警...]) 的 tuple，例如
+    (valid_only, invalid_only, anomaly_alerts)。告警來源：
+        - 無效記錄中命中 critical_rules 的字段（預設心率 / 體溫超出範圍）
+        - 有效記錄的狀態變為 offline（按 device_id 的狀態轉換）
+        - 其他告警（如 DetectVitalAnomalies 的輸出）
+    所有告警精簡為 ALERT_FIELDS 後逐筆發佈，不經過文件輸出的分片與緩衝。
+    返回已發佈的告警。
+
+    Args:
+        device_type: "gateway" 或 "anchor"
+        target: "tcp://host:port" 或 Pub/Sub 主題，與 publisher_factory 二選一
+        publisher_factory: 無參數、返回發佈客戶端（publish / flush / close）的可 pickle 對象
+        validation_rules: 驗證規則（Config.validation_rules），用於對應危急規則的錯誤位元
+        critical_rules: 觸發告警的驗證規則名稱
+
+    Example:
+        (valid_only, invalid_only) | "危急告警" >> PriorityAlertLane(
+            "anchor", "projects/my-project/topics/critical-alerts"
+        )
+    """
+
+    def __init__(self,
+                 device_type: str,
+                 target: Optional[str] = None,
+                 publisher_factory: Optional[Callable[[], Any]] = None,
+                 validation_rules: Optional[Dict[str, Any]] = None,
+                 critical_rules: Sequence[str] = DEFAULT_CRITICAL_RULES):
+        super().__init__()
+        if publisher_factory is None:
+            if not target:
+                raise ValueError("PriorityAlertLane 需要 target 或 publisher_factory")
+            publisher_factory = AlertPublisherFactory(target)
+        self.device_type = device_type
+        self.publisher_factory = publisher_factory
+        self.validation_rules = validation_rules
+        self.critical_rules = tuple(critical_rules)
+
+    def expand(self, pcolls):
+        valid_only, invalid_only, *extra_alerts = pcolls
+        out_of_range = invalid_only | "超出範圍" >> beam.ParDo(
+            OutOfRangeAlertsFn(self.device_type, self.validation_rules, self.critical_rules)
+        )
+        offline = (
+            valid_only
+            | "篩選有設備 ID" >> beam.Filter(lambda record: bool(record.get("device_id")))
+            | "加上鍵" >> beam.Map(lambda record: (record["device_id"], record)).with_output_types(
+                Tuple[str, FlattenedRecordType(self.device_type)]
+            )
+            | "離線轉換" >> beam.ParDo(OfflineTransitionFn(self.device_type))
+        )
+        return (
+            (out_of_range, offline, *extra_alerts)
+            | "合併告警" >> beam.Flatten()
+            | "立即發佈" >> beam.ParDo(PublishAlertFn(self.device_type, self.publisher_factory))
+        )
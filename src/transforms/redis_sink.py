@@ -0,0 +1,208 @@
+"""Redis 熱層輸出 - 每個設備的最新狀態（Hash）與變更通知（Pub/Sub channel）"""
+
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import apache_beam as beam
+
+from ..utils.metrics import StageMetricsMixin
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_CHANNEL = "devices:updates"
+
+# 每個 bundle 最多緩衝的設備數（超過時提前寫出）
+DEFAULT_MAX_BUFFERED = 1000
+# 每次 pipeline 往返寫入的設備數
+DEFAULT_PIPELINE_SIZE = 500
+DEFAULT_MAX_CONNECTIONS = 16
+
+# 同一進程內的 DoFn 實例共用連接池（url, max_connections）-> ConnectionPool
+_POOLS: Dict[tuple, Any] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def state_key(device_type: str, device_id: str) -> str:
+    """最新狀態的 key：devices:<device_type>:<device_id>（與後端讀取端一致）"""
+    return f"devices:{device_type}:{device_id}"
+
+
+def hash_fields(record: Dict[str, Any]) -> Dict[str, str]:
+    """
+    記錄 -> Hash 字段
+
+    省略 None；字符串原樣寫入，其他值寫入 JSON（72.0 -> "72.0"、True -> "true"）。
+    """
+    return {
+        k: v if isinstance(v, str) else json.dumps(v, ensure_ascii=False, default=str)
+        for k, v in record.items()
+        if v is not None
+    }
+
+
+def _event_time(record: Dict[str, Any]) -> str:
+    # ISO 8601（同一時區）可直接按字符串比較
+    return record.get("last_seen") or record.get("timestamp") or ""
+
+
+class RedisClientFactory:
+    """
+    建立 redis-py 客戶端（可 pickle，在 worker 上執行）
+
+    同一進程內相同 url 的客戶端共用一個 ConnectionPool。
+    """
+
+    def __init__(self,
+                 url: str,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 socket_timeout: float = 5.0):
+        self.url = url
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+
+    def __call__(self):
+        import redis
+
+        key = (self.url, self.max_connections)
+        with _POOLS_LOCK:
+            pool = _POOLS.get(key)
+            if pool is None:
+                pool = _POOLS[key] = redis.ConnectionPool.from_url(
+                    self.url,
+                    max_connections=self.max_connections,
+                    socket_timeout=self.socket_timeout,
+                    socket_connect_timeout=self.socket_timeout,
+                )
+        return redis.Redis(connection_pool=pool)
+
+
+class WriteLatestStateFn(StageMetricsMixin, beam.DoFn):
+    """
+    將每個設備的最新記錄寫入 Redis Hash 並發佈變更通知
+
+    同一 bundle 內按 device_id 合併，只寫出事件時間最新的一筆
+    （事件時間相同時以後到者為準）；bundle 結束或緩衝超過 max_buffered 個設備時，
+    以 pipeline（MULTI/EXEC，一次往返）寫出：DEL + HSET + EXPIRE + PUBLISH。
+    先 DEL 確保 Hash 只含最新記錄的字段。
+
+    跨 bundle 的亂序記錄不比較時間（後寫入者覆蓋），由上游按事件時間保證順序。
+
+    Metrics（階段 redis_<device_type>）：records_in / records_out（寫入的設備數）/
+    coalesced / missing_device_id / pipelines
+    """
+
+    def __init__(self,
+                 device_type: str,
+                 client_factory: Callable[[], Any],
+                 ttl_seconds: Optional[int] = DEFAULT_TTL_SECONDS,
+                 channel: Optional[str] = DEFAULT_CHANNEL,
+                 max_buffered: int = DEFAULT_MAX_BUFFERED,
+                 pipeline_size: int = DEFAULT_PIPELINE_SIZE):
+        self.device_type = device_type
+        self.client_factory = client_factory
+        self.ttl_seconds = ttl_seconds
+        self.channel = channel
+        self.max_buffered = max(1, max_buffered)
+        self.pipeline_size = max(1, pipeline_size)
+        self._client = None
+        self._latest: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"redis_{self.device_type}"
+
+    def setup(self):
+        self._client = self.client_factory()
+
+    def start_bundle(self):
+        self._latest = {}
+
+    def process(self, element: Dict[str, Any]):
+        self.metrics.records_in.inc()
+        device_id = element.get("device_id")
+        if not device_id:
+            self.metrics.counter("missing_device_id").inc()
+            return
+
+        previous = self._latest.get(device_id)
+        if previous is not None:
+            self.metrics.counter("coalesced").inc()
+            if _event_time(element) < _event_time(previous):
+                return
+        self._latest[device_id] = element
+
+        if len(self._latest) >= self.max_buffered:
+            self._flush()
+
+    def finish_bundle(self):
+        self._flush()
+
+    def teardown(self):
+        if self._client is not None and hasattr(self._client, "close"):
+            self._client.close()
+        self._client = None
+
+    def _flush(self):
+        if not self._latest:
+            return
+        records = list(self._latest.values())
+        self._latest = {}
+        for start in range(0, len(records), self.pipeline_size):
+            chunk = records[start:start + self.pipeline_size]
+            pipe = self._client.pipeline(transaction=True)
+            for record in chunk:
+                key = state_key(self.device_type, record["device_id"])
+                pipe.delete(key)
+                pipe.hset(key, mapping=hash_fields(record))
+                if self.ttl_seconds:
+                    pipe.expire(key, self.ttl_seconds)
+                if self.channel:
+                    pipe.publish(self.channel, json.dumps(record, ensure_ascii=False, default=str))
+            pipe.execute()
+            self.metrics.counter("pipelines").inc()
+            self.metrics.records_out.inc(len(chunk))
+
+
+class WriteToRedis(beam.PTransform):
+    """
+    將扁平化記錄的最新狀態寫入 Redis 熱層
+
+    Key：devices:<device_type>:<device_id>（Hash，TTL ttl_seconds）；
+    每次寫入在 channel 發佈完整記錄（JSON），供 WebSocket 後端推送。
+
+    Args:
+        device_type: "gateway" 或 "anchor"
+        url: Redis URL（redis://host:6379/0），與 client_factory 二選一
+        client_factory: 無參數、返回 redis 客戶端的可 pickle 對象（測試時可傳入替身）
+        ttl_seconds: Hash 過期秒數，None 表示不過期
+        channel: 變更通知的 channel，None 表示不發佈
+
+    Example:
+        valid_only | "寫入 Redis" >> WriteToRedis("anchor", url="redis://10.0.0.5:6379/0")
+    """
+
+    def __init__(self,
+                 device_type: str,
+                 url: Optional[str] = None,
+                 client_factory: Optional[Callable[[], Any]] = None,
+                 ttl_seconds: Optional[int] = DEFAULT_TTL_SECONDS,
+                 channel: Optional[str] = DEFAULT_CHANNEL,
+                 max_buffered: int = DEFAULT_MAX_BUFFERED,
+                 pipeline_size: int = DEFAULT_PIPELINE_SIZE):
+        super().__init__()
+        if client_factory is None:
+            if not url:
+                raise ValueError("WriteToRedis 需要 url 或 client_factory")
+            client_factory = RedisClientFactory(url)
+        self.device_type = device_type
+        self.fn = WriteLatestStateFn(
+            device_type, client_factory, ttl_seconds, channel, max_buffered, pipeline_size
+        )
+
+    def expand(self, pcoll):
+        return pcoll | "寫入最新狀態" >> beam.ParDo(self.fn)
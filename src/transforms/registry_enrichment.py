@@ -0,0 +1,255 @@
+"""設備登記表增強 - 按 device_id / mac_address 為記錄補上機構、房間、長者"""
+
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import apache_beam as beam
+from apache_beam.io.filesystems import FileSystems
+
+from ..utils.metrics import StageMetricsMixin
+from .custom_coders import with_record_coder
+
+
+logger = logging.getLogger(__name__)
+
+
+# 從登記表補上的字段（與 models/schema.py 的 ENRICHED_COLUMNS 一致）
+REGISTRY_FIELDS = ("facility_id", "room_id", "resident_id")
+
+# 登記表快照的重新載入間隔
+DEFAULT_TTL_SECONDS = 300
+
+# SQLite 快照中的表名
+SQLITE_TABLE = "devices"
+
+_SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+_JSON_EXTENSIONS = (".json", ".ndjson", ".jsonl")
+
+# 同一進程內的 DoFn 實例共用已載入的登記表：(path, fields) -> (載入時間, DeviceRegistry)
+_REGISTRIES: Dict[tuple, Tuple[float, "DeviceRegistry"]] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def normalize_mac(mac: Any) -> Optional[str]:
+    """MAC 地址 -> 大寫、以冒號分隔（"aa-bb-cc-dd-ee-ff" -> "AA:BB:CC:DD:EE:FF"）"""
+    if not isinstance(mac, str) or not mac.strip():
+        return None
+    return mac.strip().upper().replace("-", ":")
+
+
+class DeviceRegistry:
+    """
+    以 device_id 與 mac_address 為鍵的登記表索引
+
+    每個設備只存一個值 tuple（按 fields 順序），兩個索引指向同一個 tuple；
+    字符串經 sys.intern，同一機構 / 房間的重複值只佔一份記憶體。
+    數十萬設備時約為每設備數百 bytes。
+
+    Example:
+        registry = DeviceRegistry.from_rows(rows)
+        registry.lookup("anchor_001", "AA:BB:CC:DD:EE:FF")  # -> {"facility_id": ..., ...}
+    """
+
+    __slots__ = ("fields", "_index", "_size")
+
+    def __init__(self, fields: Sequence[str] = REGISTRY_FIELDS):
+        self.fields = tuple(fields)
+        self._index: Dict[str, tuple] = {}
+        self._size = 0
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]], fields: Sequence[str] = REGISTRY_FIELDS) -> "DeviceRegistry":
+        """登記表行（含 device_id 和 / 或 mac_address）-> DeviceRegistry；兩者皆缺的行略過"""
+        registry = cls(fields)
+        for row in rows:
+            registry.add(row.get("device_id"), row.get("mac_address"), row)
+        return registry
+
+    def add(self, device_id: Any, mac_address: Any, row: Dict[str, Any]) -> None:
+        mac = normalize_mac(mac_address)
+        if not device_id and not mac:
+            return
+        values = tuple(
+            sys.intern(value) if isinstance(value, str) else value
+            for value in (row.get(field) or None for field in self.fields)
+        )
+        self._size += 1
+        if device_id:
+            self._index[str(device_id)] = values
+        if mac:
+            self._index[mac] = values
+
+    def lookup(self, device_id: Any, mac_address: Any = None) -> Optional[Dict[str, Any]]:
+        """先按 device_id、再按 mac_address 查找；找不到時返回 None"""
+        values = self._index.get(device_id) if device_id else None
+        if values is None:
+            mac = normalize_mac(mac_address)
+            values = self._index.get(mac) if mac else None
+        if values is None:
+            return None
+        return {field: value for field, value in zip(self.fields, values) if value is not None}
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def _read_text(path: str) -> str:
+    with FileSystems.open(path) as f:
+        return f.read().decode("utf-8")
+
+
+def _json_rows(text: str) -> List[Dict[str, Any]]:
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # NDJSON：每行一個設備
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        return data.get("devices", [data])
+    return data
+
+
+def _sqlite_rows(path: str) -> List[Dict[str, Any]]:
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        connection.row_factory = sqlite3.Row
+        return [dict(row) for row in connection.execute(f"SELECT * FROM {SQLITE_TABLE}")]
+    finally:
+        connection.close()
+
+
+def load_registry(path: str, fields: Sequence[str] = REGISTRY_FIELDS) -> DeviceRegistry:
+    """
+    載入登記表快照
+
+    格式由副檔名決定：
+        - .csv：首行為欄位名
+        - .json / .ndjson / .jsonl：設備物件的陣列、{"devices": [...]} 或每行一個物件
+        - .db / .sqlite / .sqlite3：本地 SQLite 文件中的 devices 表
+    CSV / JSON 支持 Beam FileSystems 的所有路徑（本地、gs://）。
+
+    Raises:
+        ValueError: 未支持的副檔名
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        rows = csv.DictReader(io.StringIO(_read_text(path)))
+    elif extension in _JSON_EXTENSIONS:
+        rows = _json_rows(_read_text(path))
+    elif extension in _SQLITE_EXTENSIONS:
+        rows = _sqlite_rows(path)
+    else:
+        raise ValueError(f"未支持的登記表格式: {path}（.csv / .json / .ndjson / .sqlite）")
+    return DeviceRegistry.from_rows(rows, fields)
+
+
+def get_registry(path: str,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 fields: Sequence[str] = REGISTRY_FIELDS) -> DeviceRegistry:
+    """
+    取得進程內快取的登記表，超過 ttl_seconds 時重新載入
+
+    重新載入失敗時沿用舊的登記表（記錄警告），首次載入失敗時拋出例外。
+    """
+    key = (path, tuple(fields))
+    now = time.monotonic()
+    with _REGISTRIES_LOCK:
+        cached = _REGISTRIES.get(key)
+        if cached is not None and now - cached[0] < ttl_seconds:
+            return cached[1]
+        try:
+            registry = load_registry(path, fields)
+        except Exception as e:
+            if cached is None:
+                raise
+            logger.warning(f"重新載入設備登記表失敗，沿用舊版本 {path}: {e}")
+            registry = cached[1]
+        _REGISTRIES[key] = (now, registry)
+        return registry
+
+
+class EnrichFromRegistryFn(StageMetricsMixin, beam.DoFn):
+    """
+    按 device_id（找不到時按 mac_address）補上登記表字段
+
+    登記表在每個 bundle 開始時從進程內快取取得（過期時重新載入），
+    每筆記錄只做一次 dict 查找。記錄中已有的值不覆寫。
+
+    Metrics（階段 registry_<device_type>）：records_in / records_out /
+    matched / unregistered / registry_size（載入的設備數）
+    """
+
+    def __init__(self,
+                 device_type: str,
+                 registry_path: str,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 fields: Sequence[str] = REGISTRY_FIELDS):
+        self.device_type = device_type
+        self.registry_path = registry_path
+        self.ttl_seconds = ttl_seconds
+        self.fields = tuple(fields)
+        self._registry: Optional[DeviceRegistry] = None
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"registry_{self.device_type}"
+
+    def start_bundle(self):
+        registry = get_registry(self.registry_path, self.ttl_seconds, self.fields)
+        if registry is not self._registry:
+            self._registry = registry
+            self.metrics.distribution("registry_size").update(len(registry))
+
+    def process(self, record: Dict[str, Any]):
+        self.metrics.records_in.inc()
+        entry = self._registry.lookup(record.get("device_id"), record.get("mac_address"))
+        if entry is None:
+            self.metrics.counter("unregistered").inc()
+        else:
+            self.metrics.counter("matched").inc()
+            record = dict(record)
+            for field, value in entry.items():
+                if record.get(field) is None:
+                    record[field] = value
+        self.metrics.records_out.inc()
+        yield record
+
+
+class EnrichFromRegistry(beam.PTransform):
+    """
+    以設備登記表快照為記錄補上 facility_id / room_id / resident_id
+
+    登記表（CSV / JSON / SQLite，見 load_registry）在每個 worker 進程內載入一次、
+    按 ttl_seconds 定期重新載入，不需要每筆記錄查詢資料庫。
+
+    Args:
+        device_type: "gateway" 或 "anchor"
+        registry_path: 登記表快照路徑
+        ttl_seconds: 重新載入間隔
+        fields: 從登記表補上的字段
+
+    Example:
+        valid_only | "登記表增強" >> EnrichFromRegistry("anchor", "gs://my-bucket/registry/devices.csv")
+    """
+
+    def __init__(self,
+                 device_type: str,
+                 registry_path: str,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 fields: Sequence[str] = REGISTRY_FIELDS):
+        super().__init__()
+        if ttl_seconds <= 0:
+            raise ValueError(f"ttl_seconds 必須大於 0: {ttl_seconds}")
+        self.device_type = device_type
+        self.fn = EnrichFromRegistryFn(device_type, registry_path, ttl_seconds, fields)
+
+    def expand(self, pcoll):
+        return with_record_coder(pcoll | "查找登記表" >> beam.ParDo(self.fn), self.device_type)
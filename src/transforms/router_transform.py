@@ -0,0 +1,165 @@
+"""設備類型路由 - 依鍵簽名將混合數據流分派到 Gateway / Anchor 分支"""
+
+import apache_beam as beam
+from apache_beam.pvalue import TaggedOutput
+import logging
+from typing import Any, Dict, FrozenSet, Optional
+from datetime import datetime
+
+from ..models.records import normalize_key
+from ..utils.metrics import StageMetricsMixin
+
+
+logger = logging.getLogger(__name__)
+
+
+GATEWAY = "gateway"
+ANCHOR = "anchor"
+DEVICE_TYPES = (GATEWAY, ANCHOR)
+
+# 頂層鍵集合的判定結果：設備類型，或需要查看 cloudData 的 node/content
+_NEEDS_HINT = "hint"
+_UNSEEN = object()
+
+# cloudData.node / cloudData.content 的值（小寫） -> 設備類型
+_HINTS: Dict[str, str] = {
+    "anchor": ANCHOR,
+    "gateway": GATEWAY,
+}
+
+# 頂層鍵集合 -> 判定結果（同一來源的訊息鍵集合幾乎固定，命中率極高）
+_SIGNATURE_CACHE: Dict[FrozenSet[str], Optional[str]] = {}
+_SIGNATURE_CACHE_LIMIT = 1024
+
+
+def _classify_keys(keys: FrozenSet[str]) -> Optional[str]:
+    """依頂層鍵名（camelCase 會先標準化）判定設備類型"""
+    names = {normalize_key(k) for k in keys}
+    if "anchor_id" in names:
+        return ANCHOR
+    if "gateway_id" in names and "ip_address" in names:
+        return GATEWAY
+    if "cloud_data" in names:
+        return _NEEDS_HINT
+    return None
+
+
+def classify_payload(record: Dict[str, Any]) -> Optional[str]:
+    """
+    判定原始訊息的設備類型
+
+    規則（依序）：
+    1. 含 anchor_id → anchor
+    2. 同時含 gateway_id 與 ip_address → gateway
+    3. cloudData.node / cloudData.content 為 "anchor" / "gateway"
+    4. 其餘 → None（無法識別）
+
+    頂層鍵集合的判定結果會被快取，只有第 3 步需要讀取字段值。
+
+    Args:
+        record: 解碼後的原始訊息
+
+    Returns:
+        "gateway"、"anchor" 或 None
+    """
+    keys = frozenset(record)
+    verdict = _SIGNATURE_CACHE.get(keys, _UNSEEN)
+    if verdict is _UNSEEN:
+        verdict = _classify_keys(keys)
+        if len(_SIGNATURE_CACHE) < _SIGNATURE_CACHE_LIMIT:
+            _SIGNATURE_CACHE[keys] = verdict
+
+    if verdict != _NEEDS_HINT:
+        return verdict
+
+    cloud_data = record.get("cloudData")
+    if cloud_data is None:
+        cloud_data = record.get("cloud_data")
+    if not isinstance(cloud_data, dict):
+        return None
+    for field in ("node", "content"):
+        value = cloud_data.get(field)
+        if isinstance(value, str):
+            device_type = _HINTS.get(value.lower())
+            if device_type:
+                return device_type
+    return None
+
+
+class DeviceTypeRouter(StageMetricsMixin, beam.DoFn):
+    """
+    設備類型路由
+
+    輸入：解碼後的字典，或 DecodeJson(keyed=True) 產生的 (來源, 字典)。
+          來源為 "gateway" / "anchor" 時直接採用，其餘來源（如 "mixed"）依內容判定。
+    輸出：
+    - gateway / anchor：對應類型的原始字典
+    - quarantine：無法識別類型的訊息
+
+    Metrics（階段 route）：records_in / routed.gateway / routed.anchor / quarantined
+
+    Example:
+        routed = decoded | beam.ParDo(DeviceTypeRouter()).with_outputs(
+            *DeviceTypeRouter.TAGS
+        )
+        gateways, anchors = routed.gateway, routed.anchor
+    """
+
+    QUARANTINE_TAG = "quarantine"
+    TAGS = (GATEWAY, ANCHOR, QUARANTINE_TAG)
+    METRICS_STAGE = "route"
+
+    def process(self, element: Any):
+        """
+        分派單筆訊息
+
+        Args:
+            element: 字典，或 (來源, 字典)
+
+        Yields:
+            TaggedOutput(gateway / anchor / quarantine, 字典)
+        """
+        metrics = self.metrics
+        metrics.records_in.inc()
+
+        if isinstance(element, tuple):
+            source, record = element
+        else:
+            source, record = None, element
+
+        device_type = source if source in DEVICE_TYPES else classify_payload(record)
+        if device_type is None:
+            metrics.counter("quarantined").inc()
+            yield TaggedOutput(self.QUARANTINE_TAG, self._quarantine(record, source))
+            return
+
+        metrics.counter(f"routed.{device_type}").inc()
+        yield TaggedOutput(device_type, record)
+
+    @staticmethod
+    def _quarantine(record: Any, source: Any) -> Dict[str, Any]:
+        """建立隔離記錄"""
+        result = {
+            "error": True,
+            "error_message": "無法識別設備類型",
+            "original_data": record,
+            "timestamp": datetime.utcnow().isoformat() + "Z"
+        }
+        if source is not None:
+            result["source"] = source
+        return result
+
+
+class RouteByDeviceType(beam.PTransform):
+    """
+    按設備類型分流（DeviceTypeRouter 的封裝）
+
+    Returns:
+        DoOutputsTuple：.gateway / .anchor / .quarantine
+
+    Example:
+        routed = decoded | "按類型分流" >> RouteByDeviceType()
+    """
+
+    def expand(self, pcoll):
+        return pcoll | "路由" >> beam.ParDo(DeviceTypeRouter()).with_outputs(*DeviceTypeRouter.TAGS)
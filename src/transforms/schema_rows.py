@@ -0,0 +1,116 @@
+"""Beam schema 行 - 扁平化記錄字典與 Flattened*Row（NamedTuple）之間的轉換"""
+
+from typing import Any, Dict
+
+import apache_beam as beam
+
+from ..models.schema import (
+    COERCERS, EXTRA_COLUMN, ROW_TYPES, encode_extra, record_columns, row_type,
+)
+from ..utils.metrics import StageMetricsMixin
+
+
+# 以 schema 的 RowCoder 編碼（而非 pickle / FastPrimitivesCoder）
+for _row_type in ROW_TYPES.values():
+    beam.coders.registry.register_coder(_row_type, beam.coders.RowCoder)
+
+
+def _coerced_fields(device_type: str):
+    fields = [
+        (column.name, COERCERS[column.type])
+        for column in record_columns(device_type)
+        if column.name != EXTRA_COLUMN
+    ]
+    return fields, frozenset(name for name, _ in fields)
+
+
+def make_row_converter(device_type: str):
+    """
+    建立 記錄字典 -> Flattened*Row 的轉換函數
+
+    類型不符的值會轉換（如 72.0 -> 72、1 -> True），無法轉換時為 None；
+    不在 schema 中的字段以 JSON 字符串存入 extra_data（與 Parquet 輸出一致）。
+    """
+    row_cls = row_type(device_type)
+    fields, known = _coerced_fields(device_type)
+
+    def to_row(record: Dict[str, Any]):
+        get = record.get
+        values = [coerce(get(name)) for name, coerce in fields]
+        values.append(encode_extra(record, known))
+        return row_cls(*values)
+
+    return to_row
+
+
+def make_dict_converter(device_type: str):
+    """
+    建立 記錄字典 -> 符合 schema 的字典 的轉換函數（一次完成，不經過 Flattened*Row）
+
+    轉換規則與 make_row_converter 相同，值為 None 的字段省略，
+    結果等同 row_to_dict(make_row_converter(device_type)(record))。
+    """
+    fields, known = _coerced_fields(device_type)
+
+    def to_dict(record: Dict[str, Any]) -> Dict[str, Any]:
+        get = record.get
+        result = {}
+        for name, coerce in fields:
+            value = coerce(get(name))
+            if value is not None:
+                result[name] = value
+        extra = encode_extra(record, known)
+        if extra is not None:
+            result[EXTRA_COLUMN] = extra
+        return result
+
+    return to_dict
+
+
+def row_to_dict(row) -> Dict[str, Any]:
+    """Flattened*Row -> 字典（省略 None 的字段，供 BigQuery / JSON 輸出）"""
+    return {k: v for k, v in zip(row._fields, row) if v is not None}
+
+
+class ToRowsFn(StageMetricsMixin, beam.DoFn):
+    """
+    記錄字典 -> Flattened*Row
+
+    Metrics（階段 rows_<device_type>）：records_in / records_out
+    """
+
+    def __init__(self, device_type: str):
+        self.device_type = device_type
+        self._to_row = None
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"rows_{self.device_type}"
+
+    def setup(self):
+        self._to_row = make_row_converter(self.device_type)
+
+    def process(self, element: Dict[str, Any]):
+        self.metrics.records_in.inc()
+        self.metrics.records_out.inc()
+        yield self._to_row(element)
+
+
+class ToRows(beam.PTransform):
+    """
+    將扁平化記錄轉換為 schema 行（FlattenedGatewayRow / FlattenedAnchorRow）
+
+    輸出 PCollection 帶有 Beam schema（RowCoder 編碼），
+    可直接用於 SqlTransform、beam.Select 或跨語言轉換。
+
+    Example:
+        rows = valid_only | "轉換為 Row" >> ToRows("anchor")
+    """
+
+    def __init__(self, device_type: str):
+        super().__init__()
+        self.device_type = device_type
+        self.row_type = row_type(device_type)
+
+    def expand(self, pcoll):
+        return pcoll | "轉換" >> beam.ParDo(ToRowsFn(self.device_type)).with_output_types(self.row_type)
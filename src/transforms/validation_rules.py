@@ -0,0 +1,220 @@
+"""驗證規則引擎 - 從配置編譯為有序的檢查列表"""
+
+import enum
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+# 內建規則（與 config/*.yaml 的 validation_rules 格式相同）
+#
+# 每個設備類型是一個有序的字段列表，每個字段可包含：
+#   required: {code}                    - 值不可為空
+#   numeric:  {code}                    - 有值時必須為數值
+#   range:    {min, max, code, label}   - 有值且為數值時必須在開區間 (min, max) 內
+#
+# code 是穩定的錯誤碼（0-62），記錄上的 validation_code = OR(1 << code)
+DEFAULT_VALIDATION_RULES: Dict[str, List[Dict[str, Any]]] = {
+    "gateway": [
+        {"field": "device_id", "required": {"code": 0}},
+        {"field": "device_type", "required": {"code": 1}},
+        {"field": "battery_voltage", "numeric": {"code": 2},
+         "range": {"min": 2.0, "max": 5.0, "code": 10, "label": "電壓超出範圍"}},
+        {"field": "rssi", "numeric": {"code": 3},
+         "range": {"min": -200, "max": 0, "code": 9, "label": "RSSI 超出範圍"}},
+        {"field": "position_x", "numeric": {"code": 6}},
+        {"field": "position_y", "numeric": {"code": 7}},
+        {"field": "position_z", "numeric": {"code": 8}},
+    ],
+    "anchor": [
+        {"field": "device_id", "required": {"code": 0}},
+        {"field": "device_type", "required": {"code": 1}},
+        {"field": "battery_voltage", "numeric": {"code": 2},
+         "range": {"min": 2.0, "max": 5.0, "code": 10, "label": "電壓超出範圍"}},
+        {"field": "rssi", "numeric": {"code": 3},
+         "range": {"min": -200, "max": 0, "code": 9, "label": "RSSI 超出範圍"}},
+        {"field": "heart_rate", "numeric": {"code": 4},
+         "range": {"min": 30, "max": 200, "code": 11, "label": "心率異常"}},
+        {"field": "temperature", "numeric": {"code": 5},
+         "range": {"min": 35, "max": 42, "code": 12, "label": "溫度異常"}},
+        {"field": "position_x", "numeric": {"code": 6}},
+        {"field": "position_y", "numeric": {"code": 7}},
+        {"field": "position_z", "numeric": {"code": 8}},
+    ],
+}
+
+MAX_RULE_CODE = 62
+
+
+class ValidationCode(enum.IntFlag):
+    """內建規則的驗證錯誤位元碼（數值固定，可安全寫入下游）"""
+
+    MISSING_DEVICE_ID = 1 << 0
+    MISSING_DEVICE_TYPE = 1 << 1
+    TYPE_BATTERY_VOLTAGE = 1 << 2
+    TYPE_RSSI = 1 << 3
+    TYPE_HEART_RATE = 1 << 4
+    TYPE_TEMPERATURE = 1 << 5
+    TYPE_POSITION_X = 1 << 6
+    TYPE_POSITION_Y = 1 << 7
+    TYPE_POSITION_Z = 1 << 8
+    RANGE_RSSI = 1 << 9
+    RANGE_BATTERY_VOLTAGE = 1 << 10
+    RANGE_HEART_RATE = 1 << 11
+    RANGE_TEMPERATURE = 1 << 12
+
+
+_NUMERIC_TYPES = (int, float)
+
+
+@dataclass(frozen=True)
+class FieldCheck:
+    """
+    單一字段的編譯後檢查
+
+    檢查順序：required → numeric → range，任一步失敗即跳過該字段的後續檢查
+    （例如型別錯誤時不再做值域比較）。各步驟的 bit 為 0 表示未啟用。
+    """
+
+    field: str
+    required_bit: int = 0
+    numeric_bit: int = 0
+    range_bit: int = 0
+    low: float = float("-inf")
+    high: float = float("inf")
+    range_label: str = ""
+
+
+class ValidationRuleSet:
+    """
+    編譯後的驗證規則
+
+    Example:
+        rules = compile_rules("anchor", config.validation_rules)
+        code = rules.check(record)          # 0 表示有效
+        messages = rules.describe(code, record)
+    """
+
+    def __init__(self, device_type: str, checks: Sequence[FieldCheck], rule_names: Dict[int, str]):
+        self.device_type = device_type
+        self.checks: Tuple[FieldCheck, ...] = tuple(checks)
+        # bit -> 規則名稱（如 "range_heart_rate"），用於按規則統計
+        self.rule_names = rule_names
+        self._plan = tuple(
+            (c.field, c.required_bit, c.numeric_bit, c.range_bit, c.low, c.high)
+            for c in self.checks
+        )
+
+    def check(self, record: Dict[str, Any]) -> int:
+        """
+        檢查單筆記錄（不修改輸入、不分配字符串）
+
+        Returns:
+            錯誤位元碼，0 表示有效
+        """
+        code = 0
+        get = record.get
+        for field, required_bit, numeric_bit, range_bit, low, high in self._plan:
+            value = get(field)
+            if required_bit and not value:
+                code |= required_bit
+                continue
+            if value is None:
+                continue
+            if numeric_bit and not isinstance(value, _NUMERIC_TYPES):
+                code |= numeric_bit
+                continue
+            if range_bit and not (low < value < high):
+                code |= range_bit
+        return code
+
+    def describe(self, code: int, record: Dict[str, Any]) -> List[str]:
+        """
+        將位元碼轉換為可讀的錯誤訊息（只在寫出無效記錄時調用）
+
+        Args:
+            code: 錯誤位元碼
+            record: 對應的記錄（用於在訊息中顯示數值）
+
+        Returns:
+            錯誤訊息列表，按規則順序排列
+        """
+        messages = []
+        for check in self.checks:
+            if code & check.required_bit:
+                messages.append(f"缺少必要字段: {check.field}")
+            if code & check.numeric_bit:
+                messages.append(f"字段 {check.field} 類型錯誤: 預期數值型")
+            if code & check.range_bit:
+                messages.append(f"{check.range_label}: {record.get(check.field)}")
+        return messages
+
+    def codes(self, code: int) -> List[int]:
+        """位元碼 -> 穩定錯誤碼列表"""
+        return [bit.bit_length() - 1 for bit in self.rule_names if code & bit]
+
+    def reasons(self, code: int) -> List[str]:
+        """位元碼 -> 規則名稱列表（用於按規則統計）"""
+        return [name for bit, name in self.rule_names.items() if code & bit]
+
+    def annotate(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """返回補上 validation_errors 訊息的記錄副本（用於錯誤輸出，不修改輸入）"""
+        code = record.get("validation_code")
+        if not code:
+            return record
+        return {**record, "validation_errors": self.describe(code, record)}
+
+
+def compile_rules(device_type: str,
+                  rules_config: Optional[Dict[str, Any]] = None) -> ValidationRuleSet:
+    """
+    將規則配置編譯為 ValidationRuleSet
+
+    Args:
+        device_type: "gateway" 或 "anchor"
+        rules_config: 按設備類型的規則（Config.validation_rules），
+                      缺少該設備類型時使用 DEFAULT_VALIDATION_RULES
+
+    Returns:
+        ValidationRuleSet
+
+    Raises:
+        ValueError: 規則格式錯誤或錯誤碼重複
+    """
+    rules = (rules_config or {}).get(device_type) or DEFAULT_VALIDATION_RULES.get(device_type)
+    if rules is None:
+        raise ValueError(f"沒有 {device_type} 的驗證規則")
+
+    checks = []
+    rule_names: Dict[int, str] = {}
+
+    def bit_for(spec: Dict[str, Any], field: str, kind: str) -> int:
+        code = spec.get("code")
+        if not isinstance(code, int) or not 0 <= code <= MAX_RULE_CODE:
+            raise ValueError(f"{device_type}.{field}.{kind} 的錯誤碼無效: {code}")
+        bit = 1 << code
+        if bit in rule_names:
+            raise ValueError(f"{device_type} 錯誤碼重複: {code}")
+        rule_names[bit] = f"{kind}_{field}"
+        return bit
+
+    for rule in rules:
+        field = rule.get("field")
+        if not field:
+            raise ValueError(f"{device_type} 規則缺少 field: {rule}")
+
+        kwargs: Dict[str, Any] = {"field": field}
+        if "required" in rule:
+            kwargs["required_bit"] = bit_for(rule["required"], field, "required")
+        if "numeric" in rule:
+            kwargs["numeric_bit"] = bit_for(rule["numeric"], field, "numeric")
+        if "range" in rule:
+            spec = rule["range"]
+            kwargs["range_bit"] = bit_for(spec, field, "range")
+            kwargs["low"] = float("-inf") if spec.get("min") is None else spec["min"]
+            kwargs["high"] = float("inf") if spec.get("max") is None else spec["max"]
+            kwargs["range_label"] = spec.get("label") or f"{field} 超出範圍"
+            if "numeric_bit" not in kwargs:
+                raise ValueError(f"{device_type}.{field} 的 range 規則需要同時設置 numeric")
+        checks.append(FieldCheck(**kwargs))
+
+    return ValidationRuleSet(device_type, checks, rule_names)
@@ -2,145 +2,129 @@
 
 import apache_beam as beam
 import logging
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
+import time
+
+from .validation_rules import compile_rules, ValidationRuleSet
+from ..utils.logger import AggregatedLoggingMixin
+from ..utils.metrics import StageMetricsMixin
 
 
 logger = logging.getLogger(__name__)
 
 
-class ValidateGatewayTransform(beam.DoFn):
+class _RuleValidateTransform(AggregatedLoggingMixin, StageMetricsMixin, beam.DoFn):
     """
-    Gateway 數據驗證轉換
+    規則驅動的驗證轉換基類
     
-    檢查：
-    - device_id 不為空
-    - 必要字段存在
-    - 數據類型正確
+    規則來自 Config.validation_rules（config/*.yaml），在 setup() 時編譯為
+    有序的檢查列表。驗證結果以穩定的錯誤碼位元組合寫入 validation_code，
+    不在逐筆處理時產生錯誤訊息字符串；可讀訊息只在寫出無效記錄時生成
+    （ValidationRuleSet.annotate）。失敗只按規則名稱計數，摘要定期寫出。
+    
+    Metrics（階段 validate_<device_type>）：records_in / records_out /
+    valid / invalid / failed.<規則名稱> / processing_us
     """
     
-    REQUIRED_FIELDS = ["device_id", "device_type"]
-    NUMERIC_FIELDS = ["battery_voltage", "rssi", "position_x", "position_y", "position_z"]
+    DEVICE_TYPE = None
+    
+    def __init__(self, rules: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            rules: 按設備類型的驗證規則，None 表示使用內建規則
+        """
+        self.rules = rules
+        self._rule_set: Optional[ValidationRuleSet] = None
+    
+    def setup(self):
+        """每個 worker 編譯一次規則"""
+        self._rule_set = compile_rules(self.DEVICE_TYPE, self.rules)
+    
+    @property
+    def log_scope(self) -> str:
+        return f"{self.DEVICE_TYPE.capitalize()} 驗證"
+    
+    @property
+    def metrics_stage(self) -> str:
+        return f"validate_{self.DEVICE_TYPE}"
+    
+    @property
+    def rule_set(self) -> ValidationRuleSet:
+        if self._rule_set is None:
+            self.setup()
+        return self._rule_set
     
     def process(self, element: Dict[str, Any]):
         """
-        驗證 Gateway 數據
+        驗證數據
         
         Args:
-            element: Gateway 扁平化數據
+            element: 扁平化數據
             
         Yields:
-            (bool, Dict) - (是否有效, 數據)
+            驗證後的數據（添加 validation_code / is_valid 字段）
         """
-        errors = []
-        
-        # 檢查必要字段
-        for field in self.REQUIRED_FIELDS:
-            if field not in element or not element[field]:
-                errors.append(f"缺少必要字段: {field}")
-        
-        # 檢查數據類型
-        for field in self.NUMERIC_FIELDS:
-            if field in element and element[field] is not None:
-                if not isinstance(element[field], (int, float)):
-                    errors.append(f"字段 {field} 類型錯誤: 預期數值型")
-        
-        # 檢查 RSSI 範圍
-        if "rssi" in element and element["rssi"] is not None:
-            rssi = element["rssi"]
-            if not (-200 < rssi < 0):
-                errors.append(f"RSSI 超出範圍: {rssi}")
-        
-        # 檢查電壓範圍
-        if "battery_voltage" in element and element["battery_voltage"] is not None:
-            voltage = element["battery_voltage"]
-            if not (2.0 < voltage < 5.0):
-                errors.append(f"電壓超出範圍: {voltage}")
-        
-        if errors:
-            element["validation_errors"] = errors
-            element["is_valid"] = False
-            logger.warning(f"Gateway 驗證失敗: {errors}")
+        start = time.perf_counter_ns()
+        metrics = self.metrics
+        metrics.records_in.inc()
+        rule_set = self.rule_set
+        code = rule_set.check(element)
+        element["validation_code"] = code
+        element["is_valid"] = not code
+        if code:
+            metrics.counter("invalid").inc()
+            device_id = element.get("device_id")
+            for reason in rule_set.reasons(code):
+                metrics.counter(f"failed.{reason}").inc()
+                self.log.count(reason, device_id)
         else:
-            element["is_valid"] = True
-        
+            metrics.counter("valid").inc()
+        metrics.records_out.inc()
+        metrics.observe_elapsed(start)
         yield element
+    
+    def validate(self, element: Dict[str, Any]) -> List[str]:
+        """
+        檢查數據並返回可讀的錯誤訊息，不修改輸入
+        
+        Args:
+            element: 扁平化數據
+            
+        Returns:
+            錯誤訊息列表（空列表表示有效）
+        """
+        rule_set = self.rule_set
+        code = rule_set.check(element)
+        return rule_set.describe(code, element) if code else []
 
 
-class ValidateAnchorTransform(beam.DoFn):
+class ValidateGatewayTransform(_RuleValidateTransform):
     """
-    Anchor 數據驗證轉換
+    Gateway 數據驗證轉換
     
-    檢查：
+    檢查（內建規則）：
     - device_id 不為空
     - 必要字段存在
     - 數據類型正確
-    - 值域範圍正確
+    - RSSI / 電壓範圍正確
+    """
+    
+    DEVICE_TYPE = "gateway"
+
+
+class ValidateAnchorTransform(_RuleValidateTransform):
     """
+    Anchor 數據驗證轉換
     
-    REQUIRED_FIELDS = ["device_id", "device_type"]
-    NUMERIC_FIELDS = [
-        "battery_voltage", "rssi", "heart_rate", "temperature",
-        "position_x", "position_y", "position_z"
-    ]
+    檢查（內建規則）：
+    - device_id 不為空
+    - 必要字段存在
+    - 數據類型正確
+    - 值域範圍正確（心率、體溫、RSSI、電壓）
+    """
     
-    def process(self, element: Dict[str, Any]):
-        """
-        驗證 Anchor 數據
-        
-        Args:
-            element: Anchor 扁平化數據
-            
-        Yields:
-            驗證後的數據（添加 validation_errors 字段）
-        """
-        errors = []
-        
-        # 檢查必要字段
-        for field in self.REQUIRED_FIELDS:
-            if field not in element or not element[field]:
-                errors.append(f"缺少必要字段: {field}")
-        
-        # 檢查數據類型
-        for field in self.NUMERIC_FIELDS:
-            if field in element and element[field] is not None:
-                if not isinstance(element[field], (int, float)):
-                    errors.append(f"字段 {field} 類型錯誤: 預期數值型")
-        
-        # 檢查心率範圍（正常值：60-100 BPM）
-        if "heart_rate" in element and element["heart_rate"] is not None:
-            hr = element["heart_rate"]
-            if not (30 < hr < 200):  # 允許異常值便於診斷
-                logger.warning(f"心率異常: {hr}")
-                errors.append(f"心率異常: {hr}")
-        
-        # 檢查溫度範圍（正常體溫：36-37.5°C）
-        if "temperature" in element and element["temperature"] is not None:
-            temp = element["temperature"]
-            if not (35 < temp < 42):
-                logger.warning(f"溫度異常: {temp}")
-                errors.append(f"溫度異常: {temp}")
-        
-        # 檢查 RSSI 範圍
-        if "rssi" in element and element["rssi"] is not None:
-            rssi = element["rssi"]
-            if not (-200 < rssi < 0):
-                errors.append(f"RSSI 超出範圍: {rssi}")
-        
-        # 檢查電壓範圍
-        if "battery_voltage" in element and element["battery_voltage"] is not None:
-            voltage = element["battery_voltage"]
-            if not (2.0 < voltage < 5.0):
-                errors.append(f"電壓超出範圍: {voltage}")
-        
-        if errors:
-            element["validation_errors"] = errors
-            element["is_valid"] = False
-            logger.warning(f"Anchor 驗證失敗: {errors}")
-        else:
-            element["is_valid"] = True
-        
-        yield element
+    DEVICE_TYPE = "anchor"
 
 
 class FilterValidRecordsTransform(beam.DoFn):
@@ -163,7 +147,3 @@ class FilterValidRecordsTransform(beam.DoFn):
         """
         is_valid = element.get("is_valid", False)
         yield is_valid, element
-
-
-
-
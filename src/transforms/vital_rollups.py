@@ -0,0 +1,219 @@
+"""生命體徵彙總 - 按 device_id 的固定事件時間窗口（每分鐘 / 每小時）統計"""
+
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Sequence, Tuple
+
+import apache_beam as beam
+from apache_beam.transforms.window import FixedWindows, TimestampedValue
+
+from ..utils.metrics import StageMetricsMixin, parse_timestamp_ms
+
+
+# 彙總的數值字段
+ROLLUP_FIELDS = ("heart_rate", "temperature", "battery_voltage", "rssi")
+
+# 粒度 -> 窗口秒數（由小到大；較大粒度由較小粒度的累加器合併而來）
+ROLLUP_WINDOWS: Dict[str, int] = {
+    "minute": 60,
+    "hour": 3600,
+}
+
+# 累加器中每個字段佔的槽位：count, sum, sumsq, min, max
+_COUNT, _SUM, _SUMSQ, _MIN, _MAX = range(5)
+_SLOTS = 5
+
+
+def _empty_accumulator(n_fields: int) -> List[float]:
+    acc = []
+    for _ in range(n_fields):
+        acc.extend((0, 0.0, 0.0, math.inf, -math.inf))
+    return acc
+
+
+def _merge_into(target: List[float], other: Sequence[float]) -> List[float]:
+    for base in range(0, len(target), _SLOTS):
+        if not other[base + _COUNT]:
+            continue
+        target[base + _COUNT] += other[base + _COUNT]
+        target[base + _SUM] += other[base + _SUM]
+        target[base + _SUMSQ] += other[base + _SUMSQ]
+        if other[base + _MIN] < target[base + _MIN]:
+            target[base + _MIN] = other[base + _MIN]
+        if other[base + _MAX] > target[base + _MAX]:
+            target[base + _MAX] = other[base + _MAX]
+    return target
+
+
+class VitalStatsFn(beam.CombineFn):
+    """
+    按字段累計 count / sum / sumsq / min / max
+
+    累加器為扁平 list（每個字段 5 個槽位），合併只需逐槽相加 / 取極值，
+    可在 shuffle 前部分彙總（combiner lifting），也可再合併為更大粒度的窗口。
+    None 與非數值不計入；輸出為累加器本身，由 stats_summary() 轉為統計值。
+    """
+
+    def __init__(self, fields: Sequence[str] = ROLLUP_FIELDS):
+        self.fields = tuple(fields)
+
+    def create_accumulator(self) -> List[float]:
+        return _empty_accumulator(len(self.fields))
+
+    def add_input(self, accumulator: List[float], record: Dict[str, Any]) -> List[float]:
+        for base, field in zip(range(0, len(accumulator), _SLOTS), self.fields):
+            value = record.get(field)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            accumulator[base + _COUNT] += 1
+            accumulator[base + _SUM] += value
+            accumulator[base + _SUMSQ] += value * value
+            if value < accumulator[base + _MIN]:
+                accumulator[base + _MIN] = value
+            if value > accumulator[base + _MAX]:
+                accumulator[base + _MAX] = value
+        return accumulator
+
+    def merge_accumulators(self, accumulators) -> List[float]:
+        accumulators = iter(accumulators)
+        merged = next(accumulators)
+        for accumulator in accumulators:
+            _merge_into(merged, accumulator)
+        return merged
+
+    def extract_output(self, accumulator: List[float]) -> List[float]:
+        return accumulator
+
+
+class MergeStatsFn(VitalStatsFn):
+    """合併 VitalStatsFn 的輸出（較小粒度窗口的累加器）為較大粒度窗口"""
+
+    def add_input(self, accumulator: List[float], partial: Sequence[float]) -> List[float]:
+        return _merge_into(accumulator, partial)
+
+
+def stats_summary(accumulator: Sequence[float], fields: Sequence[str] = ROLLUP_FIELDS) -> Dict[str, Any]:
+    """
+    累加器 -> {<字段>_count, <字段>_mean, <字段>_min, <字段>_max, <字段>_stddev}
+
+    stddev 為總體標準差；沒有數值的字段 count 為 0，其餘為 None。
+    """
+    summary: Dict[str, Any] = {}
+    for base, field in zip(range(0, len(accumulator), _SLOTS), fields):
+        count = int(accumulator[base + _COUNT])
+        summary[f"{field}_count"] = count
+        if not count:
+            summary.update({f"{field}_{k}": None for k in ("mean", "min", "max", "stddev")})
+            continue
+        mean = accumulator[base + _SUM] / count
+        variance = max(0.0, accumulator[base + _SUMSQ] / count - mean * mean)
+        summary[f"{field}_mean"] = mean
+        summary[f"{field}_min"] = accumulator[base + _MIN]
+        summary[f"{field}_max"] = accumulator[base + _MAX]
+        summary[f"{field}_stddev"] = math.sqrt(variance)
+    return summary
+
+
+def _iso(timestamp) -> str:
+    seconds = float(timestamp)
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class KeyByEventTimeFn(StageMetricsMixin, beam.DoFn):
+    """
+    記錄 -> 以 timestamp（缺失時 last_seen）為事件時間的 (device_id, 記錄)
+
+    缺少 device_id 或事件時間無法解析的記錄不參與彙總。
+    """
+
+    METRICS_STAGE = "rollup_keys"
+
+    def process(self, record: Dict[str, Any]):
+        self.metrics.records_in.inc()
+        device_id = record.get("device_id")
+        event_ms = parse_timestamp_ms(record.get("timestamp") or record.get("last_seen"))
+        if not device_id or event_ms is None:
+            self.metrics.counter("skipped").inc()
+            return
+        self.metrics.records_out.inc()
+        yield TimestampedValue((device_id, record), event_ms / 1000)
+
+
+class FormatRollupFn(StageMetricsMixin, beam.DoFn):
+    """(device_id, 累加器) + 窗口 -> 彙總記錄"""
+
+    def __init__(self, device_type: str, granularity: str, fields: Sequence[str] = ROLLUP_FIELDS):
+        self.device_type = device_type
+        self.granularity = granularity
+        self.fields = tuple(fields)
+
+    @property
+    def metrics_stage(self) -> str:
+        return f"rollup_{self.granularity}"
+
+    def process(self, element: Tuple[str, List[float]], window=beam.DoFn.WindowParam):
+        device_id, accumulator = element
+        self.metrics.records_out.inc()
+        rollup = {
+            "device_id": device_id,
+            "device_type": self.device_type,
+            "granularity": self.granularity,
+            "window_start": _iso(window.start),
+            "window_end": _iso(window.end),
+        }
+        rollup.update(stats_summary(accumulator, self.fields))
+        yield rollup
+
+
+class VitalRollups(beam.PTransform):
+    """
+    按 device_id 的固定事件時間窗口彙總生命體徵
+
+    每分鐘窗口以 VitalStatsFn 彙總原始記錄；每小時窗口合併每分鐘的累加器
+    （不再掃描原始記錄）。返回 {粒度: 彙總記錄的 PCollection}。
+
+    事件時間取自 timestamp（扁平化時由 last_seen 映射）；串流輸入需以
+    事件時間作為元素時間戳讀取（ReadFromPubSub(timestamp_attribute=...)），
+    否則早於 watermark 的記錄會被視為遲到而丟棄。
+
+    Args:
+        device_type: 設備類型（寫入彙總記錄）
+        granularities: 要輸出的粒度（ROLLUP_WINDOWS 的鍵）
+        fields: 彙總的數值字段
+
+    Example:
+        rollups = valid_only | "彙總生命體徵" >> VitalRollups("anchor")
+        rollups["minute"] | beam.Map(json.dumps) | WriteNdjson("/tmp/anchor_rollups_minute")
+    """
+
+    def __init__(self,
+                 device_type: str = "anchor",
+                 granularities: Sequence[str] = tuple(ROLLUP_WINDOWS),
+                 fields: Sequence[str] = ROLLUP_FIELDS):
+        super().__init__()
+        unknown = set(granularities) - set(ROLLUP_WINDOWS)
+        if unknown:
+            raise ValueError(f"未支持的彙總粒度: {sorted(unknown)}")
+        self.device_type = device_type
+        self.granularities = tuple(granularities)
+        self.fields = tuple(fields)
+
+    def expand(self, pcoll):
+        partials = pcoll | "按事件時間加鍵" >> beam.ParDo(KeyByEventTimeFn())
+        combine_fn = VitalStatsFn(self.fields)
+        outputs = {}
+        # 由小到大逐級合併；每級的輸出時間戳為窗口末尾，落在下一級的同一窗口內
+        for granularity, seconds in ROLLUP_WINDOWS.items():
+            if not any(ROLLUP_WINDOWS[g] >= seconds for g in self.granularities):
+                break
+            partials = (
+                partials
+                | f"{granularity} 窗口" >> beam.WindowInto(FixedWindows(seconds))
+                | f"{granularity} 彙總" >> beam.CombinePerKey(combine_fn)
+            )
+            combine_fn = MergeStatsFn(self.fields)
+            if granularity in self.granularities:
+                outputs[granularity] = partials | f"{granularity} 格式化" >> beam.ParDo(
+                    FormatRollupFn(self.device_type, granularity, self.fields)
+                )
+        return outputs
@@ -1,9 +1,9 @@
 """工具模塊"""
 
-from .logger import setup_logger
+from .logger import setup_logger, stop_logger, LogAggregator
 from .helpers import parse_json, flatten_dict
 
-__all__ = ["setup_logger", "parse_json", "flatten_dict"]
+__all__ = ["setup_logger", "stop_logger", "LogAggregator", "parse_json", "flatten_dict"]
 
 
 
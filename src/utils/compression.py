@@ -0,0 +1,167 @@
+"""壓縮編解碼 - gzip / zstd 的串流讀寫與格式偵測"""
+
+import gzip
+import io
+import os
+from typing import BinaryIO, Optional
+
+from apache_beam.io.filesystem import CompressionTypes
+
+
+NONE = "none"
+GZIP = "gzip"
+ZSTD = "zstd"
+CODECS = (NONE, GZIP, ZSTD)
+
+# 預設壓縮級別（偏向速度；gzip 1-9，zstd 1-22）
+DEFAULT_LEVELS = {
+    GZIP: 6,
+    ZSTD: 3,
+}
+
+_SUFFIXES = {
+    NONE: "",
+    GZIP: ".gz",
+    ZSTD: ".zst",
+}
+
+_EXTENSIONS = {
+    ".gz": GZIP,
+    ".gzip": GZIP,
+    ".zst": ZSTD,
+    ".zstd": ZSTD,
+}
+
+_MAGIC = (
+    (b"\x1f\x8b", GZIP),
+    (b"\x28\xb5\x2f\xfd", ZSTD),
+)
+
+_BEAM_TYPES = {
+    NONE: CompressionTypes.UNCOMPRESSED,
+    GZIP: CompressionTypes.GZIP,
+    ZSTD: CompressionTypes.ZSTD,
+}
+
+# 串流讀寫的緩衝區大小
+_STREAM_BUFFER = 1 << 20
+
+
+def codec_from_extension(path: str) -> Optional[str]:
+    """依副檔名判定編碼，無法判定時返回 None"""
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def codec_from_magic(head: bytes) -> str:
+    """依文件開頭的 magic bytes 判定編碼"""
+    for magic, codec in _MAGIC:
+        if head.startswith(magic):
+            return codec
+    return NONE
+
+
+def detect_codec(path: str) -> str:
+    """
+    偵測本地文件的壓縮編碼（先看副檔名，再讀取 magic bytes）
+
+    Returns:
+        "none"、"gzip" 或 "zstd"
+    """
+    codec = codec_from_extension(path)
+    if codec:
+        return codec
+    with open(path, "rb") as f:
+        return codec_from_magic(f.read(4))
+
+
+def validate_codec(codec: str, level: Optional[int] = None):
+    """
+    檢查編碼名稱與壓縮級別
+
+    Raises:
+        ValueError: 未知的編碼或級別超出範圍
+    """
+    if codec not in CODECS:
+        raise ValueError(f"未支持的壓縮編碼: {codec}")
+    if level is None or codec == NONE:
+        return
+    low, high = (1, 9) if codec == GZIP else (1, 22)
+    if not low <= level <= high:
+        raise ValueError(f"{codec} 壓縮級別必須在 {low}-{high} 之間: {level}")
+
+
+def output_suffix(codec: str) -> str:
+    """輸出文件的副檔名（none 為空字符串）"""
+    return _SUFFIXES[codec]
+
+
+def beam_compression_type(codec: str) -> str:
+    """對應的 Beam CompressionTypes"""
+    return _BEAM_TYPES[codec]
+
+
+def open_input(path: str, codec: Optional[str] = None) -> BinaryIO:
+    """
+    以串流解壓方式開啟輸入文件
+
+    gzip 支持多成員（concatenated）文件；zstd 支持多幀文件。
+    返回的對象可逐行迭代（每行含換行符）。
+
+    Args:
+        path: 本地文件路徑
+        codec: 編碼，None 表示自動偵測
+    """
+    codec = codec or detect_codec(path)
+    if codec == GZIP:
+        return gzip.open(path, "rb")
+    if codec == ZSTD:
+        import zstandard
+
+        raw = open(path, "rb")
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            raw, read_size=_STREAM_BUFFER, read_across_frames=True, closefd=True
+        )
+        return io.BufferedReader(reader, _STREAM_BUFFER)
+    return open(path, "rb")
+
+
+def wrap_output(raw: BinaryIO, codec: str, level: Optional[int] = None, threads: int = 0) -> BinaryIO:
+    """
+    以串流壓縮包裝已開啟的輸出文件（關閉包裝對象時一併關閉 raw）
+
+    Args:
+        raw: 可寫入的二進位文件對象
+        codec: "none"、"gzip" 或 "zstd"
+        level: 壓縮級別，None 表示 DEFAULT_LEVELS
+        threads: zstd 壓縮線程數（0 表示單線程，-1 表示 CPU 核心數）；gzip 忽略
+    """
+    validate_codec(codec, level)
+    if codec == NONE:
+        return raw
+    level = level or DEFAULT_LEVELS[codec]
+    if codec == GZIP:
+        return _ClosingGzipFile(raw, level)
+
+    import zstandard
+
+    compressor = zstandard.ZstdCompressor(level=level, threads=threads)
+    return compressor.stream_writer(raw, closefd=True)
+
+
+def open_output(path: str, codec: str, level: Optional[int] = None, threads: int = 0) -> BinaryIO:
+    """以串流壓縮方式開啟輸出文件（路徑不會自動加上副檔名）"""
+    return wrap_output(open(path, "wb", buffering=_STREAM_BUFFER), codec, level, threads)
+
+
+class _ClosingGzipFile(gzip.GzipFile):
+    """關閉時一併關閉底層文件的 GzipFile"""
+
+    def __init__(self, raw: BinaryIO, level: int):
+        super().__init__(filename="", mode="wb", compresslevel=level, fileobj=raw, mtime=0)
+        self._raw = raw
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._raw.close()
@@ -0,0 +1,126 @@
+"""JSON 編解碼後端 - 可插拔的快速 JSON 解析"""
+
+import json
+from typing import Any, Callable, Dict, Tuple
+
+
+# 後端優先順序（"auto" 模式依序嘗試）
+BACKEND_PRIORITY = ("orjson", "simdjson", "json")
+BACKEND_CHOICES = ("auto",) + BACKEND_PRIORITY
+
+# 所有後端的解碼錯誤（orjson.JSONDecodeError、UnicodeDecodeError 皆為 ValueError 子類）
+DECODE_ERRORS = (ValueError, TypeError)
+
+_BACKEND_CACHE: Dict[str, Tuple[str, Callable[[Any], Any]]] = {}
+
+
+def _load_orjson() -> Callable[[Any], Any]:
+    import orjson
+
+    # orjson 直接接受 bytes / bytearray / memoryview / str
+    return orjson.loads
+
+
+def _load_simdjson() -> Callable[[Any], Any]:
+    import simdjson
+
+    parser = simdjson.Parser()
+
+    def loads(payload: Any) -> Any:
+        if isinstance(payload, memoryview):
+            payload = payload.tobytes()
+        # 轉為純 Python 對象，避免持有 parser 內部緩衝區
+        return parser.parse(payload, recursive=True)
+
+    return loads
+
+
+def _load_json() -> Callable[[Any], Any]:
+    def loads(payload: Any) -> Any:
+        # json.loads 可直接處理 UTF-8 bytes，不需先 decode
+        if isinstance(payload, memoryview):
+            payload = payload.tobytes()
+        return json.loads(payload)
+
+    return loads
+
+
+_LOADERS = {
+    "orjson": _load_orjson,
+    "simdjson": _load_simdjson,
+    "json": _load_json,
+}
+
+
+def get_json_decoder(backend: str = "auto") -> Tuple[str, Callable[[Any], Any]]:
+    """
+    取得 JSON 解碼函數
+
+    Args:
+        backend: "auto", "orjson", "simdjson" 或 "json"
+                 指定的後端未安裝時會退回 stdlib json
+
+    Returns:
+        (實際使用的後端名稱, loads 函數)
+
+    Raises:
+        ValueError: 未知的後端名稱
+    """
+    if backend not in BACKEND_CHOICES:
+        raise ValueError(f"未知的 JSON 後端: {backend}")
+
+    cached = _BACKEND_CACHE.get(backend)
+    if cached is not None:
+        return cached
+
+    candidates = BACKEND_PRIORITY if backend == "auto" else (backend, "json")
+    for name in candidates:
+        try:
+            resolved = (name, _LOADERS[name]())
+        except ImportError:
+            continue
+        _BACKEND_CACHE[backend] = resolved
+        return resolved
+
+    # stdlib json 一定存在，理論上不會到這裡
+    raise RuntimeError("沒有可用的 JSON 後端")
+
+
+_ENCODER_CACHE: Dict[str, Tuple[str, Callable[[Any], bytes]]] = {}
+
+
+def _dump_json(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def get_json_encoder(backend: str = "auto") -> Tuple[str, Callable[[Any], bytes]]:
+    """
+    取得 JSON 編碼函數（輸出 UTF-8 bytes，不含換行符）
+
+    simdjson 只能解碼，"simdjson" 與未安裝 orjson 的情況皆退回 stdlib json。
+
+    Args:
+        backend: "auto", "orjson", "simdjson" 或 "json"
+
+    Returns:
+        (實際使用的後端名稱, dumps 函數)
+
+    Raises:
+        ValueError: 未知的後端名稱
+    """
+    if backend not in BACKEND_CHOICES:
+        raise ValueError(f"未知的 JSON 後端: {backend}")
+
+    cached = _ENCODER_CACHE.get(backend)
+    if cached is not None:
+        return cached
+
+    resolved = ("json", _dump_json)
+    if backend in ("auto", "orjson"):
+        try:
+            import orjson
+            resolved = ("orjson", orjson.dumps)
+        except ImportError:
+            pass
+    _ENCODER_CACHE[backend] = resolved
+    return resolved
@@ -1,31 +1,47 @@
 """日誌工具"""
 
+import atexit
 import logging
+import queue
 import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional
 from pythonjsonlogger import jsonlogger
 
 
-def setup_logger(name: str = "dataflow", level: str = "INFO"):
+# Pipeline 日誌的根 logger；DoFn 的聚合摘要寫入其子 logger，經由同一個佇列寫出
+ROOT_LOGGER = "dataflow"
+
+# Logger 名稱 -> 背景 listener（重複 setup 時先停止舊的）
+_LISTENERS: Dict[str, QueueListener] = {}
+
+
+def setup_logger(name: str = ROOT_LOGGER, level: str = "INFO", use_queue: bool = True):
     """
     設置 JSON 日誌記錄器
-    
+
+    use_queue=True 時處理線程只把記錄放入佇列，格式化與寫出由
+    背景 QueueListener 線程完成，避免 I/O 阻塞數據處理。
+
     Args:
         name: Logger 名稱
         level: 日誌級別 (DEBUG, INFO, WARNING, ERROR)
+        use_queue: 是否經由佇列在背景線程寫出
     """
-    
+
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, level))
-    
+
     # 移除現有的 handlers
+    stop_logger(name)
     logger.handlers.clear()
-    
+
     # JSON 格式 handler (標準輸出)
     json_handler = logging.StreamHandler(sys.stdout)
     formatter = jsonlogger.JsonFormatter()
     json_handler.setFormatter(formatter)
-    logger.addHandler(json_handler)
-    
+
     # 文本格式 handler (標準錯誤)
     text_handler = logging.StreamHandler(sys.stderr)
     text_formatter = logging.Formatter(
@@ -33,10 +49,171 @@ def setup_logger(name: str = "dataflow", level: str = "INFO"):
     )
     text_handler.setFormatter(text_formatter)
     text_handler.setLevel(logging.WARNING)
-    logger.addHandler(text_handler)
-    
+
+    if use_queue:
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, json_handler, text_handler, respect_handler_level=True)
+        listener.start()
+        _LISTENERS[name] = listener
+        logger.addHandler(QueueHandler(log_queue))
+    else:
+        logger.addHandler(json_handler)
+        logger.addHandler(text_handler)
+
     return logger
 
 
+def stop_logger(name: Optional[str] = None):
+    """
+    停止背景 listener 並寫出佇列中剩餘的記錄
+
+    Args:
+        name: Logger 名稱，None 表示全部
+    """
+    names = [name] if name is not None else list(_LISTENERS)
+    for key in names:
+        listener = _LISTENERS.pop(key, None)
+        if listener is not None:
+            listener.stop()
+
+
+atexit.register(stop_logger)
+
+
+class LogAggregator:
+    """
+    按原因聚合的日誌記錄
+
+    逐筆處理時只增加計數（並保留少量範例），摘要由 flush() 以固定
+    最短間隔寫出一條日誌，故障風暴時日誌量與記錄數無關。
+
+    Example:
+        log = LogAggregator(logger, "Anchor 驗證")
+        log.count("range_heart_rate", record.get("device_id"))
+        log.flush()             # 距離上次摘要不足 interval 秒時不輸出
+        log.flush(force=True)   # 立即輸出
+    """
+
+    def __init__(self,
+                 logger: logging.Logger,
+                 scope: str,
+                 interval: float = 30.0,
+                 sample_limit: int = 3,
+                 level: int = logging.WARNING):
+        """
+        Args:
+            logger: 寫出摘要的 logger
+            scope: 摘要標題（如 "Anchor 驗證"）
+            interval: 兩次摘要之間的最短秒數
+            sample_limit: 每個原因在每次摘要中保留的範例數
+            level: 摘要的日誌級別
+        """
+        self.logger = logger
+        self.scope = scope
+        self.interval = interval
+        self.sample_limit = sample_limit
+        self.level = level
+        self.counts: Dict[str, int] = {}
+        self.samples: Dict[str, List[Any]] = {}
+        self.totals: Dict[str, int] = {}
+        self._last_flush = time.monotonic()
+
+    def count(self, reason: str, example: Any = None, n: int = 1):
+        """
+        記錄一次（或 n 次）事件
+
+        Args:
+            reason: 原因（如規則名稱）
+            example: 範例（僅在未達 sample_limit 時保留）
+            n: 次數
+        """
+        counts = self.counts
+        counts[reason] = counts.get(reason, 0) + n
+        if example is not None:
+            samples = self.samples.get(reason)
+            if samples is None:
+                self.samples[reason] = [example]
+            elif len(samples) < self.sample_limit:
+                samples.append(example)
+
+    def flush(self, force: bool = False) -> bool:
+        """
+        寫出摘要並重置計數
+
+        Args:
+            force: 忽略最短間隔
+
+        Returns:
+            是否寫出了摘要
+        """
+        if not self.counts:
+            return False
+        now = time.monotonic()
+        elapsed = now - self._last_flush
+        if not force and elapsed < self.interval:
+            return False
+
+        counts, samples = self.counts, self.samples
+        self.counts, self.samples = {}, {}
+        self._last_flush = now
+        for reason, n in counts.items():
+            self.totals[reason] = self.totals.get(reason, 0) + n
+
+        if self.logger.isEnabledFor(self.level):
+            summary = ", ".join(f"{reason}={n}" for reason, n in sorted(counts.items()))
+            self.logger.log(
+                self.level,
+                f"{self.scope} 摘要（{elapsed:.0f}s）: {summary}",
+                extra={
+                    "scope": self.scope,
+                    "counts": counts,
+                    "samples": {k: [_truncate(v) for v in vs] for k, vs in samples.items()},
+                }
+            )
+        return True
+
+
+def _truncate(value: Any, limit: int = 200) -> str:
+    """範例轉換為長度受限的字符串"""
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class AggregatedLoggingMixin:
+    """
+    為 DoFn 提供聚合日誌
+
+    子類設置 LOG_SCOPE（或覆寫 log_scope），在 process 中調用
+    self.log.count(...)。每個 bundle 結束時按間隔寫出摘要，
+    teardown 時寫出剩餘計數。
+
+    摘要寫入 "dataflow.<模組>"，由 setup_logger() 在 ROOT_LOGGER 上掛載的
+    QueueHandler 轉交背景線程寫出。
+    """
+
+    LOG_SCOPE = "轉換"
+    LOG_INTERVAL = 30.0
+
+    _log_aggregator: Optional[LogAggregator] = None
+
+    @property
+    def log_scope(self) -> str:
+        return self.LOG_SCOPE
+
+    @property
+    def log(self) -> LogAggregator:
+        if self._log_aggregator is None:
+            self._log_aggregator = LogAggregator(
+                logging.getLogger(f"{ROOT_LOGGER}.{type(self).__module__}"),
+                self.log_scope,
+                interval=self.LOG_INTERVAL,
+            )
+        return self._log_aggregator
 
+    def finish_bundle(self):
+        if self._log_aggregator is not None:
+            self._log_aggregator.flush()
 
+    def teardown(self):
+        if self._log_aggregator is not None:
+            self._log_aggregator.flush(force=True)
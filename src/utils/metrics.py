@@ -0,0 +1,195 @@
+"""Beam Metrics 工具 - 各階段計數器/分佈與執行結果摘要"""
+
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from apache_beam.metrics import Metrics
+from apache_beam.metrics.metric import MetricsFilter
+
+
+# 所有扁平化 Pipeline 指標的命名空間
+NAMESPACE = "senior_care"
+
+
+class StageMetrics:
+    """
+    單一階段的 Beam Metrics
+
+    指標名稱為 "<stage>.<name>"，例如 "flatten_anchor.records_in"。
+
+    Example:
+        metrics = StageMetrics("validate_anchor")
+        start = time.perf_counter_ns()
+        metrics.records_in.inc()
+        ...
+        metrics.counter("failed.range_heart_rate").inc()
+        metrics.observe_elapsed(start)
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.records_in = Metrics.counter(NAMESPACE, f"{stage}.records_in")
+        self.records_out = Metrics.counter(NAMESPACE, f"{stage}.records_out")
+        self.processing_us = Metrics.distribution(NAMESPACE, f"{stage}.processing_us")
+        self._counters: Dict[str, Any] = {}
+        self._distributions: Dict[str, Any] = {}
+
+    def counter(self, name: str):
+        """取得（並快取）本階段的計數器"""
+        counter = self._counters.get(name)
+        if counter is None:
+            counter = self._counters[name] = Metrics.counter(NAMESPACE, f"{self.stage}.{name}")
+        return counter
+
+    def distribution(self, name: str):
+        """取得（並快取）本階段的分佈"""
+        distribution = self._distributions.get(name)
+        if distribution is None:
+            distribution = self._distributions[name] = Metrics.distribution(NAMESPACE, f"{self.stage}.{name}")
+        return distribution
+
+    def observe_elapsed(self, start_ns: int, name: Optional[str] = None):
+        """記錄自 start_ns 起經過的微秒數（預設寫入 processing_us）"""
+        elapsed_us = (time.perf_counter_ns() - start_ns) // 1000
+        (self.distribution(name) if name else self.processing_us).update(elapsed_us)
+
+
+class StageMetricsMixin:
+    """
+    為 DoFn 提供 StageMetrics
+
+    子類設置 METRICS_STAGE（或覆寫 metrics_stage），在 process 中使用 self.metrics。
+    """
+
+    METRICS_STAGE = "transform"
+
+    _stage_metrics: Optional[StageMetrics] = None
+
+    @property
+    def metrics_stage(self) -> str:
+        return self.METRICS_STAGE
+
+    @property
+    def metrics(self) -> StageMetrics:
+        if self._stage_metrics is None:
+            self._stage_metrics = StageMetrics(self.metrics_stage)
+        return self._stage_metrics
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def parse_timestamp_ms(value: Any) -> Optional[float]:
+    """ISO 8601 字符串 -> epoch 毫秒（無時區視為 UTC），無法解析時返回 None"""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        if value.endswith("Z"):
+            value = value[:-1]
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        return parsed.timestamp() * 1000
+    return (parsed - _EPOCH).total_seconds() * 1000
+
+
+def event_time_lag_ms(record: Dict[str, Any]) -> Optional[int]:
+    """
+    事件時間延遲：processing_timestamp - last_seen（毫秒）
+
+    Returns:
+        延遲毫秒數，任一時間缺失或無法解析時返回 None
+    """
+    event_ms = parse_timestamp_ms(record.get("last_seen") or record.get("timestamp"))
+    if event_ms is None:
+        return None
+    processed_ms = parse_timestamp_ms(record.get("processing_timestamp"))
+    if processed_ms is None:
+        return None
+    return int(processed_ms - event_ms)
+
+
+def summarize_metrics(result) -> List[Tuple[str, str, str]]:
+    """
+    從 PipelineResult 整理指標
+
+    同名指標在多個步驟出現時（如合併 Pipeline 中兩個分支的 enrich）會合併：
+    計數器相加，分佈合併 count / sum / min / max。
+    有 suppressed 計數器的階段另附 suppression_ratio（suppressed / records_in）。
+
+    Args:
+        result: Pipeline.run() 返回的 PipelineResult（已完成）
+
+    Returns:
+        [(階段, 指標, 數值字符串)]，按階段與指標名稱排序
+    """
+    query = result.metrics().query(MetricsFilter().with_namespace(NAMESPACE))
+    counters: Dict[str, int] = {}
+    distributions: Dict[str, List[int]] = {}
+
+    for item in query.get("counters", []):
+        value = item.committed if item.committed is not None else item.attempted
+        name = item.key.metric.name
+        counters[name] = counters.get(name, 0) + (value or 0)
+
+    for item in query.get("distributions", []):
+        value = item.committed if item.committed is not None else item.attempted
+        if value is None or not value.count:
+            continue
+        name = item.key.metric.name
+        merged = distributions.get(name)
+        if merged is None:
+            distributions[name] = [value.count, value.sum, value.min, value.max]
+        else:
+            merged[0] += value.count
+            merged[1] += value.sum
+            merged[2] = min(merged[2], value.min)
+            merged[3] = max(merged[3], value.max)
+
+    rows = []
+    for name, value in counters.items():
+        stage, _, metric = name.partition(".")
+        rows.append((stage, metric, f"{value}"))
+        # 變更抑制階段附加抑制比例（suppressed / records_in）
+        if metric == "suppressed":
+            records_in = counters.get(f"{stage}.records_in")
+            if records_in:
+                rows.append((stage, "suppression_ratio", f"{value / records_in:.3f}"))
+    for name, (count, total, low, high) in distributions.items():
+        stage, _, metric = name.partition(".")
+        rows.append((stage, metric, f"n={count} mean={total / count:.1f} min={low} max={high}"))
+
+    return sorted(rows)
+
+
+def format_metrics_table(result, elapsed_seconds: Optional[float] = None) -> str:
+    """
+    將指標格式化為文字表格
+
+    Args:
+        result: PipelineResult
+        elapsed_seconds: Pipeline 執行秒數（提供時附加每個階段的記錄與位元組吞吐量）
+
+    Returns:
+        表格字符串
+    """
+    rows = summarize_metrics(result)
+    if elapsed_seconds:
+        for stage, name, value in list(rows):
+            if name == "records_out":
+                rows.append((stage, "records_per_sec", f"{int(value) / elapsed_seconds:.1f}"))
+            elif name == "bytes":
+                rows.append((stage, "bytes_per_sec", f"{int(value) / elapsed_seconds:.1f}"))
+        rows.sort()
+
+    if not rows:
+        return "(沒有指標)"
+
+    headers = ("stage", "metric", "value")
+    widths = [max(len(h), *(len(r[i]) for r in rows)) for i, h in enumerate(headers)]
+    line = "  ".join("-" * w for w in widths)
+    lines = ["  ".join(h.ljust(w) for h, w in zip(headers, widths)), line]
+    lines.extend("  ".join(c.ljust(w) for c, w in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
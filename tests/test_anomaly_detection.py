@@ -0,0 +1,111 @@
+"""生命體徵異常偵測測試"""
+
+import glob
+import os
+import statistics
+import tempfile
+import unittest
+from src.pipelines.anchor_flattening import AnchorFlatteningPipeline
+from src.pipelines.common import OutputOptions
+from src.transforms.anomaly_detection import (
+    DetectVitalAnomaliesFn, VitalThreshold, make_thresholds, update_baseline,
+)
+
+
+class _State:
+    """ReadModifyWriteState 的替身"""
+
+    def __init__(self):
+        self.value = None
+
+    def read(self):
+        return self.value
+
+    def write(self, value):
+        self.value = value
+
+
+def _record(minute, heart_rate, temperature=36.5):
+    return {
+        "device_id": "anchor_001",
+        "timestamp": f"2025-11-17T{14 + minute // 60:02d}:{minute % 60:02d}:00Z",
+        "heart_rate": heart_rate,
+        "temperature": temperature,
+    }
+
+
+class TestAnomalyDetection(unittest.TestCase):
+    """DetectVitalAnomalies 測試"""
+
+    def setUp(self):
+        self.fn = DetectVitalAnomaliesFn("anchor", alpha=0.1, min_samples=5)
+        self.state = _State()
+
+    def _process(self, record):
+        return list(self.fn.process((record["device_id"], record), baseline=self.state))
+
+    def test_baseline_matches_population_stats_during_warmup(self):
+        """測試前 1/alpha 筆的基線等同總體均值 / 方差"""
+        values = [70, 72, 68, 75, 71]
+        slots = [0, 0.0, 0.0, None, None]
+        for value in values:
+            update_baseline(slots, value, alpha=0.1)
+        self.assertEqual(slots[0], 5)
+        self.assertAlmostEqual(slots[1], statistics.mean(values))
+        self.assertAlmostEqual(slots[2], statistics.pvariance(values))
+
+    def test_alerts_on_z_score_and_rate_of_change(self):
+        """測試範圍內但偏離個人基線的讀數告警，平穩讀數不告警，狀態大小固定"""
+        for minute, heart_rate in enumerate([70, 72, 71, 69, 70, 71, 70]):
+            self.assertEqual(self._process(_record(minute, heart_rate)), [])
+
+        # 10 分鐘內緩慢升到 95：每分鐘變化未超過閾值，但相對基線的 z-score 超過
+        alerts = self._process(_record(17, 95))
+        self.assertEqual([a["reasons"] for a in alerts], [["z_score"]])
+        self.assertEqual(alerts[0]["field"], "heart_rate")
+        self.assertEqual(alerts[0]["device_id"], "anchor_001")
+        self.assertGreater(alerts[0]["z_score"], 4)
+
+        # 體溫 1 分鐘內上升 1 度：變化率告警
+        alerts = self._process(_record(18, 95, temperature=37.5))
+        self.assertIn("rate_of_change", next(a for a in alerts if a["field"] == "temperature")["reasons"])
+        self.assertAlmostEqual(
+            next(a for a in alerts if a["field"] == "temperature")["rate_per_minute"], 1.0
+        )
+
+        for minute in range(19, 200):
+            self._process(_record(minute, 70 + minute % 3))
+        self.assertEqual(sorted(self.state.value), ["heart_rate", "temperature"])
+        self.assertTrue(all(len(slots) == 5 for slots in self.state.value.values()))
+
+    def test_stale_readings_are_ignored(self):
+        """測試事件時間早於上一筆的讀數不判斷也不更新基線"""
+        self._process(_record(10, 70))
+        before = repr(self.state.value)
+        self.assertEqual(self._process(_record(5, 150)), [])
+        self.assertEqual(repr(self.state.value), before)
+
+    def test_make_thresholds_merges_defaults(self):
+        """測試配置只覆寫部分鍵時沿用預設值，新字段缺少鍵時報錯"""
+        thresholds = make_thresholds({"heart_rate": {"z_score": 3}})
+        self.assertEqual(thresholds["heart_rate"].z_score, 3.0)
+        self.assertEqual(thresholds["heart_rate"].max_rate_per_minute, 30.0)
+        self.assertNotIn("temperature", thresholds)
+        self.assertIsInstance(make_thresholds()["temperature"], VitalThreshold)
+        with self.assertRaises(ValueError):
+            make_thresholds({"humidity": {"z_score": 3}})
+
+    def test_pipeline_writes_alert_output(self):
+        """測試 Anchor Pipeline 提供 output_alerts 時寫出告警文件（每個設備只有一筆，不告警）"""
+        with tempfile.TemporaryDirectory() as tmp:
+            prefix = os.path.join(tmp, "alerts")
+            AnchorFlatteningPipeline().run(
+                input_path="test_data/anchors.json", outputs=OutputOptions(output_alerts=prefix)
+            )
+            paths = glob.glob(f"{prefix}*")
+            self.assertTrue(paths)
+            self.assertEqual(sum(os.path.getsize(path) for path in paths), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
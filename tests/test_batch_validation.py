@@ -0,0 +1,81 @@
+"""批量驗證測試"""
+
+import unittest
+from src.transforms.batch_validation import BatchValidator, BatchValidateTransform
+from src.transforms.validation_transform import ValidateAnchorTransform
+from src.transforms.validation_rules import ValidationCode
+
+
+class TestBatchValidator(unittest.TestCase):
+    """向量化驗證測試"""
+
+    def setUp(self):
+        """測試前置"""
+        self.records = [
+            {"device_id": "anchor_001", "device_type": "anchor", "heart_rate": 72, "temperature": 36.5, "rssi": -52},
+            {"device_id": "anchor_002", "device_type": "anchor", "heart_rate": 250, "battery_voltage": 1.5},
+            {"device_id": "", "device_type": "anchor", "rssi": "strong"},
+            {"device_id": "anchor_004", "device_type": "anchor", "temperature": None, "position_x": 1.0},
+        ]
+
+    def test_codes(self):
+        """測試每筆記錄的錯誤位元碼"""
+        codes = BatchValidator("anchor").validate_batch(self.records).tolist()
+        self.assertEqual(codes[0], 0)
+        self.assertEqual(codes[1], ValidationCode.RANGE_HEART_RATE | ValidationCode.RANGE_BATTERY_VOLTAGE)
+        self.assertEqual(codes[2], ValidationCode.MISSING_DEVICE_ID | ValidationCode.TYPE_RSSI)
+        self.assertEqual(codes[3], 0)
+
+    def test_codes_match_record_validation(self):
+        """測試位元碼與逐筆驗證一致（含短路：型別錯誤不再檢查值域）"""
+        records = self.records + [
+            {"device_id": "anchor_005", "device_type": "anchor", "heart_rate": "fast"},
+            {"device_id": 0, "device_type": None, "temperature": 50, "rssi": 0},
+        ]
+        validator = BatchValidator("anchor")
+        rule_set = ValidateAnchorTransform().rule_set
+        codes = validator.validate_batch(records).tolist()
+        self.assertEqual(codes, [rule_set.check(r) for r in records])
+        self.assertEqual(codes[4], ValidationCode.TYPE_HEART_RATE)
+
+    def test_non_finite_values_match_record_validation(self):
+        """測試 NaN / ±inf（stdlib json 可解析）在兩種模式下同樣判為超出範圍"""
+        records = [
+            {"device_id": f"anchor_{i}", "device_type": "anchor", "heart_rate": value, "temperature": 36.5}
+            for i, value in enumerate((float("nan"), float("inf"), float("-inf"), 72))
+        ]
+        codes = BatchValidator("anchor").validate_batch(records).tolist()
+        self.assertEqual(codes, [ValidateAnchorTransform().rule_set.check(r) for r in records])
+        self.assertEqual(codes[0], ValidationCode.RANGE_HEART_RATE)
+        self.assertEqual(codes[3], 0)
+
+    def test_messages_match_record_validation(self):
+        """測試訊息與逐筆驗證一致"""
+        validator = BatchValidator("anchor")
+        codes = validator.validate_batch(self.records).tolist()
+        per_record = ValidateAnchorTransform()
+        for record, code in zip(self.records[:2], codes[:2]):
+            self.assertEqual(validator.describe(code, record), per_record.validate(record))
+
+    def test_gateway_ignores_vital_signs(self):
+        """測試 Gateway 規則不檢查生命體徵"""
+        codes = BatchValidator("gateway").validate_batch([
+            {"device_id": "gw_001", "device_type": "gateway", "heart_rate": 250, "rssi": 10},
+        ]).tolist()
+        self.assertEqual(codes, [int(ValidationCode.RANGE_RSSI)])
+
+    def test_transform(self):
+        """測試批量驗證 DoFn 只寫入錯誤碼，訊息在錯誤輸出時生成"""
+        dofn = BatchValidateTransform("anchor")
+        dofn.setup()
+        outputs = list(dofn.process(self.records))
+        self.assertTrue(outputs[0]["is_valid"])
+        self.assertEqual(outputs[0]["validation_code"], 0)
+        self.assertFalse(outputs[1]["is_valid"])
+        self.assertNotIn("validation_errors", outputs[1])
+        annotated = dofn._validator.rule_set.annotate(outputs[1])
+        self.assertEqual(annotated["validation_errors"], ["電壓超出範圍: 1.5", "心率異常: 250"])
+
+
+if __name__ == "__main__":
+    unittest.main()
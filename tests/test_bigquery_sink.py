@@ -0,0 +1,107 @@
+"""BigQuery 批量載入測試（本地文件系統替身）"""
+
+import glob
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+import apache_beam as beam
+from apache_beam.testing.test_pipeline import TestPipeline
+from src.transforms.bigquery_sink import (
+    LocalLoader, StagedFile, WriteToBigQueryBatch, plan_load_jobs, staging_table, table_options,
+)
+
+
+TABLE = "my-project:analytics.anchor_events"
+
+
+def _record(i, **fields):
+    record = {
+        "device_id": f"anchor_{i:03d}",
+        "device_type": "anchor",
+        "gateway_id": "gw_001",
+        "timestamp": "2025-11-17T14:30:00Z",
+        "heart_rate": 72,
+        "is_valid": True,
+    }
+    record.update(fields)
+    return record
+
+
+class TestBigQuerySink(unittest.TestCase):
+    """暫存文件、load job 規劃與本地載入測試"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_table_options_partition_and_cluster(self):
+        """測試按 timestamp 日分區，分群欄位只取表中存在的欄位"""
+        self.assertEqual(table_options("anchor")["timePartitioning"], {"type": "DAY", "field": "timestamp"})
+        self.assertEqual(table_options("anchor")["clustering"]["fields"], ["device_id", "gateway_id"])
+        self.assertEqual(table_options("gateway")["clustering"]["fields"], ["device_id"])
+
+    def test_plan_load_jobs_respects_limits(self):
+        """測試按文件數與位元組上限分組，空文件略過，job_id 穩定"""
+        files = [StagedFile(f"/tmp/stage/{i}.parquet", 10, 100) for i in range(5)]
+        files.append(StagedFile("/tmp/stage/empty.parquet", 0, 10))
+        jobs = plan_load_jobs(files, TABLE, "anchor", "run1", max_files_per_job=2, max_bytes_per_job=10_000)
+        self.assertEqual([len(job.source_uris) for job in jobs], [2, 2, 1])
+        self.assertEqual([job.job_id for job in jobs], ["run1_anchor_00000", "run1_anchor_00001", "run1_anchor_00002"])
+        self.assertEqual(sum(job.rows for job in jobs), 50)
+        self.assertEqual(jobs[0].clustering_fields, ["device_id", "gateway_id"])
+
+        by_bytes = plan_load_jobs(files, TABLE, "anchor", "run1", max_bytes_per_job=250)
+        self.assertEqual([len(job.source_uris) for job in by_bytes], [2, 2, 1])
+        self.assertEqual(plan_load_jobs(reversed(files), TABLE, "anchor", "run1", max_files_per_job=2), jobs)
+
+    def test_staging_table_timestamps(self):
+        """測試時間欄位轉為 UTC timestamp，無時區視為 UTC，無法解析為 null"""
+        table = staging_table([
+            _record(1),
+            _record(2, timestamp="2025-11-17T22:30:00+08:00"),
+            _record(3, timestamp="2025-11-17T14:30:00"),
+            _record(4, timestamp="not a time"),
+        ], "anchor")
+        expected = datetime(2025, 11, 17, 14, 30, tzinfo=timezone.utc)
+        self.assertEqual(str(table.schema.field("timestamp").type), "timestamp[us, tz=UTC]")
+        self.assertEqual(table.column("timestamp").to_pylist(), [expected, expected, expected, None])
+        self.assertEqual(table.column("heart_rate").to_pylist()[0], 72.0)
+
+    def test_pipeline_stages_and_loads(self):
+        """測試 Pipeline 暫存 Parquet、執行 load job 並刪除暫存文件；重跑同一 job 不重複載入"""
+        loader = LocalLoader(os.path.join(self.tmp.name, "bigquery"))
+        temp_location = os.path.join(self.tmp.name, "temp")
+        records = [_record(i) for i in range(25)]
+        for _ in range(2):
+            with TestPipeline() as p:
+                (
+                    p
+                    | beam.Create(records)
+                    | WriteToBigQueryBatch(TABLE, "anchor", temp_location, loader=loader,
+                                           rows_per_file=10, job_prefix="backfill")
+                )
+
+        jobs = loader.jobs(TABLE)
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs[0]["output_rows"], 25)
+        self.assertEqual(jobs[0]["time_partitioning"]["field"], "timestamp")
+        table = loader.read_table(TABLE)
+        self.assertEqual(sorted(table.column("device_id").to_pylist()), [r["device_id"] for r in records])
+        self.assertEqual(glob.glob(os.path.join(temp_location, "**", "*.parquet"), recursive=True), [])
+
+    def test_local_loader_rejects_null_required(self):
+        """測試 REQUIRED 欄位含 null 時載入失敗"""
+        loader = LocalLoader(os.path.join(self.tmp.name, "bigquery"))
+        with self.assertRaises(Exception):
+            with TestPipeline() as p:
+                (
+                    p
+                    | beam.Create([_record(1, device_id=None)])
+                    | WriteToBigQueryBatch(TABLE, "anchor", os.path.join(self.tmp.name, "temp"), loader=loader)
+                )
+        self.assertEqual(loader.jobs(TABLE), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
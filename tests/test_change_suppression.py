@@ -0,0 +1,100 @@
+"""變更抑制測試"""
+
+import glob
+import json
+import os
+import tempfile
+import unittest
+import apache_beam as beam
+from apache_beam.testing.test_pipeline import TestPipeline
+from apache_beam.testing.util import assert_that, equal_to
+from src.pipelines.anchor_flattening import AnchorFlatteningPipeline
+from src.pipelines.common import OutputOptions
+from src.transforms.change_suppression import SuppressUnchanged, changed_fields
+from src.utils.metrics import summarize_metrics
+
+
+DEADBANDS = {"rssi": 3, "temperature": 0.1, "status": 0}
+
+
+def _record(minute, second=0, **fields):
+    record = {
+        "device_id": "anchor_001",
+        "device_type": "anchor",
+        "last_seen": f"2025-11-17T14:{minute:02d}:{second:02d}Z",
+        "rssi": -52,
+        "temperature": 36.5,
+        "status": "online",
+    }
+    record.update(fields)
+    return record
+
+
+class TestChangeSuppression(unittest.TestCase):
+    """SuppressUnchanged 測試"""
+
+    def test_changed_fields_deadband(self):
+        """測試死區內不算變更、非數值字段任何變化都算、與 None 之間的變化算"""
+        previous = {"rssi": -52, "temperature": 36.5, "status": "online"}
+        self.assertEqual(changed_fields(previous, _record(0, rssi=-54, temperature=36.55), DEADBANDS), [])
+        self.assertEqual(changed_fields(previous, _record(0, rssi=-56), DEADBANDS), ["rssi"])
+        self.assertEqual(changed_fields(previous, _record(0, temperature=36.7), DEADBANDS), ["temperature"])
+        self.assertEqual(changed_fields(previous, _record(0, status="offline"), DEADBANDS), ["status"])
+        self.assertEqual(changed_fields(previous, _record(0, rssi=None), DEADBANDS), ["rssi"])
+
+    def test_forwards_changes_heartbeats_and_final_state(self):
+        """測試轉發第一筆、超出死區的變更、靜默過久的心跳；過期記錄丟棄；結束時補上被抑制的最新記錄"""
+        records = [
+            _record(0),
+            _record(0, 30, rssi=-53),
+            _record(1, status="offline"),
+            _record(0, 45, status="online"),       # 過期
+            _record(1, 30, status="offline"),
+            _record(7, status="offline"),          # 距上次轉發超過 5 分鐘
+            _record(7, 30, status="offline", rssi=-51),
+            {"device_type": "anchor", "status": "online"},
+        ]
+        with TestPipeline() as p:
+            result = (
+                p
+                | beam.Create(records)
+                | SuppressUnchanged("anchor", DEADBANDS, max_silence_seconds=300)
+                | beam.Map(lambda r: (r.get("last_seen"), r.get("status"), r.get("rssi")))
+            )
+            assert_that(result, equal_to([
+                ("2025-11-17T14:00:00Z", "online", -52),
+                ("2025-11-17T14:01:00Z", "offline", -52),
+                ("2025-11-17T14:07:00Z", "offline", -52),
+                ("2025-11-17T14:07:30Z", "offline", -51),
+                (None, "online", None),
+            ]))
+
+    def test_pipeline_reports_suppression_ratio(self):
+        """測試 Pipeline 啟用變更抑制後輸出減少，並回報抑制比例"""
+        with tempfile.TemporaryDirectory() as tmp:
+            input_path = os.path.join(tmp, "anchors.ndjson")
+            with open("test_data/anchors.json") as f:
+                template = json.loads(f.readline())
+            with open(input_path, "w") as f:
+                for i in range(10):
+                    template["lastSeen"] = f"2025-11-17T14:30:{i * 5:02d}Z"
+                    template["cloudData"]["pub"]["msg"]["data"]["rssi"] = -52 - i % 2
+                    f.write(json.dumps(template) + "\n")
+
+            output = os.path.join(tmp, "out")
+            result = AnchorFlatteningPipeline().run(
+                input_path=input_path, outputs=OutputOptions(output_file=output, suppress_unchanged=True)
+            )
+            lines = []
+            for path in glob.glob(f"{output}*"):
+                with open(path) as f:
+                    lines.extend(json.loads(line) for line in f)
+
+        self.assertEqual(len(lines), 2)
+        metrics = {(stage, name): value for stage, name, value in summarize_metrics(result)}
+        self.assertEqual(metrics[("suppress_anchor", "suppressed")], "9")
+        self.assertEqual(metrics[("suppress_anchor", "suppression_ratio")], "0.900")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""合併 Pipeline 測試"""
+
+import glob
+import json
+import os
+import tempfile
+import unittest
+from src.config import Config
+from src.pipelines.combined_flattening import CombinedFlatteningPipeline
+from src.pipelines.common import OutputOptions
+
+
+class TestCombinedFlatteningPipeline(unittest.TestCase):
+    """Gateway + Anchor 單一 Pipeline 測試"""
+
+    def setUp(self):
+        """測試前置"""
+        self.config = Config(
+            project_id="test-project",
+            gateway_pubsub_topic="projects/test/topics/gateway",
+            anchor_pubsub_topic="projects/test/topics/anchor",
+        )
+        self.pipeline = CombinedFlatteningPipeline(self.config)
+
+    def test_sources_from_config(self):
+        """測試 Pub/Sub 主題與 BigQuery 表取自配置"""
+        self.assertEqual(self.pipeline._sources("pubsub", None), {
+            "gateway": "projects/test/topics/gateway",
+            "anchor": "projects/test/topics/anchor",
+        })
+        self.assertEqual(
+            self.pipeline.bigquery_tables()["anchor"],
+            "test-project:senior_care_analytics.anchor_events"
+        )
+        with self.assertRaises(ValueError):
+            self.pipeline._sources("file", {})
+
+    def test_run_both_files(self):
+        """測試一個 Pipeline 同時輸出兩種數據"""
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "out")
+            self.pipeline.run(
+                input_type="file",
+                input_paths={"gateway": "test_data/gateways.json", "anchor": "test_data/anchors.json"},
+                outputs=OutputOptions(output_file=output),
+            )
+            for kind, id_field in (("gateway", "gw_"), ("anchor", "anchor_")):
+                lines = []
+                for path in glob.glob(f"{output}_{kind}*"):
+                    with open(path) as f:
+                        lines.extend(json.loads(line) for line in f)
+                self.assertEqual(len(lines), 3)
+                self.assertTrue(all(r["device_type"] == kind for r in lines))
+                self.assertTrue(all(r["device_id"].startswith(id_field) for r in lines))
+
+    def test_rollups_on_anchor_branch(self):
+        """測試合併 Pipeline 與單一類型 Pipeline 一樣支持 Anchor 生命體徵彙總"""
+        with tempfile.TemporaryDirectory() as tmp:
+            prefix = os.path.join(tmp, "rollups")
+            self.pipeline.run(
+                input_type="file",
+                input_paths={"gateway": "test_data/gateways.json", "anchor": "test_data/anchors.json"},
+                outputs=OutputOptions(output_file=os.path.join(tmp, "out"), output_rollups=prefix),
+            )
+            rollups = []
+            for path in glob.glob(f"{prefix}_hour*"):
+                with open(path) as f:
+                    rollups.extend(json.loads(line) for line in f)
+        self.assertEqual(sorted(r["device_id"] for r in rollups), ["anchor_001", "anchor_002", "anchor_003"])
+
+    def test_output_options_from_config(self):
+        """測試輸出選項以 Config 為預設值，命令行值為 None 時不覆寫"""
+        self.config.redis_url = "redis://localhost:6379/0"
+        outputs = OutputOptions.from_config(self.config, output_file="/tmp/out", output_redis=None)
+        self.assertEqual(outputs.output_file, "/tmp/out")
+        self.assertEqual(outputs.output_redis, "redis://localhost:6379/0")
+        self.assertEqual(outputs.redis_ttl_seconds, self.config.redis_ttl_seconds)
+        with self.assertRaises(TypeError):
+            OutputOptions.from_config(self.config, output_table="x")
+
+
+if __name__ == "__main__":
+    unittest.main()
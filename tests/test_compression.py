@@ -0,0 +1,85 @@
+"""壓縮輸入/輸出測試"""
+
+import glob
+import gzip
+import os
+import tempfile
+import unittest
+import zstandard
+import apache_beam as beam
+from apache_beam.testing.test_pipeline import TestPipeline
+from apache_beam.testing.util import assert_that, equal_to
+from src.transforms.ndjson_sink import WriteNdjson
+from src.transforms.ndjson_source import detect_input_codec, read_file_lines
+from src.utils.compression import detect_codec, open_input, open_output, validate_codec
+
+
+LINES = [b'{"id": %d}' % i for i in range(100)]
+DATA = b"\n".join(LINES) + b"\n"
+
+
+class TestCompression(unittest.TestCase):
+    """compression 工具測試"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_detect_by_extension_and_magic(self):
+        """測試依副檔名與 magic bytes 偵測編碼"""
+        self.assertEqual(detect_codec(self._write("a.ndjson.gz", gzip.compress(DATA))), "gzip")
+        self.assertEqual(detect_codec(self._write("a.zst", zstandard.compress(DATA))), "zstd")
+        self.assertEqual(detect_codec(self._write("gz_noext", gzip.compress(DATA))), "gzip")
+        self.assertEqual(detect_codec(self._write("zst_noext", zstandard.compress(DATA))), "zstd")
+        self.assertEqual(detect_codec(self._write("plain", DATA)), "none")
+        self.assertEqual(detect_input_codec(os.path.join(self.tmp.name, "zst_*")), "zstd")
+
+    def test_multi_member_inputs(self):
+        """測試多成員 gzip 與多幀 zstd 的串流解壓"""
+        half = DATA.index(b"\n", len(DATA) // 2) + 1
+        gz = self._write("multi.gz", gzip.compress(DATA[:half]) + gzip.compress(DATA[half:]))
+        zst = self._write("multi", zstandard.compress(DATA[:half]) + zstandard.compress(DATA[half:]))
+        for path in (gz, zst):
+            with open_input(path) as f:
+                self.assertEqual(f.read(), DATA)
+
+    def test_output_roundtrip_and_levels(self):
+        """測試串流壓縮輸出與級別檢查"""
+        for codec, level in (("gzip", 1), ("zstd", 19), ("none", None)):
+            path = os.path.join(self.tmp.name, f"out_{codec}")
+            with open_output(path, codec, level) as f:
+                f.write(DATA)
+            with open_input(path) as f:
+                self.assertEqual(list(f), [line + b"\n" for line in LINES])
+
+        with self.assertRaises(ValueError):
+            validate_codec("gzip", 10)
+        with self.assertRaises(ValueError):
+            validate_codec("brotli")
+
+    def test_pipeline_read_and_write(self):
+        """測試 Pipeline 讀取無副檔名的 zstd 輸入並以 gzip 寫出"""
+        source = self._write("input", zstandard.compress(DATA))
+        prefix = os.path.join(self.tmp.name, "result")
+        with TestPipeline() as p:
+            lines = p | read_file_lines(source, "mmap")
+            assert_that(lines, equal_to(LINES))
+            _ = lines | beam.Map(lambda line: line.decode()) | WriteNdjson(prefix, "gzip", 3)
+
+        paths = glob.glob(f"{prefix}-*")
+        self.assertTrue(paths and all(path.endswith(".gz") for path in paths))
+        written = []
+        for path in paths:
+            with open_input(path) as f:
+                written.extend(line.rstrip(b"\n") for line in f)
+        self.assertEqual(sorted(written), sorted(LINES))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""緊湊 Coder 測試"""
+
+import pickle
+import unittest
+import apache_beam as beam
+from apache_beam.testing.test_pipeline import TestPipeline
+from apache_beam.testing.util import assert_that, equal_to
+from apache_beam import typehints
+from apache_beam.typehints.typehints import is_consistent_with
+from src.transforms.custom_coders import FlattenedRecordCoder, FlattenedRecordType, with_record_coder
+
+
+def _record(**fields):
+    record = {
+        "device_id": "anchor_001",
+        "device_type": "anchor",
+        "status": "online",
+        "last_seen": "2025-11-17T14:30:00Z",
+        "heart_rate": 72,
+        "rssi": -52.5,
+        "battery": 88.0,
+        "is_bound": True,
+        "signal_level": "excellent",
+        "validation_code": 0,
+        "is_valid": True,
+    }
+    record.update(fields)
+    return record
+
+
+class TestFlattenedRecordCoder(unittest.TestCase):
+    """FlattenedRecordCoder 測試"""
+
+    def test_roundtrip_preserves_values_and_types(self):
+        """測試整數、浮點數、布林、None、未知字段與字典外字符串原樣還原"""
+        coder = FlattenedRecordCoder("anchor")
+        records = [
+            _record(),
+            _record(heart_rate=72.0, rssi=-52, is_bound=False, status="rebooting"),
+            _record(battery=None, heart_rate="72", padding=[1, 2], device_name="床位 3"),
+            {"error": "缺少 device_id", "raw_data": {"x": 1}},
+            {},
+        ]
+        for record in records:
+            decoded = coder.decode(coder.encode(record))
+            self.assertEqual(decoded, record)
+            for key, value in record.items():
+                self.assertIs(type(decoded[key]), type(value), key)
+
+    def test_large_integers_fall_back(self):
+        """測試 zigzag 範圍邊界與範圍外的整數（含超出 int64）原樣還原"""
+        coder = FlattenedRecordCoder("anchor")
+        for value in (2**62 - 1, -2**62, 2**62, -2**62 - 1, 2**63 - 1, -2**63, 2**64, -2**70):
+            record = {"device_id": "a", "rssi": value}
+            self.assertEqual(coder.decode(coder.encode(record)), record, value)
+
+    def test_smaller_than_default_coder(self):
+        """測試編碼結果小於預設 Coder"""
+        record = _record()
+        compact = FlattenedRecordCoder("anchor").encode(record)
+        default = beam.coders.FastPrimitivesCoder().encode(record)
+        self.assertLess(len(compact) * 2, len(default))
+
+    def test_registered_for_record_type(self):
+        """測試類型提示對應緊湊 Coder，且與 Dict[str, Any] 相容"""
+        hint = FlattenedRecordType("gateway")
+        self.assertEqual(beam.coders.registry.get_coder(hint), FlattenedRecordCoder("gateway"))
+        self.assertTrue(is_consistent_with(hint, typehints.Dict[str, typehints.Any]))
+        coder = pickle.loads(pickle.dumps(FlattenedRecordCoder("gateway")))
+        self.assertEqual(coder.decode(coder.encode({"device_id": "gw"})), {"device_id": "gw"})
+
+    def test_pipeline_grouping_uses_coder(self):
+        """測試按 device_id 分組時值使用緊湊 Coder，記錄不變"""
+        records = [_record(device_id=f"anchor_{i % 2}", heart_rate=60 + i) for i in range(4)]
+        with TestPipeline() as p:
+            pcoll = with_record_coder(p | beam.Create(records) | beam.Map(dict), "anchor")
+            self.assertEqual(pcoll.element_type, FlattenedRecordType("anchor"))
+            keyed = pcoll | beam.Map(lambda r: (r["device_id"], r)).with_output_types(
+                typehints.Tuple[str, FlattenedRecordType("anchor")]
+            )
+            key_coder, value_coder = beam.coders.registry.get_coder(keyed.element_type).coders()
+            self.assertEqual(value_coder, FlattenedRecordCoder("anchor"))
+            grouped = keyed | beam.GroupByKey() | beam.MapTuple(lambda k, rs: (k, sorted(r["heart_rate"] for r in rs)))
+            assert_that(grouped, equal_to([("anchor_0", [60, 62]), ("anchor_1", [61, 63])]))
+
+
+if __name__ == "__main__":
+    unittest.main()
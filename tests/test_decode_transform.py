@@ -0,0 +1,79 @@
+"""JSON 解碼轉換測試"""
+
+import unittest
+from apache_beam.pvalue import TaggedOutput
+from src.transforms.decode_transform import DecodeJsonTransform
+from src.utils.json_codec import get_json_decoder
+
+
+class TestJsonCodec(unittest.TestCase):
+    """JSON 後端選擇測試"""
+
+    def test_stdlib_backend_decodes_bytes(self):
+        """測試 stdlib 後端直接解析 bytes"""
+        name, loads = get_json_decoder("json")
+        self.assertEqual(name, "json")
+        self.assertEqual(loads(b'{"a": 1}'), {"a": 1})
+        self.assertEqual(loads(memoryview(b'{"a": 2}')), {"a": 2})
+
+    def test_auto_backend_resolves(self):
+        """測試 auto 模式總能取得後端"""
+        name, loads = get_json_decoder("auto")
+        self.assertIn(name, ("orjson", "simdjson", "json"))
+        self.assertEqual(loads(b'{"gateway_id": "gw_001"}'), {"gateway_id": "gw_001"})
+
+    def test_unknown_backend(self):
+        """測試未知後端"""
+        with self.assertRaises(ValueError):
+            get_json_decoder("ujson")
+
+
+class TestDecodeJsonTransform(unittest.TestCase):
+    """JSON 解碼 DoFn 測試"""
+
+    def setUp(self):
+        """測試前置"""
+        self.dofn = DecodeJsonTransform("json")
+        self.dofn.setup()
+
+    def test_decode_batch(self):
+        """測試整批解碼，壞訊息進入 dead letter"""
+        outputs = list(self.dofn.process([
+            b'{"gateway_id": "gw_001"}',
+            b'{not json',
+            b'[1, 2]',
+            '{"anchor_id": "anchor_001"}',
+        ]))
+
+        records = [o for o in outputs if not isinstance(o, TaggedOutput)]
+        dead = [o for o in outputs if isinstance(o, TaggedOutput)]
+
+        self.assertEqual(records, [{"gateway_id": "gw_001"}, {"anchor_id": "anchor_001"}])
+        self.assertEqual(len(dead), 2)
+        for output in dead:
+            self.assertEqual(output.tag, DecodeJsonTransform.DEAD_LETTER_TAG)
+            self.assertTrue(output.value["error"])
+        self.assertEqual(dead[0].value["original_data"], "{not json")
+
+    def test_decode_single_element(self):
+        """測試單筆訊息"""
+        outputs = list(self.dofn.process(b'{"gateway_id": "gw_002"}'))
+        self.assertEqual(outputs, [{"gateway_id": "gw_002"}])
+
+    def test_invalid_utf8(self):
+        """測試非 UTF-8 訊息不會中斷批次"""
+        outputs = list(self.dofn.process([b'\xff\xfe{', b'{"a": 1}']))
+        self.assertIsInstance(outputs[0], TaggedOutput)
+        self.assertEqual(outputs[1], {"a": 1})
+
+    def test_keyed_batch(self):
+        """測試 (key, payload) 輸入保留 key，dead letter 記錄來源"""
+        dofn = DecodeJsonTransform("json", keyed=True)
+        dofn.setup()
+        outputs = list(dofn.process([("gateway", b'{"gateway_id": "gw_001"}'), ("anchor", b'{bad')]))
+        self.assertEqual(outputs[0], ("gateway", {"gateway_id": "gw_001"}))
+        self.assertEqual(outputs[1].value["source"], "anchor")
+
+
+if __name__ == "__main__":
+    unittest.main()
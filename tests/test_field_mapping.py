@@ -0,0 +1,87 @@
+"""字段映射引擎測試"""
+
+import unittest
+from types import SimpleNamespace
+from src.models.field_mapping import FieldSpec, MappingPlan
+from src.models.anchor_data import AnchorData, FlattenedAnchorData
+
+
+class TestMappingPlan(unittest.TestCase):
+    """MappingPlan 編譯與提取測試"""
+
+    def setUp(self):
+        """測試前置"""
+        self.plan = MappingPlan("test", [
+            FieldSpec("device_id", ("anchor_id",)),
+            FieldSpec("rssi", ("cloud_data.rssi", "cloud_data.pub.msg.data.rssi")),
+            FieldSpec("led_enabled", ("cloud_data.led",), coerce="int_to_bool"),
+            FieldSpec("label", ("name",), coerce=str.upper),
+            FieldSpec("position_x", ("pos.x",)),
+        ], aliases={"pos": ("position", "cloud_data.position")})
+
+    def test_fallback_and_rename(self):
+        """測試後備來源與重命名"""
+        source = SimpleNamespace(
+            anchor_id="anchor_001",
+            name="bed",
+            position=None,
+            cloud_data={"led": 1, "pub": {"msg": {"data": {"rssi": -52}}}, "position": {"x": 5.2}},
+        )
+        self.assertEqual(self.plan.extract(source), {
+            "device_id": "anchor_001",
+            "rssi": -52,
+            "led_enabled": True,
+            "label": "BED",
+            "position_x": 5.2,
+        })
+
+    def test_missing_containers(self):
+        """測試巢狀容器缺失或型別錯誤"""
+        source = SimpleNamespace(anchor_id="a", name="", position={"x": 1.0}, cloud_data="broken")
+        result = self.plan.extract(source)
+        self.assertIsNone(result["rssi"])
+        self.assertIsNone(result["led_enabled"])
+        self.assertEqual(result["position_x"], 1.0)
+
+    def test_compiled_once(self):
+        """測試只編譯一次"""
+        self.assertIs(self.plan.compile(), self.plan.compile())
+        self.assertIn("def extract_test(src):", self.plan.source_code)
+
+    def test_unknown_coercion(self):
+        """測試未知的型別轉換"""
+        plan = MappingPlan("bad", [FieldSpec("x", ("x",), coerce="nope")])
+        with self.assertRaises(ValueError):
+            plan.compile()
+
+
+class TestAnchorPlan(unittest.TestCase):
+    """Anchor 提取規則測試"""
+
+    def test_cloud_position_fallback(self):
+        """測試根層 position 缺失時使用 cloudData.position"""
+        anchor = AnchorData(
+            anchor_id="anchor_001",
+            cloud_data={"position": {"x": 1.5, "y": 2.5, "z": 0.5}, "initiator": 1},
+        )
+        flattened = FlattenedAnchorData.from_anchor_data(anchor)
+        self.assertEqual(flattened.position_x, 1.5)
+        self.assertEqual(flattened.position_z, 0.5)
+        self.assertEqual(flattened.is_initiator, True)
+        self.assertIsNone(flattened.led_enabled)
+
+    def test_falsy_values_without_nested_data(self):
+        """測試 pub.msg.data 不存在時保留頂層的假值（0 / 0.0），存在時才以 or 後備"""
+        anchor = AnchorData(anchor_id="anchor_001", cloud_data={"rssi": 0, "humidity": 0, "battery_voltage": 0.0})
+        flattened = FlattenedAnchorData.from_anchor_data(anchor)
+        self.assertEqual((flattened.rssi, flattened.humidity, flattened.battery_voltage), (0, 0, 0.0))
+
+        anchor = AnchorData(anchor_id="anchor_001", cloud_data={
+            "rssi": 0, "humidity": 0, "pub": {"msg": {"data": {"rssi": -52}}},
+        })
+        flattened = FlattenedAnchorData.from_anchor_data(anchor)
+        self.assertEqual((flattened.rssi, flattened.humidity), (-52, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""融合轉換測試"""
+
+import unittest
+from apache_beam.pvalue import TaggedOutput
+from src.transforms.fused_transform import FusedFlattenTransform
+from src.transforms.validation_rules import ValidationCode
+
+
+class TestFusedFlattenTransform(unittest.TestCase):
+    """融合 DoFn 測試"""
+
+    def setUp(self):
+        """測試前置"""
+        self.dofn = FusedFlattenTransform("anchor")
+        self.dofn.setup()
+        self.sample_anchor = {
+            "anchor_id": "anchor_001",
+            "gateway_id": "gw_001",
+            "name": "Bed Anchor",
+            "cloudData": {
+                "pub": {"msg": {"data": {
+                    "battery_voltage": 3.2, "rssi": -52, "heart_rate": 72, "temperature": 36.5
+                }}},
+                "led": 1,
+            },
+            "status": "online",
+            "lastSeen": "2025-11-17T14:30:00Z",
+        }
+
+    def test_valid_record(self):
+        """測試有效記錄走主輸出並完成增強"""
+        outputs = list(self.dofn.process(self.sample_anchor))
+        self.assertEqual(len(outputs), 1)
+        record = outputs[0]
+        self.assertNotIsInstance(record, TaggedOutput)
+        self.assertTrue(record["is_valid"])
+        self.assertEqual(record["device_id"], "anchor_001")
+        self.assertEqual(record["signal_level"], "good")
+        self.assertEqual(record["battery_level"], "medium")
+        self.assertTrue(record["led_enabled"])
+
+    def test_invalid_record(self):
+        """測試驗證失敗的記錄走 invalid 輸出"""
+        self.sample_anchor["cloudData"]["pub"]["msg"]["data"]["heart_rate"] = 250
+        outputs = list(self.dofn.process(self.sample_anchor))
+        self.assertEqual(outputs[0].tag, FusedFlattenTransform.INVALID_TAG)
+        self.assertFalse(outputs[0].value["is_valid"])
+        self.assertEqual(outputs[0].value["validation_code"], ValidationCode.RANGE_HEART_RATE)
+        self.assertNotIn("validation_errors", outputs[0].value)
+
+    def test_error_record(self):
+        """測試無法扁平化的記錄走 error 輸出"""
+        outputs = list(self.dofn.process("not json"))
+        self.assertEqual(outputs[0].tag, FusedFlattenTransform.ERROR_TAG)
+        self.assertTrue(outputs[0].value["error"])
+
+    def test_unknown_device_type(self):
+        """測試未支持的設備類型"""
+        with self.assertRaises(ValueError):
+            FusedFlattenTransform("sensor")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""合成遙測數據生成器測試"""
+
+import json
+import unittest
+from benchmarks.generate_telemetry import generate
+from src.transforms.flatten_transform import flatten_element
+from src.transforms.validation_rules import compile_rules
+
+
+class TestGenerateTelemetry(unittest.TestCase):
+    """生成器測試"""
+
+    def test_shape_flattens_and_validates(self):
+        """測試生成的訊息可被扁平化且通過驗證"""
+        for kind in ("gateway", "anchor"):
+            rules = compile_rules(kind)
+            for line in generate(kind, 50):
+                record = flatten_element(json.loads(line), kind)
+                self.assertNotIn("error", record)
+                self.assertIsNotNone(record["battery_voltage"])
+                self.assertEqual(rules.check(record), 0)
+
+    def test_deterministic(self):
+        """測試相同種子產生相同輸出"""
+        self.assertEqual(list(generate("anchor", 20, seed=7)), list(generate("anchor", 20, seed=7)))
+
+    def test_ratios_and_payload_size(self):
+        """測試格式錯誤比例、空值與訊息大小"""
+        lines = list(generate("anchor", 2000, malformed_ratio=0.1, null_ratio=1.0, payload_bytes=800))
+        malformed = 0
+        for line in lines:
+            try:
+                payload = json.loads(line)
+            except ValueError:
+                malformed += 1
+                continue
+            if not isinstance(payload, dict):
+                malformed += 1
+                continue
+            self.assertGreaterEqual(len(line), 780)
+            self.assertIsNone(payload["cloudData"]["pub"]["msg"]["data"]["heart_rate"])
+        self.assertTrue(150 < malformed < 250)
+        for device_type in ("gateway", "anchor"):
+            self.assertEqual({len(line) for line in generate(device_type, 50, payload_bytes=2048)}, {2048})
+
+    def test_devices(self):
+        """測試設備數"""
+        ids = {json.loads(line)["gateway_id"] for line in generate("gateway", 100, devices=7)}
+        self.assertEqual(len(ids), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
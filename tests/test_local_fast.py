@@ -0,0 +1,90 @@
+"""本地多進程引擎測試"""
+
+import glob
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from benchmarks.generate_telemetry import generate, write_ndjson
+from src import main
+from src.pipelines.local_fast import LocalFastEngine, plan_chunks, read_chunk_lines
+
+
+class TestLocalFastEngine(unittest.TestCase):
+    """LocalFast 引擎測試"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _read(self, pattern):
+        lines = []
+        for path in sorted(glob.glob(pattern)):
+            with open(path) as f:
+                lines.extend(json.loads(line) for line in f)
+        return lines
+
+    def test_chunks_cover_every_line_once(self):
+        """測試任意分塊大小下每行恰好被讀取一次"""
+        path = os.path.join(self.tmp.name, "anchors.ndjson")
+        expected = list(generate("anchor", 200, seed=7))
+        write_ndjson(path, expected)
+
+        for chunk_bytes in (1, 97, 500, 4096, 1 << 20):
+            chunks = plan_chunks({"anchor": path}, chunk_bytes)
+            lines = [line for chunk in chunks for batch in read_chunk_lines(chunk, 13) for line in batch]
+            self.assertEqual(lines, expected, chunk_bytes)
+
+    def test_single_and_multi_process_match(self):
+        """測試單進程與多進程輸出相同的有效/無效記錄"""
+        path = os.path.join(self.tmp.name, "anchors.ndjson")
+        write_ndjson(path, generate("anchor", 300, invalid_ratio=0.1, malformed_ratio=0.02, seed=3))
+
+        results = {}
+        for workers in (1, 2):
+            prefix = os.path.join(self.tmp.name, f"w{workers}", "out")
+            # 縮小分塊，讓多進程時真正經過 ProcessPoolExecutor（含待處理分塊上限）
+            stats = LocalFastEngine(workers=workers, min_chunk_bytes=4096).run({"anchor": path}, prefix)
+            self.assertEqual(stats.counts["records_in"], 300)
+            self.assertEqual(stats.workers, workers)
+            self.assertGreater(stats.shards, workers * 2)
+            valid = self._read(f"{prefix}_anchor-*")
+            errors = self._read(f"{prefix}_anchor_errors-*")
+            dead = self._read(f"{prefix}_dead_letter-*")
+            self.assertEqual(len(valid) + len(errors) + len(dead), 300)
+            self.assertTrue(all(r["is_valid"] for r in valid))
+            self.assertTrue(all(r["validation_errors"] for r in errors if "validation_code" in r))
+            results[workers] = sorted(r["device_id"] for r in valid)
+
+        self.assertEqual(results[1], results[2])
+
+    def test_multiple_sources(self):
+        """測試多個來源與未知來源類型"""
+        prefix = os.path.join(self.tmp.name, "out")
+        stats = LocalFastEngine(workers=1).run(
+            {"gateway": "test_data/gateways.json", "anchor": "test_data/anchors.json"}, prefix
+        )
+        self.assertEqual(stats.counts["valid.gateway"], 3)
+        self.assertEqual(stats.counts["valid.anchor"], 3)
+        self.assertEqual(len(self._read(f"{prefix}_gateway-*")), 3)
+
+        with self.assertRaises(ValueError):
+            LocalFastEngine(workers=1).run({"other": "test_data/anchors.json"}, prefix)
+
+    def test_cli_rejects_unsupported_flags(self):
+        """測試 LocalFast 不支持的參數直接報錯，而不是被忽略"""
+        argv = [
+            "main", "--runner", "LocalFast", "--pipeline", "anchor",
+            "--input-file", "test_data/anchors.json", "--output-file", os.path.join(self.tmp.name, "out"),
+            "--output-format", "parquet", "--device-registry", "/nonexistent.csv", "--suppress-unchanged",
+        ]
+        with mock.patch("sys.argv", argv), mock.patch.object(main, "_run_local_fast") as run:
+            with self.assertRaises(SystemExit) as raised:
+                main.main()
+        self.assertEqual(raised.exception.code, 1)
+        run.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""聚合日誌測試"""
+
+import logging
+import logging.handlers
+import threading
+import unittest
+from src.utils import logger as logger_module
+from src.utils.logger import LogAggregator, ROOT_LOGGER, setup_logger, stop_logger
+from src.transforms.validation_transform import ValidateAnchorTransform
+
+
+class _ListHandler(logging.Handler):
+    """收集日誌記錄"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+        self.threads = []
+
+    def emit(self, record):
+        self.records.append(record)
+        self.threads.append(threading.current_thread())
+
+
+class TestLogAggregator(unittest.TestCase):
+    """按原因聚合的日誌測試"""
+
+    def setUp(self):
+        """測試前置"""
+        self.logger = logging.getLogger("test_log_aggregator")
+        self.logger.propagate = False
+        self.handler = _ListHandler()
+        self.logger.handlers = [self.handler]
+
+    def test_rate_limited_summary(self):
+        """測試間隔內只累計，不輸出"""
+        log = LogAggregator(self.logger, "Anchor 驗證", interval=3600, sample_limit=2)
+        for i in range(1000):
+            log.count("range_heart_rate", f"anchor_{i:03d}")
+        log.count("numeric_rssi")
+
+        self.assertFalse(log.flush())
+        self.assertEqual(self.handler.records, [])
+
+        self.assertTrue(log.flush(force=True))
+        self.assertEqual(len(self.handler.records), 1)
+        record = self.handler.records[0]
+        self.assertEqual(record.counts, {"range_heart_rate": 1000, "numeric_rssi": 1})
+        self.assertEqual(record.samples, {"range_heart_rate": ["anchor_000", "anchor_001"]})
+        self.assertEqual(log.totals["range_heart_rate"], 1000)
+
+        # 已重置
+        self.assertFalse(log.flush(force=True))
+
+    def test_dofn_counts_by_rule(self):
+        """測試驗證 DoFn 按規則計數，teardown 時寫出"""
+        dofn = ValidateAnchorTransform()
+        dofn.setup()
+        dofn.log.logger = self.logger
+        for _ in range(5):
+            list(dofn.process({"device_id": "anchor_001", "device_type": "anchor", "heart_rate": 250}))
+        dofn.finish_bundle()
+        self.assertEqual(self.handler.records, [])
+        dofn.teardown()
+        self.assertEqual(self.handler.records[0].counts, {"range_heart_rate": 5})
+
+    def test_queue_listener(self):
+        """測試處理線程只掛載 QueueHandler"""
+        logger = setup_logger("test_queue_logger", "INFO")
+        self.assertIsInstance(logger.handlers[0], logging.handlers.QueueHandler)
+        stop_logger("test_queue_logger")
+
+    def test_dofn_summary_goes_through_listener(self):
+        """測試 DoFn 摘要經由 ROOT_LOGGER 的佇列，在背景線程寫出"""
+        root = logging.getLogger(ROOT_LOGGER)
+        saved = (root.level, list(root.handlers), root.propagate)
+        self.addCleanup(lambda: setattr(root, "handlers", saved[1]))
+        self.addCleanup(root.setLevel, saved[0])
+        setup_logger(ROOT_LOGGER, "INFO")
+        root.propagate = False
+        self.addCleanup(setattr, root, "propagate", saved[2])
+        logger_module._LISTENERS[ROOT_LOGGER].handlers = (self.handler,)
+
+        dofn = ValidateAnchorTransform()
+        dofn.setup()
+        list(dofn.process({"device_id": "anchor_001", "device_type": "anchor", "heart_rate": 250}))
+        dofn.teardown()
+        stop_logger(ROOT_LOGGER)
+
+        self.assertEqual(len(self.handler.records), 1)
+        self.assertEqual(self.handler.records[0].counts, {"range_heart_rate": 1})
+        self.assertTrue(self.handler.records[0].name.startswith(f"{ROOT_LOGGER}.src.transforms."))
+        self.assertIsNot(self.handler.threads[0], threading.current_thread())
+
+
+if __name__ == "__main__":
+    unittest.main()
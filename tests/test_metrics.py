@@ -0,0 +1,49 @@
+"""Beam Metrics 測試"""
+
+import unittest
+import apache_beam as beam
+from src.transforms.validation_transform import ValidateAnchorTransform
+from src.utils.metrics import event_time_lag_ms, summarize_metrics, format_metrics_table
+
+
+class TestEventTimeLag(unittest.TestCase):
+    """事件時間延遲計算測試"""
+
+    def test_lag(self):
+        """測試 processing_timestamp - last_seen"""
+        record = {"last_seen": "2025-11-17T14:30:00Z", "processing_timestamp": "2025-11-17T14:30:02.500000Z"}
+        self.assertEqual(event_time_lag_ms(record), 2500)
+
+    def test_missing_or_invalid(self):
+        """測試時間缺失或無法解析"""
+        self.assertIsNone(event_time_lag_ms({"processing_timestamp": "2025-11-17T14:30:00Z"}))
+        self.assertIsNone(event_time_lag_ms({"last_seen": "yesterday", "processing_timestamp": "2025-11-17T14:30:00Z"}))
+
+
+class TestPipelineMetrics(unittest.TestCase):
+    """DoFn 指標與摘要表測試"""
+
+    def test_validation_metrics(self):
+        """測試驗證階段按規則計數"""
+        records = [
+            {"device_id": "anchor_001", "device_type": "anchor", "heart_rate": 72},
+            {"device_id": "anchor_002", "device_type": "anchor", "heart_rate": 250},
+            {"device_id": "", "device_type": "anchor", "heart_rate": 300},
+        ]
+        pipeline = beam.Pipeline()
+        _ = pipeline | beam.Create(records) | beam.ParDo(ValidateAnchorTransform())
+        result = pipeline.run()
+        result.wait_until_finish()
+
+        rows = {(stage, name): value for stage, name, value in summarize_metrics(result)}
+        self.assertEqual(rows[("validate_anchor", "records_in")], "3")
+        self.assertEqual(rows[("validate_anchor", "valid")], "1")
+        self.assertEqual(rows[("validate_anchor", "invalid")], "2")
+        self.assertEqual(rows[("validate_anchor", "failed.range_heart_rate")], "2")
+        self.assertEqual(rows[("validate_anchor", "failed.required_device_id")], "1")
+        self.assertTrue(rows[("validate_anchor", "processing_us")].startswith("n=3"))
+        self.assertIn("records_per_sec", format_metrics_table(result, elapsed_seconds=1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
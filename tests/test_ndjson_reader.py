@@ -0,0 +1,107 @@
+"""記憶體映射 NDJSON 讀取器與 Beam Source 測試"""
+
+import os
+import tempfile
+import unittest
+from apache_beam.io import source_test_utils
+from apache_beam.testing.test_pipeline import TestPipeline
+from apache_beam.testing.util import assert_that, equal_to
+from src.transforms.ndjson_source import NdjsonSource, ReadNdjson, read_file_lines
+from src.utils.ndjson_reader import MmapNdjsonReader
+
+
+LINES = [b'{"id": %d, "name": "device_%d"}' % (i, i) for i in range(50)]
+
+
+class TestMmapNdjsonReader(unittest.TestCase):
+    """MmapNdjsonReader 測試"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = self._write("data.ndjson", b"\n".join(LINES) + b"\n")
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_split_aligned_to_lines(self):
+        """測試切分範圍對齊行邊界且覆蓋全部行"""
+        with MmapNdjsonReader(self.path) as reader:
+            for desired in (1, 40, 333, 1 << 20):
+                ranges = reader.split(desired)
+                self.assertEqual(ranges[0][0], 0)
+                self.assertEqual(ranges[-1][1], reader.size)
+                lines = [bytes(line) for start, end in ranges for _, line in reader.iter_lines(start, end)]
+                self.assertEqual(lines, LINES)
+            self.assertGreater(reader.bytes_read, 0)
+            self.assertGreater(reader.bytes_per_sec, 0)
+
+    def test_unaligned_ranges(self):
+        """測試未對齊的位元組範圍拼接後每行恰好出現一次"""
+        with MmapNdjsonReader(self.path) as reader:
+            bounds = list(range(0, reader.size, 77)) + [reader.size]
+            lines = [
+                line.tobytes()
+                for start, end in zip(bounds, bounds[1:])
+                for batch in reader.iter_batches(start, end, 7)
+                for line in batch
+            ]
+        self.assertEqual(lines, LINES)
+
+    def test_blank_lines_crlf_and_empty_file(self):
+        """測試空行略過、CRLF 與空文件"""
+        path = self._write("crlf.ndjson", b'{"a": 1}\r\n\r\n   \n{"a": 2}')
+        with MmapNdjsonReader(path) as reader:
+            self.assertEqual([bytes(line) for _, line in reader.iter_lines()], [b'{"a": 1}', b'{"a": 2}'])
+
+        path = self._write("empty.ndjson", b"")
+        with MmapNdjsonReader(path) as reader:
+            self.assertEqual(list(reader.iter_lines()), [])
+            self.assertEqual(reader.split(10), [])
+
+
+class TestNdjsonSource(unittest.TestCase):
+    """NdjsonSource / ReadNdjson 測試"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "part-0.ndjson")
+        with open(self.path, "wb") as f:
+            f.write(b"\n".join(LINES[:30]) + b"\n")
+        with open(os.path.join(self.tmp.name, "part-1.ndjson"), "wb") as f:
+            f.write(b"\n".join(LINES[30:]))
+
+    def test_splits_equal_whole_source(self):
+        """測試分割後讀取結果與整個文件相同"""
+        source = NdjsonSource(self.path)
+        splits = [(s.source, s.start_position, s.stop_position) for s in source.split(100)]
+        self.assertGreater(len(splits), 1)
+        source_test_utils.assert_sources_equal_reference_source((source, None, None), splits)
+        source_test_utils.assert_split_at_fraction_exhaustive(source, perform_multi_threaded_test=False)
+
+    def test_read_glob_in_pipeline(self):
+        """測試在 Pipeline 中以 glob 讀取多個文件"""
+        with TestPipeline() as p:
+            lines = p | ReadNdjson(os.path.join(self.tmp.name, "part-*.ndjson"))
+            assert_that(lines, equal_to(LINES))
+
+        with self.assertRaises(ValueError):
+            read_file_lines(self.path, "unknown")
+
+    def test_readers_skip_blank_lines(self):
+        """測試 text 與 mmap 讀取方式都略過空行 / 只含空白的行"""
+        path = os.path.join(self.tmp.name, "blank.ndjson")
+        with open(path, "wb") as f:
+            f.write(LINES[0] + b"\n\n   \r\n" + LINES[1] + b"\n\t\n")
+        for reader in ("text", "mmap"):
+            with TestPipeline() as p:
+                lines = p | read_file_lines(path, reader)
+                assert_that(lines, equal_to(LINES[:2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""Parquet 輸出測試"""
+
+import glob
+import os
+import tempfile
+import unittest
+import apache_beam as beam
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+from src.models.schema import record_columns
+from src.pipelines.anchor_flattening import AnchorFlatteningPipeline
+from src.pipelines.common import OutputOptions
+from src.transforms.parquet_sink import (
+    ParquetPartitionWriter, WriteParquet, arrow_schema, partition_path, records_to_table,
+)
+
+
+def _record(i, day="17", **fields):
+    record = {
+        "device_id": f"anchor_{i:03d}",
+        "device_type": "anchor",
+        "status": "online",
+        "last_seen": f"2025-11-{day}T14:30:00Z",
+        "heart_rate": 72,
+        "rssi": -52.0,
+        "is_bound": 1,
+        "is_valid": True,
+        "validation_code": 0,
+    }
+    record.update(fields)
+    return record
+
+
+class TestParquetSink(unittest.TestCase):
+    """Parquet 分區寫入測試"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_schema_from_dataclass(self):
+        """測試 schema 由數據類推導並附加增強字段"""
+        names = [c.name for c in record_columns("gateway")]
+        self.assertEqual(names[:3], ["device_id", "device_type", "device_name"])
+        self.assertIn("ip_address", names)
+        self.assertEqual(names[-8:], [
+            "signal_level", "battery_level", "validation_code", "is_valid",
+            "facility_id", "room_id", "resident_id", "extra_data",
+        ])
+        schema = arrow_schema("anchor")
+        self.assertFalse(schema.field("device_id").nullable)
+        self.assertEqual(str(schema.field("rssi").type), "int64")
+        with self.assertRaises(ValueError):
+            record_columns("sensor")
+
+    def test_records_to_table_coerces_and_keeps_extra(self):
+        """測試類型轉換與未知字段存入 extra_data"""
+        table = records_to_table(
+            [_record(1, padding="xx")], record_columns("anchor"), arrow_schema("anchor")
+        )
+        row = table.to_pylist()[0]
+        self.assertEqual(row["rssi"], -52)
+        self.assertEqual(row["heart_rate"], 72.0)
+        self.assertIs(row["is_bound"], True)
+        self.assertEqual(row["extra_data"], '{"padding": "xx"}')
+
+    def test_coerce_bool_and_out_of_range_int(self):
+        """測試整數欄位中的 bool 轉為 0 / 1，超出 int64 的值為 null，寫出不會失敗"""
+        writer = ParquetPartitionWriter(self.tmp.name, "anchor", row_group_size=10)
+        writer.write(_record(1, rssi=False))
+        writer.write(_record(2, rssi=2**64))
+        paths = writer.close()
+        rows = pq.read_table(paths[0]).to_pylist()
+        self.assertEqual(sorted(row["rssi"] for row in rows if row["rssi"] is not None), [0])
+        self.assertEqual(sum(row["rssi"] is None for row in rows), 1)
+
+    def test_partitions_and_row_groups(self):
+        """測試按日期分區與 row group 大小"""
+        self.assertEqual(partition_path({"last_seen": "bad"}, "anchor"), "device_type=anchor/date=unknown")
+
+        writer = ParquetPartitionWriter(self.tmp.name, "anchor", row_group_size=10, compression="zstd")
+        for i in range(25):
+            writer.write(_record(i))
+        writer.write(_record(99, day="18"))
+        paths = writer.close()
+
+        self.assertEqual(len(paths), 2)
+        self.assertFalse(glob.glob(os.path.join(self.tmp.name, "**", ".tmp-*"), recursive=True))
+        day17 = next(p for p in paths if "date=2025-11-17" in p)
+        metadata = pq.read_metadata(day17)
+        self.assertEqual((metadata.num_rows, metadata.num_row_groups), (25, 3))
+        self.assertEqual(writer.rows_written, 26)
+
+    def test_write_parquet_groups_and_rerun_overwrites(self):
+        """測試按分區分組寫出（row group 不受 bundle 限制），重跑時覆寫同名文件而非重複"""
+        records = [_record(i) for i in range(25)] + [_record(99, day="18")]
+
+        def run():
+            with beam.Pipeline() as p:
+                (p | beam.Create(records) | WriteParquet(self.tmp.name, "anchor", row_group_size=10, num_shards=1))
+            return sorted(glob.glob(os.path.join(self.tmp.name, "**", "*"), recursive=True))
+
+        first = run()
+        self.assertEqual(run(), first)
+        files = [p for p in first if p.endswith(".parquet")]
+        self.assertEqual(len(files), 2)
+        self.assertFalse([p for p in first if ".tmp-" in p])
+        day17 = next(p for p in files if "date=2025-11-17" in p)
+        self.assertTrue(day17.endswith("part-00000-of-00001.parquet"))
+        metadata = pq.read_metadata(day17)
+        self.assertEqual((metadata.num_rows, metadata.num_row_groups), (25, 3))
+
+    def test_pipeline_parquet_output(self):
+        """測試 Pipeline 以 Parquet 輸出有效數據"""
+        root = os.path.join(self.tmp.name, "dataset")
+        AnchorFlatteningPipeline().run(
+            input_type="file",
+            input_path="test_data/anchors.json",
+            outputs=OutputOptions(output_file=root, output_format="parquet"),
+        )
+        table = pads.dataset(root, format="parquet", partitioning="hive").to_table()
+        self.assertEqual(sorted(table.column("device_id").to_pylist()), ["anchor_001", "anchor_002", "anchor_003"])
+
+
+if __name__ == "__main__":
+    unittest.main()
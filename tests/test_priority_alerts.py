@@ -0,0 +1,108 @@
+"""高優先級告警通道測試"""
+
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from src.pipelines.anchor_flattening import AnchorFlatteningPipeline
+from src.pipelines.common import OutputOptions
+from src.transforms.priority_alerts import AlertPublisherFactory, compact_alert
+from src.utils.metrics import summarize_metrics
+
+
+class _LineServer:
+    """收集 NDJSON 行的本地 TCP 服務（告警輸出的替身）"""
+
+    def __init__(self):
+        self.lines = []
+        self._lock = threading.Lock()
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen()
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._read, args=(conn,), daemon=True).start()
+
+    def _read(self, conn):
+        with conn, conn.makefile("rb") as stream:
+            for line in stream:
+                with self._lock:
+                    self.lines.append(json.loads(line))
+
+    def wait_for(self, count, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.lines) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return list(self.lines)
+
+    def close(self):
+        self._sock.close()
+
+
+class TestPriorityAlerts(unittest.TestCase):
+    """PriorityAlertLane 測試"""
+
+    def test_compact_alert(self):
+        """測試告警只保留精簡字段，事件時間統一為 last_seen"""
+        alert = {
+            "alert_type": "vital_anomaly", "device_id": "anchor_001", "field": "heart_rate",
+            "value": 120, "reasons": ["z_score"], "baseline_mean": 70.2, "z_score": 8.1,
+            "timestamp": "2025-11-17T14:30:00Z", "previous_value": None,
+        }
+        self.assertEqual(compact_alert(alert), {
+            "alert_type": "vital_anomaly", "device_id": "anchor_001", "field": "heart_rate",
+            "value": 120, "reasons": ["z_score"], "last_seen": "2025-11-17T14:30:00Z",
+        })
+
+    def test_factory_rejects_unknown_target(self):
+        """測試不支持的告警輸出在建構時報錯"""
+        with self.assertRaises(ValueError):
+            AlertPublisherFactory("http://alerts.example.com")
+
+    def test_pipeline_publishes_critical_events(self):
+        """測試心率超出範圍與設備離線逐筆發佈到 socket，並記錄端到端延遲"""
+        with open("test_data/anchors.json") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        records[0]["cloudData"]["pub"]["msg"]["data"]["heart_rate"] = 250
+        records[1]["status"] = "offline"
+        duplicate = json.loads(json.dumps(records[1]))
+        duplicate["lastSeen"] = "2025-11-17T14:36:00Z"
+        records.append(duplicate)  # 持續離線不重複告警
+
+        server = _LineServer()
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                input_path = os.path.join(tmp, "anchors.ndjson")
+                with open(input_path, "w") as f:
+                    f.writelines(json.dumps(record) + "\n" for record in records)
+                result = AnchorFlatteningPipeline().run(
+                    input_path=input_path,
+                    outputs=OutputOptions(priority_sink=f"tcp://127.0.0.1:{server.port}"),
+                )
+            alerts = server.wait_for(2)
+        finally:
+            server.close()
+
+        self.assertEqual(
+            sorted((a["alert_type"], a["device_id"], a["field"], a["value"]) for a in alerts),
+            [("device_offline", "anchor_002", "status", "offline"),
+             ("vital_out_of_range", "anchor_001", "heart_rate", 250)],
+        )
+        self.assertTrue(all("emitted_at" in a and "last_seen" in a for a in alerts))
+        metrics = {(stage, name): value for stage, name, value in summarize_metrics(result)}
+        self.assertEqual(metrics[("priority_anchor", "records_out")], "2")
+        self.assertIn(("priority_anchor", "latency_ms"), metrics)
+
+
+if __name__ == "__main__":
+    unittest.main()
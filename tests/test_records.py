@@ -0,0 +1,39 @@
+"""記錄類序列化測試"""
+
+import sys
+import unittest
+from src.models.gateway_data import GatewayData, FlattenedGatewayData
+
+
+class TestRecordSerialization(unittest.TestCase):
+    """__slots__ 記錄類與淺拷貝 to_dict 測試"""
+
+    def setUp(self):
+        """測試前置"""
+        self.cloud_data = {"pub": {"msg": {"data": {"rssi": -45}}}}
+        self.gateway = GatewayData(gateway_id="gw_001", name="Living Room", cloud_data=self.cloud_data)
+
+    def test_raw_to_dict_is_shallow(self):
+        """測試原始記錄 to_dict 保留所有字段且不深拷貝"""
+        result = self.gateway.to_dict()
+        self.assertEqual(list(result)[:2], ["gateway_id", "name"])
+        self.assertIn("extra_data", result)
+        self.assertIs(result["cloud_data"], self.cloud_data)
+
+    def test_flattened_to_dict(self):
+        """測試扁平化記錄排除 None 並合併 extra_data"""
+        flattened = FlattenedGatewayData(device_id="gw_001", rssi=-45, extra_data={"site": "A"})
+        result = flattened.to_dict()
+        self.assertNotIn("battery_voltage", result)
+        self.assertNotIn("extra_data", result)
+        self.assertEqual(result["site"], "A")
+        self.assertEqual(result["rssi"], -45)
+
+    @unittest.skipIf(sys.version_info < (3, 10), "dataclass slots 需要 Python 3.10+")
+    def test_slots(self):
+        """測試記錄類使用 __slots__"""
+        self.assertFalse(hasattr(self.gateway, "__dict__"))
+
+
+if __name__ == "__main__":
+    unittest.main()
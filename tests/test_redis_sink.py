@@ -0,0 +1,157 @@
+"""Redis 熱層輸出測試（記憶體中的 Redis 替身）"""
+
+import json
+import unittest
+from unittest import mock
+import apache_beam as beam
+from apache_beam.testing.test_pipeline import TestPipeline
+from src.pipelines.anchor_flattening import AnchorFlatteningPipeline
+from src.pipelines.common import OutputOptions
+from src.transforms.redis_sink import WriteLatestStateFn, WriteToRedis, hash_fields, state_key
+
+
+class _Server:
+    """替身的伺服器狀態（按名稱共用，DoFn 經 pickle 後仍寫入同一份）"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.ttls = {}
+        self.published = []
+        self.executes = 0
+
+
+_SERVERS = {}
+
+
+class _Pipeline:
+    def __init__(self, server):
+        self.server = server
+        self.commands = []
+
+    def delete(self, key):
+        self.commands.append(lambda: (self.server.hashes.pop(key, None), self.server.ttls.pop(key, None)))
+
+    def hset(self, key, mapping):
+        self.commands.append(lambda: self.server.hashes.setdefault(key, {}).update(mapping))
+
+    def expire(self, key, seconds):
+        self.commands.append(lambda: self.server.ttls.__setitem__(key, seconds))
+
+    def publish(self, channel, message):
+        self.commands.append(lambda: self.server.published.append((channel, message)))
+
+    def execute(self):
+        for command in self.commands:
+            command()
+        self.server.executes += 1
+        self.commands = []
+
+
+class FakeRedisFactory:
+    """返回記憶體客戶端的 client_factory（只實作 sink 用到的命令）"""
+
+    def __init__(self, name):
+        self.name = name
+        _SERVERS[self.name] = _Server()
+
+    @property
+    def server(self):
+        return _SERVERS[self.name]
+
+    def __call__(self):
+        factory = self
+
+        class _Client:
+            def pipeline(self, transaction=True):
+                return _Pipeline(factory.server)
+
+        return _Client()
+
+
+def _record(device_id, last_seen, **fields):
+    record = {"device_id": device_id, "device_type": "anchor", "last_seen": last_seen, "status": "online"}
+    record.update(fields)
+    return record
+
+
+class TestRedisSink(unittest.TestCase):
+    """WriteLatestStateFn / WriteToRedis 測試"""
+
+    def test_hash_fields(self):
+        """測試 None 省略、字符串原樣、其他值為 JSON"""
+        self.assertEqual(
+            hash_fields({"device_id": "a", "rssi": -52, "heart_rate": 72.0, "is_bound": True, "x": None}),
+            {"device_id": "a", "rssi": "-52", "heart_rate": "72.0", "is_bound": "true"},
+        )
+        self.assertEqual(state_key("anchor", "a1"), "devices:anchor:a1")
+
+    def test_bundle_coalesces_to_newest(self):
+        """測試同一 bundle 內只寫出每個設備最新的記錄，一次 pipeline 往返"""
+        factory = FakeRedisFactory("coalesce")
+        fn = WriteLatestStateFn("anchor", factory, ttl_seconds=60, channel="updates")
+        fn.setup()
+        fn.start_bundle()
+        for record in [
+            _record("a1", "2025-11-17T14:30:05Z", heart_rate=75.0),
+            _record("a1", "2025-11-17T14:30:00Z", heart_rate=70.0),
+            _record("a2", "2025-11-17T14:30:00Z", battery_voltage=3.7),
+            {"status": "online"},
+        ]:
+            fn.process(record)
+        fn.finish_bundle()
+
+        server = factory.server
+        self.assertEqual(server.executes, 1)
+        self.assertEqual(server.hashes["devices:anchor:a1"]["heart_rate"], "75.0")
+        self.assertEqual(server.ttls, {"devices:anchor:a1": 60, "devices:anchor:a2": 60})
+        self.assertEqual([json.loads(m)["device_id"] for _, m in server.published], ["a1", "a2"])
+
+    def test_flushes_when_buffer_full_and_replaces_hash(self):
+        """測試緩衝超過上限時提前寫出；新記錄取代舊 Hash 的所有字段"""
+        factory = FakeRedisFactory("flush")
+        fn = WriteLatestStateFn("gateway", factory, ttl_seconds=None, channel=None, max_buffered=2, pipeline_size=1)
+        fn.setup()
+        fn.start_bundle()
+        fn.process(_record("g1", "2025-11-17T14:30:00Z", rssi=-50))
+        fn.process(_record("g2", "2025-11-17T14:30:00Z"))
+        self.assertEqual(factory.server.executes, 2)
+        fn.process(_record("g1", "2025-11-17T14:31:00Z"))
+        fn.finish_bundle()
+
+        server = factory.server
+        self.assertNotIn("rssi", server.hashes["devices:gateway:g1"])
+        self.assertEqual(server.ttls, {})
+        self.assertEqual(server.published, [])
+
+    def test_pipeline_writes_latest_state(self):
+        """測試 Pipeline 中每個設備的最終狀態為最新記錄"""
+        factory = FakeRedisFactory("pipeline")
+        records = [_record(f"a{i % 3}", f"2025-11-17T14:30:{i:02d}Z", heart_rate=60.0 + i) for i in range(9)]
+        with TestPipeline() as p:
+            p | beam.Create(records) | WriteToRedis("anchor", client_factory=factory)
+
+        hashes = factory.server.hashes
+        self.assertEqual(sorted(hashes), ["devices:anchor:a0", "devices:anchor:a1", "devices:anchor:a2"])
+        self.assertEqual(hashes["devices:anchor:a2"]["heart_rate"], "68.0")
+        with self.assertRaises(ValueError):
+            WriteToRedis("anchor")
+
+    def test_single_type_pipeline_passes_ttl_and_channel(self):
+        """測試單一類型 Pipeline 把 TTL 與 channel 傳給 WriteToRedis"""
+        with mock.patch(
+            "src.pipelines.common.WriteToRedis",
+            side_effect=lambda *args, **kwargs: beam.Map(lambda record: record),
+        ) as write:
+            AnchorFlatteningPipeline().run(
+                input_path="test_data/anchors.json",
+                outputs=OutputOptions(
+                    output_redis="redis://localhost:6379/0", redis_ttl_seconds=600, redis_channel="anchors:updates"
+                ),
+            )
+        write.assert_called_once_with(
+            "anchor", url="redis://localhost:6379/0", ttl_seconds=600, channel="anchors:updates"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
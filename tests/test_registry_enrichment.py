@@ -0,0 +1,112 @@
+"""設備登記表增強測試"""
+
+import csv
+import glob
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from src.pipelines.anchor_flattening import AnchorFlatteningPipeline
+from src.pipelines.common import OutputOptions
+from src.transforms.registry_enrichment import get_registry, load_registry
+
+
+ROWS = [
+    {"device_id": "anchor_001", "mac_address": "AA:BB:CC:DD:EE:FF",
+     "facility_id": "fac_taipei", "room_id": "room_101", "resident_id": "res_0001"},
+    {"device_id": "", "mac_address": "bb-cc-dd-ee-ff-11",
+     "facility_id": "fac_taipei", "room_id": "room_102", "resident_id": ""},
+]
+
+
+class TestRegistryEnrichment(unittest.TestCase):
+    """EnrichFromRegistry 測試"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def _write_csv(self, name, rows):
+        path = self._path(name)
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(ROWS[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def test_formats_build_the_same_index(self):
+        """測試 CSV / JSON / NDJSON / SQLite 快照的查找結果相同，可按 MAC 地址查找"""
+        json_path = self._path("devices.json")
+        with open(json_path, "w") as f:
+            json.dump({"devices": ROWS}, f)
+        ndjson_path = self._path("devices.ndjson")
+        with open(ndjson_path, "w") as f:
+            f.writelines(json.dumps(row) + "\n" for row in ROWS)
+        sqlite_path = self._path("devices.sqlite")
+        with sqlite3.connect(sqlite_path) as connection:
+            connection.execute(f"CREATE TABLE devices ({', '.join(ROWS[0])})")
+            connection.executemany(
+                f"INSERT INTO devices VALUES ({', '.join('?' * len(ROWS[0]))})",
+                [tuple(row.values()) for row in ROWS],
+            )
+
+        for path in (self._write_csv("devices.csv", ROWS), json_path, ndjson_path, sqlite_path):
+            registry = load_registry(path)
+            self.assertEqual(len(registry), 2, path)
+            self.assertEqual(
+                registry.lookup("anchor_001"),
+                {"facility_id": "fac_taipei", "room_id": "room_101", "resident_id": "res_0001"},
+            )
+            self.assertEqual(
+                registry.lookup("anchor_002", "BB:CC:DD:EE:FF:11"),
+                {"facility_id": "fac_taipei", "room_id": "room_102"},
+            )
+            self.assertIsNone(registry.lookup("anchor_999", None))
+
+        with self.assertRaises(ValueError):
+            load_registry(self._path("devices.xlsx"))
+
+    def test_cache_reloads_after_ttl_and_survives_bad_snapshot(self):
+        """測試快取在 TTL 內不重新讀取、過期後重新載入，快照損壞時沿用舊版本"""
+        path = self._write_csv("cache.csv", ROWS[:1])
+        first = get_registry(path, ttl_seconds=0.2)
+        self._write_csv("cache.csv", ROWS)
+        self.assertIs(get_registry(path, ttl_seconds=0.2), first)
+
+        time.sleep(0.25)
+        second = get_registry(path, ttl_seconds=0.2)
+        self.assertEqual(len(second), 2)
+
+        os.remove(path)
+        time.sleep(0.25)
+        self.assertIs(get_registry(path, ttl_seconds=0.2), second)
+
+    def test_pipeline_tags_records(self):
+        """測試 Anchor Pipeline 提供 device_registry 時輸出帶有機構 / 房間 / 長者"""
+        registry_path = self._write_csv("registry.csv", ROWS)
+        output = self._path("out")
+        AnchorFlatteningPipeline().run(
+            input_path="test_data/anchors.json",
+            outputs=OutputOptions(output_file=output, device_registry=registry_path),
+        )
+        records = {}
+        for path in glob.glob(f"{output}*"):
+            with open(path) as f:
+                for line in f:
+                    record = json.loads(line)
+                    records[record["device_id"]] = record
+
+        self.assertEqual(records["anchor_001"]["room_id"], "room_101")
+        self.assertEqual(records["anchor_001"]["resident_id"], "res_0001")
+        self.assertEqual(records["anchor_002"]["room_id"], "room_102")
+        self.assertNotIn("resident_id", records["anchor_002"])
+        self.assertNotIn("facility_id", records["anchor_003"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""設備類型路由測試"""
+
+import json
+import unittest
+from apache_beam.pvalue import TaggedOutput
+from src.transforms.router_transform import DeviceTypeRouter, classify_payload
+
+
+class TestClassifyPayload(unittest.TestCase):
+    """鍵簽名判定測試"""
+
+    def setUp(self):
+        """測試前置"""
+        with open("test_data/gateways.json") as f:
+            self.gateway = json.loads(f.readline())
+        with open("test_data/anchors.json") as f:
+            self.anchor = json.loads(f.readline())
+
+    def test_sample_data(self):
+        """測試示例數據"""
+        self.assertEqual(classify_payload(self.gateway), "gateway")
+        self.assertEqual(classify_payload(self.anchor), "anchor")
+
+    def test_camel_case_keys(self):
+        """測試 camelCase 鍵名"""
+        self.assertEqual(classify_payload({"anchorId": "a1", "cloudData": {}}), "anchor")
+        self.assertEqual(classify_payload({"gatewayId": "g1", "ipAddress": "10.0.0.1"}), "gateway")
+
+    def test_cloud_data_hints(self):
+        """測試依 cloudData.node / content 判定"""
+        self.assertEqual(classify_payload({"gateway_id": "g1", "cloudData": {"node": "ANCHOR"}}), "anchor")
+        self.assertEqual(classify_payload({"name": "x", "cloudData": {"content": "gateway"}}), "gateway")
+        self.assertIsNone(classify_payload({"gateway_id": "g1", "cloudData": {"content": "config"}}))
+
+    def test_unknown(self):
+        """測試無法識別的形狀"""
+        self.assertIsNone(classify_payload({"sensor_id": "s1"}))
+        self.assertIsNone(classify_payload({"gateway_id": "g1"}))
+
+
+class TestDeviceTypeRouter(unittest.TestCase):
+    """路由 DoFn 測試"""
+
+    def setUp(self):
+        """測試前置"""
+        self.router = DeviceTypeRouter()
+
+    def test_trusted_source(self):
+        """測試來源已知時不依內容判定"""
+        outputs = list(self.router.process(("anchor", {"sensor_id": "s1"})))
+        self.assertEqual(outputs[0].tag, "anchor")
+
+    def test_mixed_source(self):
+        """測試 mixed 來源依內容分派，無法識別的進入隔離輸出"""
+        outputs = list(self.router.process(("mixed", {"anchor_id": "a1"})))
+        self.assertEqual(outputs[0].tag, "anchor")
+
+        outputs = list(self.router.process(("mixed", {"sensor_id": "s1"})))
+        self.assertIsInstance(outputs[0], TaggedOutput)
+        self.assertEqual(outputs[0].tag, DeviceTypeRouter.QUARANTINE_TAG)
+        self.assertEqual(outputs[0].value["source"], "mixed")
+        self.assertEqual(outputs[0].value["original_data"], {"sensor_id": "s1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
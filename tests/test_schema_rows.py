@@ -0,0 +1,72 @@
+"""Beam schema 行與 BigQuery 表結構測試"""
+
+import typing
+import unittest
+import apache_beam as beam
+from apache_beam.testing.test_pipeline import TestPipeline
+from apache_beam.testing.util import assert_that, equal_to
+from src.models.schema import (
+    FlattenedAnchorRow, FlattenedGatewayRow, bigquery_schema, record_columns, row_type,
+)
+from src.transforms.schema_rows import ToRows, make_dict_converter, make_row_converter, row_to_dict
+
+
+class TestSchemaRows(unittest.TestCase):
+    """Flattened*Row 與 bigquery_schema 測試"""
+
+    def test_row_type_generated_from_dataclass(self):
+        """測試 NamedTuple 欄位與 record_columns 一致，device_id 不可為 null"""
+        self.assertIs(row_type("gateway"), FlattenedGatewayRow)
+        self.assertEqual(list(FlattenedAnchorRow._fields), [c.name for c in record_columns("anchor")])
+        hints = typing.get_type_hints(FlattenedAnchorRow)
+        self.assertIs(hints["device_id"], str)
+        self.assertEqual(hints["rssi"], typing.Optional[int])
+        self.assertIsInstance(beam.coders.registry.get_coder(FlattenedAnchorRow), beam.coders.RowCoder)
+        with self.assertRaises(ValueError):
+            row_type("sensor")
+
+    def test_converter_coerces_and_keeps_extra(self):
+        """測試類型轉換、未知字段存入 extra_data，row_to_dict 省略 None"""
+        to_row = make_row_converter("anchor")
+        row = to_row({"device_id": "anchor_001", "heart_rate": 72, "rssi": -52.0, "is_bound": 1, "padding": "xx"})
+        self.assertEqual(row.heart_rate, 72.0)
+        self.assertEqual(row.rssi, -52)
+        self.assertIs(row.is_bound, True)
+        self.assertEqual(row.extra_data, '{"padding": "xx"}')
+        self.assertEqual(row_to_dict(row), {
+            "device_id": "anchor_001", "is_bound": True, "rssi": -52, "heart_rate": 72.0,
+            "extra_data": '{"padding": "xx"}',
+        })
+
+    def test_dict_converter_matches_row_round_trip(self):
+        """測試 BigQuery 行的一次轉換與 Row -> 字典的結果一致"""
+        records = [
+            {"device_id": "anchor_001", "heart_rate": 72, "rssi": -52.0, "is_bound": 1, "padding": "xx"},
+            {"device_id": "anchor_002", "temperature": "bad", "status": None},
+        ]
+        to_row, to_dict = make_row_converter("anchor"), make_dict_converter("anchor")
+        for record in records:
+            self.assertEqual(list(to_dict(record).items()), list(row_to_dict(to_row(record)).items()))
+
+    def test_bigquery_schema(self):
+        """測試 BigQuery 表結構由同一份 schema 推導"""
+        fields = {f["name"]: f for f in bigquery_schema("gateway")["fields"]}
+        self.assertEqual(list(fields), [c.name for c in record_columns("gateway")])
+        self.assertEqual(fields["device_id"]["mode"], "REQUIRED")
+        self.assertEqual(fields["timestamp"]["type"], "TIMESTAMP")
+        self.assertEqual(fields["rssi"]["type"], "INTEGER")
+        self.assertEqual(fields["is_bound"]["type"], "BOOLEAN")
+        self.assertEqual(fields["battery_voltage"]["type"], "FLOAT")
+
+    def test_pipeline_rows_use_row_coder(self):
+        """測試 ToRows 輸出帶 schema 的 PCollection，經 shuffle 後不變"""
+        records = [{"device_id": f"gw_{i}", "rssi": -50 - i, "status": "online"} for i in range(3)]
+        with TestPipeline() as p:
+            rows = p | beam.Create(records) | ToRows("gateway")
+            self.assertIs(rows.element_type, FlattenedGatewayRow)
+            result = rows | beam.Reshuffle() | beam.Map(row_to_dict)
+            assert_that(result, equal_to(records))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -72,6 +72,30 @@ class TestGatewayFlattening(unittest.TestCase):
         self.assertIn("device_id", result)
         self.assertIn("battery_voltage", result)
     
+    def test_gateway_unknown_keys(self):
+        """測試未知鍵放入 extra_data 而非拋出例外"""
+        data = dict(self.sample_gateway, firmwareChannel="beta", is_valid=False)
+        gateway = GatewayData.from_dict(data)
+        self.assertEqual(gateway.last_seen, "2025-11-17T14:30:00Z")
+        self.assertEqual(gateway.extra_data, {"firmwareChannel": "beta", "is_valid": False})
+    
+    def test_gateway_missing_required(self):
+        """測試缺少必要字段時交由驗證處理"""
+        gateway = GatewayData.from_dict({"ipAddress": "192.168.1.100"})
+        self.assertIsNone(gateway.gateway_id)
+        self.assertEqual(gateway.name, "")
+        self.assertEqual(gateway.ip_address, "192.168.1.100")
+    
+    def test_flatten_gateway_transform(self):
+        """測試 Gateway 扁平化 DoFn 處理 camelCase 原始數據"""
+        outputs = list(FlattenGatewayTransform().process(self.sample_gateway))
+        self.assertEqual(len(outputs), 1)
+        self.assertNotIn("error", outputs[0])
+        self.assertEqual(outputs[0]["last_seen"], "2025-11-17T14:30:00Z")
+        
+        errors = list(FlattenGatewayTransform().process([1, 2]))
+        self.assertTrue(errors[0]["error"])
+    
     def test_gateway_to_json(self):
         """測試 Gateway 轉換為 JSON"""
         gateway = GatewayData.from_dict(self.sample_gateway)
@@ -0,0 +1,85 @@
+"""驗證規則引擎測試"""
+
+import os
+import unittest
+from unittest import mock
+from src.config import get_config
+from src.transforms.validation_rules import (
+    compile_rules, ValidationCode, DEFAULT_VALIDATION_RULES,
+)
+from src.transforms.validation_transform import ValidateAnchorTransform
+
+
+class TestValidationRules(unittest.TestCase):
+    """規則編譯與檢查測試"""
+
+    def setUp(self):
+        """測試前置"""
+        self.rules = compile_rules("anchor")
+
+    def test_valid_record(self):
+        """測試有效記錄的錯誤碼為 0"""
+        record = {"device_id": "anchor_001", "device_type": "anchor", "heart_rate": 72, "temperature": 36.5}
+        self.assertEqual(self.rules.check(record), 0)
+
+    def test_short_circuit(self):
+        """測試型別錯誤時不再檢查值域"""
+        record = {"device_id": "anchor_001", "device_type": "anchor", "temperature": "hot"}
+        code = self.rules.check(record)
+        self.assertEqual(code, ValidationCode.TYPE_TEMPERATURE)
+        self.assertEqual(self.rules.codes(code), [5])
+        self.assertEqual(self.rules.describe(code, record), ["字段 temperature 類型錯誤: 預期數值型"])
+
+    def test_rules_from_config(self):
+        """測試規則可由配置覆寫（不需修改代碼）"""
+        config = {"anchor": [
+            {"field": "device_id", "required": {"code": 0}},
+            {"field": "heart_rate", "numeric": {"code": 4},
+             "range": {"min": 40, "max": 180, "code": 11, "label": "心率異常"}},
+        ]}
+        rules = compile_rules("anchor", config)
+        record = {"device_id": "anchor_001", "heart_rate": 190}
+        self.assertEqual(rules.check(record), ValidationCode.RANGE_HEART_RATE)
+        self.assertEqual(self.rules.check(record), ValidationCode.MISSING_DEVICE_TYPE)
+        # 未配置的設備類型使用內建規則
+        self.assertEqual(len(compile_rules("gateway", config).checks), len(DEFAULT_VALIDATION_RULES["gateway"]))
+
+    def test_invalid_config(self):
+        """測試錯誤的規則配置"""
+        with self.assertRaises(ValueError):
+            compile_rules("anchor", {"anchor": [{"field": "rssi", "numeric": {"code": 70}}]})
+        with self.assertRaises(ValueError):
+            compile_rules("anchor", {"anchor": [
+                {"field": "rssi", "numeric": {"code": 3}},
+                {"field": "heart_rate", "numeric": {"code": 3}},
+            ]})
+        with self.assertRaises(ValueError):
+            compile_rules("sensor")
+
+    def test_yaml_rules_match_defaults(self):
+        """測試 config/*.yaml 中的規則與內建規則一致"""
+        self.assertEqual(get_config("dev").validation_rules, DEFAULT_VALIDATION_RULES)
+
+    def test_env_overrides_only_project_and_region(self):
+        """測試設置 GCP_PROJECT_ID 時仍讀取 YAML，環境變數只覆寫 project_id / region"""
+        env = {"GCP_PROJECT_ID": "deployed-project", "GCP_REGION": "europe-west1"}
+        with mock.patch.dict(os.environ, env):
+            config = get_config("prod")
+        self.assertEqual((config.project_id, config.region), ("deployed-project", "europe-west1"))
+        self.assertEqual(config.validation_rules, DEFAULT_VALIDATION_RULES)
+
+    def test_transform_emits_code(self):
+        """測試驗證 DoFn 只寫入錯誤碼"""
+        dofn = ValidateAnchorTransform()
+        dofn.setup()
+        record = {"device_id": "anchor_001", "device_type": "anchor", "heart_rate": 250}
+        output = next(dofn.process(record))
+        self.assertFalse(output["is_valid"])
+        self.assertEqual(output["validation_code"], ValidationCode.RANGE_HEART_RATE)
+        self.assertNotIn("validation_errors", output)
+        annotated = dofn.rule_set.annotate(output)
+        self.assertEqual(annotated["validation_errors"], ["心率異常: 250"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""生命體徵彙總測試"""
+
+import glob
+import json
+import os
+import tempfile
+import unittest
+import apache_beam as beam
+from apache_beam.testing.test_pipeline import TestPipeline
+from apache_beam.testing.util import assert_that, equal_to
+from src.pipelines.anchor_flattening import AnchorFlatteningPipeline
+from src.pipelines.common import OutputOptions
+from src.transforms.vital_rollups import VitalRollups, VitalStatsFn, stats_summary
+
+
+def _record(device_id, minute, second, heart_rate, temperature=None):
+    return {
+        "device_id": device_id,
+        "timestamp": f"2025-11-17T14:{minute:02d}:{second:02d}Z",
+        "heart_rate": heart_rate,
+        "temperature": temperature,
+    }
+
+
+class TestVitalRollups(unittest.TestCase):
+    """VitalRollups 測試"""
+
+    def test_merged_accumulators_match_single_pass(self):
+        """測試分段累計後合併與一次累計結果相同，None 不計入"""
+        fn = VitalStatsFn(("heart_rate", "temperature"))
+        records = [_record("a", 0, i, hr, t) for i, (hr, t) in enumerate([(70, 36.5), (80, None), (75, 36.9)])]
+
+        single = fn.create_accumulator()
+        for record in records:
+            fn.add_input(single, record)
+        parts = [fn.add_input(fn.create_accumulator(), record) for record in records]
+        merged = fn.merge_accumulators([fn.create_accumulator()] + parts)
+
+        self.assertEqual(merged, single)
+        summary = stats_summary(merged, fn.fields)
+        self.assertEqual(summary["heart_rate_count"], 3)
+        self.assertEqual(summary["heart_rate_mean"], 75)
+        self.assertEqual((summary["heart_rate_min"], summary["heart_rate_max"]), (70, 80))
+        self.assertAlmostEqual(summary["heart_rate_stddev"], (50 / 3) ** 0.5)
+        self.assertEqual(summary["temperature_count"], 2)
+        self.assertAlmostEqual(summary["temperature_mean"], 36.7)
+
+    def test_minute_and_hour_windows(self):
+        """測試每分鐘與每小時窗口按設備彙總，每小時由每分鐘合併而來"""
+        records = [
+            _record("a", 0, 5, 70),
+            _record("a", 0, 55, 80),
+            _record("a", 1, 10, 90),
+            _record("b", 0, 30, 60),
+            {"device_id": "c", "heart_rate": 100},  # 無事件時間，不參與彙總
+        ]
+        with TestPipeline() as p:
+            rollups = p | beam.Create(records) | VitalRollups("anchor", fields=("heart_rate",))
+            minute = rollups["minute"] | "分鐘" >> beam.Map(
+                lambda r: (r["device_id"], r["window_start"], r["heart_rate_count"], r["heart_rate_mean"])
+            )
+            hour = rollups["hour"] | "小時" >> beam.Map(
+                lambda r: (r["device_id"], r["granularity"], r["window_start"], r["window_end"],
+                           r["heart_rate_count"], r["heart_rate_max"])
+            )
+            assert_that(minute, equal_to([
+                ("a", "2025-11-17T14:00:00Z", 2, 75.0),
+                ("a", "2025-11-17T14:01:00Z", 1, 90.0),
+                ("b", "2025-11-17T14:00:00Z", 1, 60.0),
+            ]), label="minute")
+            assert_that(hour, equal_to([
+                ("a", "hour", "2025-11-17T14:00:00Z", "2025-11-17T15:00:00Z", 3, 90),
+                ("b", "hour", "2025-11-17T14:00:00Z", "2025-11-17T15:00:00Z", 1, 60),
+            ]), label="hour")
+
+    def test_pipeline_writes_rollup_outputs(self):
+        """測試 Anchor Pipeline 提供 output_rollups 時寫出每分鐘與每小時彙總"""
+        with tempfile.TemporaryDirectory() as tmp:
+            prefix = os.path.join(tmp, "rollups")
+            AnchorFlatteningPipeline().run(
+                input_path="test_data/anchors.json", outputs=OutputOptions(output_rollups=prefix)
+            )
+            outputs = {}
+            for granularity in ("minute", "hour"):
+                outputs[granularity] = []
+                for path in glob.glob(f"{prefix}_{granularity}*"):
+                    with open(path) as f:
+                        outputs[granularity].extend(json.loads(line) for line in f)
+
+        self.assertEqual(len(outputs["minute"]), 3)
+        self.assertEqual(len(outputs["hour"]), 3)
+        anchor_001 = next(r for r in outputs["hour"] if r["device_id"] == "anchor_001")
+        self.assertEqual(anchor_001["window_start"], "2025-11-17T14:00:00Z")
+        self.assertEqual(anchor_001["heart_rate_mean"], 72)
+        self.assertEqual(anchor_001["rssi_min"], -52)
+
+
+if __name__ == "__main__":
+    unittest.main()